@@ -0,0 +1,69 @@
+from functools import wraps
+
+from flask import Blueprint, Response, abort, jsonify, render_template, request, stream_with_context
+from flask_login import current_user, login_required
+from catalog import CATEGORIES, FORMATS, MIMETYPES, REGIONS, CatalogError, detect_format, export_places, import_places
+from identity import confirmed_admin
+from instrumentation import metrics
+from uploads import raw_file_uploads
+
+admin_bp = Blueprint('admin_bp', __name__, url_prefix='/admin', template_folder='templates')
+
+
+def admin_required(view):
+    @wraps(view)
+    @login_required
+    def wrapped(*args, **kwargs):
+        if not confirmed_admin(current_user):
+            abort(403)
+        return view(*args, **kwargs)
+    return wrapped
+
+
+# ------------------- Metrics -------------------
+@admin_bp.route('/metrics')
+@admin_required
+def metrics_page():
+    endpoints = metrics.snapshot()
+    if request.args.get('format') == 'json':
+        return jsonify(endpoints)
+    return render_template('admin_metrics.html', endpoints=endpoints)
+
+
+@admin_bp.route('/metrics/reset', methods=['POST'])
+@admin_required
+def reset_metrics():
+    metrics.reset()
+    return jsonify({'status': 'success'})
+
+
+# ------------------- Places -------------------
+@admin_bp.route('/places/export')
+@admin_required
+def export_places_file():
+    fmt = request.args.get('format', 'ndjson')
+    category = request.args.get('category') or None
+    region = request.args.get('region') or None
+    if fmt not in FORMATS or (category and category not in CATEGORIES) or (region and region not in REGIONS):
+        abort(400)
+    body = stream_with_context(export_places(fmt, category=category, region=region))
+    return Response(body, mimetype=MIMETYPES[fmt],
+                    headers={'Content-Disposition': f'attachment; filename="places.{fmt}"'})
+
+
+@admin_bp.route('/places/import', methods=['POST'])
+@admin_required
+@raw_file_uploads
+def import_places_file():
+    """Multipart upload in field "file"; larger files than MAX_CONTENT_LENGTH go through `flask places import`."""
+    upload = request.files.get('file')
+    if upload is None or not upload.filename:
+        return jsonify({'error': 'no file'}), 400
+    try:
+        fmt = request.form.get('format') or detect_format(upload.filename)
+        if fmt not in FORMATS:
+            raise CatalogError(f"unknown format {fmt!r}")
+        report = import_places(upload.stream, fmt)
+    except CatalogError as exc:
+        return jsonify({'error': str(exc)}), 400
+    return jsonify(report.as_dict())
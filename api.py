@@ -0,0 +1,162 @@
+import hashlib
+
+from flask import Blueprint, Response, abort, jsonify, render_template, request, url_for
+from sqlalchemy import exists
+from geo import (KEY_ZOOM, MAX_BBOX_TILES, TILE_TTL, DEFAULT_NEIGHBOURS, MAX_RADIUS_KM,
+                 get_tile, tiles_for_bbox, nearest_places)
+from queries import REVIEW_SORTS, decode_review_cursor, places_in_order, review_page
+from loading import PLACE_LISTING, REVIEW_PAGE, query_budget
+from models import db, Place
+from ranking import SORTS, top_places, current_trending
+from search import search_place_ids
+
+api_bp = Blueprint('api_bp', __name__, url_prefix='/api')
+
+SEARCH_LIMIT = 10
+MAX_SEARCH_LIMIT = 50
+MAX_ZOOM = 19
+TOP_LIMIT = 10
+MAX_TOP_LIMIT = 50
+TOP_TTL = 60
+
+
+def place_summary(place):
+    return {
+        "id": place.id,
+        "name": place.name,
+        "category": place.category,
+        "region": place.region,
+        "avg_rating": place.avg_rating,
+        "image": url_for('static', filename='uploads/' + place.image) if place.image else None,
+        "url": url_for('main.place_detail', place_id=place.id),
+    }
+
+
+def cacheable_json(body, etag, max_age):
+    """JSON response with an ETag; answers 304 when the client already has it."""
+    if etag in request.if_none_match:
+        response = Response(status=304)
+    else:
+        response = Response(body, mimetype='application/json')
+    response.set_etag(etag)
+    response.cache_control.public = True
+    response.cache_control.max_age = max_age
+    return response
+
+
+# ------------------- Search -------------------
+@api_bp.route('/search')
+def search():
+    query = request.args.get('q', '').strip()
+    limit = max(1, min(request.args.get('limit', SEARCH_LIMIT, type=int), MAX_SEARCH_LIMIT))
+
+    place_ids = search_place_ids(query, limit) if query else []
+    return jsonify({
+        "query": query,
+        "results": [place_summary(place) for place in places_in_order(place_ids)],
+    })
+
+
+# ------------------- Rankings -------------------
+@api_bp.route('/places/top')
+def top_rated_places():
+    sort = request.args.get('sort', 'bayesian')
+    if sort not in SORTS:
+        abort(400)
+    limit = max(1, min(request.args.get('limit', TOP_LIMIT, type=int), MAX_TOP_LIMIT))
+    category = request.args.get('category') or None
+    region = request.args.get('region') or None
+
+    results = top_places(category, region, sort, limit, PLACE_LISTING)
+    response = jsonify({
+        "sort": sort,
+        "results": [
+            dict(
+                place_summary(place),
+                rating_count=ranking.rating_count,
+                score=round(ranking.bayesian, 3),
+                trending=round(current_trending(ranking.trending), 3),
+            )
+            for place, ranking in results
+        ],
+    })
+    response.cache_control.public = True
+    response.cache_control.max_age = TOP_TTL
+    return response
+
+
+# ------------------- Reviews -------------------
+@api_bp.route('/places/<int:place_id>/ratings')
+@query_budget(3)
+def place_reviews(place_id):
+    """Rendered review cards after the cursor, for place_detail's "load more"."""
+    sort = request.args.get('sort', 'newest')
+    if sort not in REVIEW_SORTS:
+        abort(400)
+    after = request.args.get('after')
+    try:
+        after = decode_review_cursor(after, sort) if after else None
+    except ValueError:
+        abort(400)
+    if not db.session.query(exists().where(Place.id == place_id)).scalar():
+        abort(404)
+
+    ratings, next_cursor = review_page(place_id, sort, after, options=REVIEW_PAGE)
+    return jsonify({
+        "html": render_template("review_cards.html", ratings=ratings),
+        "next": next_cursor,
+    })
+
+
+# ------------------- Map tiles -------------------
+@api_bp.route('/places/tiles/<int:zoom>/<int:x>/<int:y>')
+def place_tile(zoom, x, y):
+    if zoom > MAX_ZOOM or not (0 <= x < 1 << zoom and 0 <= y < 1 << zoom):
+        abort(404)
+    body, etag = get_tile(zoom, x, y)
+    return cacheable_json(body, etag, TILE_TTL)
+
+
+@api_bp.route('/places/bbox')
+def places_in_bbox():
+    bounds = [request.args.get(name, type=float) for name in ('minlat', 'minlng', 'maxlat', 'maxlng')]
+    zoom = request.args.get('zoom', type=int)
+    if None in bounds or zoom is None:
+        abort(400)
+
+    min_lat, min_lng, max_lat, max_lng = bounds
+    min_lat, max_lat = sorted((min_lat, max_lat))
+    min_lng, max_lng = sorted((min_lng, max_lng))
+    zoom = max(0, min(zoom, MAX_ZOOM))
+
+    # huge viewports at high zoom would fan out into too many tiles
+    tiles = tiles_for_bbox(min_lat, min_lng, max_lat, max_lng, min(zoom, KEY_ZOOM))
+    while len(tiles) > MAX_BBOX_TILES and zoom > 0:
+        zoom -= 1
+        tiles = tiles_for_bbox(min_lat, min_lng, max_lat, max_lng, min(zoom, KEY_ZOOM))
+    tile_zoom = min(zoom, KEY_ZOOM)
+
+    parts = [(f"{tile_zoom}/{x}/{y}", *get_tile(tile_zoom, x, y)) for x, y in tiles]
+    etag = hashlib.sha1("|".join(key + tag for key, _, tag in parts).encode()).hexdigest()
+
+    tile_bodies = ",".join(f'"{key}":{body}' for key, body, _ in parts)
+    body = f'{{"zoom":{tile_zoom},"tiles":{{{tile_bodies}}}}}'
+    return cacheable_json(body, etag, TILE_TTL)
+
+
+# ------------------- Nearby -------------------
+@api_bp.route('/places/nearby')
+def nearby_places():
+    lat = request.args.get('lat', type=float)
+    lng = request.args.get('lng', type=float)
+    if lat is None or lng is None or not (-90 <= lat <= 90 and -180 <= lng <= 180):
+        abort(400)
+    k = request.args.get('k', DEFAULT_NEIGHBOURS, type=int)
+    radius_km = request.args.get('radius_km', type=float)
+    if radius_km is not None:
+        radius_km = max(0.0, min(radius_km, MAX_RADIUS_KM))
+
+    results = nearest_places(lat, lng, k=k, radius_km=radius_km)
+    return jsonify({
+        "results": [dict(place_summary(place), distance_km=round(distance, 3)) for place, distance in results],
+    })
@@ -0,0 +1,348 @@
+import hashlib
+import json
+from datetime import date, datetime, timezone
+from functools import wraps
+
+from flask import Blueprint, Response, abort, request, url_for
+from flask_login import current_user
+from flask_wtf.csrf import generate_csrf
+from sqlalchemy import exists
+from sqlalchemy.orm import joinedload, raiseload
+from werkzeug.exceptions import HTTPException
+
+from loading import PLACE_LISTING, query_budget
+from models import db, Place, Rating, PlannedRoute, favorites_table
+from queries import PAGE_SIZE, MAX_PAGE_SIZE, parse_place_filters, place_page, keyset_page
+from ratings import add_rating
+from bulk import InvalidOperations, add_favorites, add_routes, apply_operations, remove_favorites, user_list_state
+
+try:
+    import orjson
+except ImportError:  # optional, the stdlib encoder is used without it
+    orjson = None
+
+api_v1_bp = Blueprint('api_v1', __name__, url_prefix='/api/v1')
+
+
+# ------------------- Serialization -------------------
+def _iso(value):
+    if value is None:
+        return None
+    if isinstance(value, datetime):
+        return value.isoformat() + "Z"
+    return value.isoformat()
+
+
+def _upload_url(filename):
+    return url_for('static', filename='uploads/' + filename) if filename else None
+
+
+PLACE_FIELDS = {
+    "id": lambda p: p.id,
+    "name": lambda p: p.name,
+    "description": lambda p: p.description,
+    "category": lambda p: p.category,
+    "region": lambda p: p.region,
+    "latitude": lambda p: p.latitude,
+    "longitude": lambda p: p.longitude,
+    "rating": lambda p: p.rating,
+    "rating_count": lambda p: p.rating_count,
+    "image": lambda p: _upload_url(p.image),
+    "version": lambda p: p.version,
+    "updated_at": lambda p: _iso(p.updated_at),
+}
+
+RATING_FIELDS = {
+    "id": lambda r: r.id,
+    "place_id": lambda r: r.place_id,
+    "user": lambda r: r.user.username if r.user else None,
+    "stars": lambda r: r.stars,
+    "comment": lambda r: r.comment,
+    "image": lambda r: _upload_url(r.image),
+    "timestamp": lambda r: _iso(r.timestamp),
+    "version": lambda r: r.version,
+}
+
+ROUTE_FIELDS = {
+    "id": lambda r: r.id,
+    "place_id": lambda r: r.place_id,
+    "place": lambda r: {"id": r.place.id, "name": r.place.name, "image": _upload_url(r.place.image)},
+    "date": lambda r: _iso(r.date),
+    "version": lambda r: r.version,
+    "updated_at": lambda r: _iso(r.updated_at),
+}
+
+
+def dumps(data):
+    if orjson is not None:
+        return orjson.dumps(data)
+    return json.dumps(data, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def json_response(data, status=200):
+    return Response(dumps(data), status=status, mimetype='application/json')
+
+
+def requested_fields(allowed):
+    """?fields=a,b sparse fieldset; every field when absent."""
+    raw = request.args.get('fields', '')
+    fields = [name.strip() for name in raw.split(',') if name.strip()]
+    if not fields:
+        return list(allowed)
+    unknown = sorted(set(fields) - allowed.keys())
+    if unknown:
+        abort(400, description=f"unknown fields: {', '.join(unknown)}")
+    return fields
+
+
+def serialize(row, getters, fields):
+    return {name: getters[name](row) for name in fields}
+
+
+def page_args():
+    cursor = request.args.get('cursor', type=int)
+    limit = request.args.get('limit', PAGE_SIZE, type=int)
+    return cursor, max(1, min(limit, MAX_PAGE_SIZE))
+
+
+# ------------------- Conditional GET -------------------
+def _etag(parts):
+    return hashlib.sha1("|".join(str(part) for part in parts).encode()).hexdigest()
+
+
+def _not_modified(etag, last_modified):
+    if request.if_none_match:
+        # weak comparison: the compression middleware marks the ETag of a compressed body W/
+        return request.if_none_match.contains_weak(etag)
+    since = request.if_modified_since
+    return bool(since and last_modified and last_modified.replace(tzinfo=timezone.utc, microsecond=0) <= since)
+
+
+def conditional(etag, render, last_modified=None):
+    """304 if the client's copy is current, otherwise render() serialized.
+
+    The ETag is built from row ids and versions, so nothing is serialized
+    for an unchanged resource. Collections only get an ETag: a deleted row
+    doesn't move any updated_at, so If-Modified-Since can't see it.
+    """
+    if _not_modified(etag, last_modified):
+        response = Response(status=304)
+    else:
+        response = json_response(render())
+    response.set_etag(etag)
+    if last_modified is not None:
+        response.last_modified = last_modified.replace(tzinfo=timezone.utc)
+    response.cache_control.no_cache = True
+    response.cache_control.private = True
+    return response
+
+
+def collection(name, rows, next_cursor, getters, fields, versions):
+    etag = _etag([name, ",".join(fields), next_cursor, *versions])
+
+    def render():
+        body = {"data": [serialize(row, getters, fields) for row in rows], "next_cursor": next_cursor}
+        if next_cursor is not None:
+            args = dict(request.args.to_dict(), cursor=next_cursor)
+            body["next"] = url_for(request.endpoint, **dict(request.view_args, **args))
+        return body
+
+    return conditional(etag, render)
+
+
+def single(name, row, getters, fields):
+    etag = _etag([name, ",".join(fields), row.id, row.version])
+    return conditional(etag, lambda: serialize(row, getters, fields), row.updated_at)
+
+
+# ------------------- Auth / errors -------------------
+def api_login_required(view):
+    @wraps(view)
+    def wrapped(*args, **kwargs):
+        if not current_user.is_authenticated:
+            abort(401)
+        return view(*args, **kwargs)
+    return wrapped
+
+
+@api_v1_bp.errorhandler(HTTPException)
+@api_v1_bp.errorhandler(413)  # the app-wide upload handlers would redirect
+@api_v1_bp.errorhandler(415)
+def api_error(error):
+    return json_response({"error": error.name, "message": error.description}, status=error.code)
+
+
+@api_v1_bp.route('/me')
+@api_login_required
+def me():
+    # the CSRF token is needed in X-CSRFToken for every write below
+    return json_response({
+        "id": current_user.id,
+        "username": current_user.username,
+        "email": current_user.email,
+        "is_admin": bool(current_user.is_admin),
+        "csrf_token": generate_csrf(),
+    })
+
+
+# ------------------- Places -------------------
+@api_v1_bp.route('/places')
+@query_budget(3)
+def list_places():
+    args = request.args.to_dict()
+    args["after"], args["per_page"] = args.pop("cursor", None), args.pop("limit", None)
+    if args.pop("favorites", None) in ("1", "true"):
+        args["favorites_only"] = "on"
+    filters = parse_place_filters(args)
+    if filters["favorites_only"] and not current_user.is_authenticated:
+        abort(401)
+
+    fields = requested_fields(PLACE_FIELDS)
+    user_id = current_user.id if current_user.is_authenticated else None
+    places, next_cursor = place_page(filters, user_id=user_id)
+    versions = [f"{place.id}:{place.version}" for place in places]
+    return collection("places", places, next_cursor, PLACE_FIELDS, fields, versions)
+
+
+@api_v1_bp.route('/places/<int:place_id>')
+@query_budget(2)
+def get_place(place_id):
+    place = Place.query.options(*PLACE_LISTING).get_or_404(place_id)
+    return single("place", place, PLACE_FIELDS, requested_fields(PLACE_FIELDS))
+
+
+# ------------------- Ratings -------------------
+@api_v1_bp.route('/places/<int:place_id>/ratings')
+@query_budget(3)
+def list_ratings(place_id):
+    if not db.session.query(exists().where(Place.id == place_id)).scalar():
+        abort(404)
+    fields = requested_fields(RATING_FIELDS)
+    cursor, limit = page_args()
+
+    query = Rating.query.filter(Rating.place_id == place_id)
+    if "user" in fields:
+        query = query.options(joinedload(Rating.user).raiseload("*"))
+    ratings, next_cursor = keyset_page(query, cursor, limit, key=Rating.id)
+    versions = [f"{rating.id}:{rating.version}" for rating in ratings]
+    return collection("ratings", ratings, next_cursor, RATING_FIELDS, fields, versions)
+
+
+@api_v1_bp.route('/places/<int:place_id>/ratings', methods=['POST'])
+@api_login_required
+def create_rating(place_id):
+    if not db.session.query(exists().where(Place.id == place_id)).scalar():
+        abort(404)
+    data = request.get_json(silent=True) or {}
+    try:
+        stars = float(data.get("stars"))
+    except (TypeError, ValueError):
+        abort(400, description="stars must be a number")
+    if not 0 <= stars <= 5:
+        abort(400, description="stars must be between 0 and 5")
+
+    rating = Rating(user_id=current_user.id, place_id=place_id, stars=stars, comment=data.get("comment"))
+    add_rating(rating)
+    db.session.commit()
+    return json_response(serialize(rating, RATING_FIELDS, RATING_FIELDS), status=201)
+
+
+# ------------------- Favorites -------------------
+@api_v1_bp.route('/me/favorites')
+@api_login_required
+@query_budget(3)
+def list_favorites():
+    fields = requested_fields(PLACE_FIELDS)
+    cursor, limit = page_args()
+    query = Place.query.options(*PLACE_LISTING).filter(
+        exists().where(favorites_table.c.place_id == Place.id, favorites_table.c.user_id == current_user.id)
+    )
+    places, next_cursor = keyset_page(query, cursor, limit)
+    versions = [f"{place.id}:{place.version}" for place in places]
+    return collection("favorites", places, next_cursor, PLACE_FIELDS, fields, versions)
+
+
+@api_v1_bp.route('/me/favorites/<int:place_id>', methods=['PUT'])
+@api_login_required
+def add_favorite(place_id):
+    if not db.session.query(exists().where(Place.id == place_id)).scalar():
+        abort(404)
+    add_favorites(current_user.id, [place_id])  # a no-op when it's a favorite already
+    db.session.commit()
+    return json_response({"place_id": place_id, "favorite": True})
+
+
+@api_v1_bp.route('/me/favorites/<int:place_id>', methods=['DELETE'])
+@api_login_required
+def remove_favorite(place_id):
+    remove_favorites(current_user.id, [place_id])
+    db.session.commit()
+    return json_response({"place_id": place_id, "favorite": False})
+
+
+# ------------------- Planned routes -------------------
+@api_v1_bp.route('/me/routes')
+@api_login_required
+@query_budget(3)
+def list_routes():
+    fields = requested_fields(ROUTE_FIELDS)
+    cursor, limit = page_args()
+    query = PlannedRoute.query.filter(PlannedRoute.user_id == current_user.id)
+    if "place" in fields:
+        query = query.options(joinedload(PlannedRoute.place).raiseload("*"))
+    else:
+        query = query.options(raiseload("*"))
+    routes, next_cursor = keyset_page(query, cursor, limit, key=PlannedRoute.id)
+    versions = [f"{route.id}:{route.version}" for route in routes]
+    if "place" in fields:
+        versions += [f"p{route.place.id}:{route.place.version}" for route in routes if route.place]
+    return collection("routes", routes, next_cursor, ROUTE_FIELDS, fields, versions)
+
+
+@api_v1_bp.route('/me/routes', methods=['POST'])
+@api_login_required
+def create_route():
+    data = request.get_json(silent=True) or {}
+    place = db.session.get(Place, data.get("place_id")) if isinstance(data.get("place_id"), int) else None
+    if place is None:
+        abort(400, description="place_id must be an existing place")
+    try:
+        route_date = date.fromisoformat(data["date"]) if data.get("date") else None
+    except (TypeError, ValueError):
+        abort(400, description="date must be YYYY-MM-DD")
+
+    # same rules as booking and the place page, see bulk.add_routes
+    created = add_routes(current_user.id, {place.id: route_date})
+    db.session.commit()
+    query = PlannedRoute.query.filter_by(user_id=current_user.id, place_id=place.id)
+    if route_date is not None:
+        query = query.filter_by(date=route_date)
+    route = query.order_by(PlannedRoute.id).first()
+    return json_response(serialize(route, ROUTE_FIELDS, ROUTE_FIELDS), status=201 if created else 200)
+
+
+@api_v1_bp.route('/me/routes/<int:route_id>', methods=['DELETE'])
+@api_login_required
+def delete_route(route_id):
+    route = db.session.get(PlannedRoute, route_id)
+    if route is None or route.user_id != current_user.id:
+        abort(404)
+    db.session.delete(route)
+    db.session.commit()
+    return Response(status=204)
+
+
+# ------------------- Batch -------------------
+@api_v1_bp.route('/me/batch', methods=['POST'])
+@api_login_required
+@query_budget(8)
+def batch_mutations():
+    """Apply many favorite/route adds and removes in one transaction."""
+    data = request.get_json(silent=True) or {}
+    try:
+        apply_operations(current_user.id, data.get("operations"))
+    except InvalidOperations as error:
+        db.session.rollback()
+        abort(400, description=str(error))
+    db.session.commit()
+    return json_response(user_list_state(current_user.id))
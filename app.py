@@ -1,413 +1,120 @@
-from flask import Flask, render_template, redirect, url_for, flash, request, abort, jsonify
-from flask_login import LoginManager, login_required, current_user
-from models import db, User, Place, Spot, Category, Rating, PlannedRoute, datetime
-from forms import PlaceForm
-from auth import auth_bp
-from flask_migrate import Migrate
-from werkzeug.utils import secure_filename
-from sqlalchemy.sql.expression import func
 import os
-from types import SimpleNamespace
-from flask_wtf import CSRFProtect
-import random
-
-
-# ---------------- INIT APP ----------------
-app = Flask(__name__, template_folder='templates')
-app.config["SECRET_KEY"] = "super-secret-key"
-app.config["SQLALCHEMY_DATABASE_URI"] = "sqlite:///database.db"
-app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
-app.config['UPLOAD_FOLDER'] = os.path.join(app.root_path, 'static', 'uploads')
-
-app.register_blueprint(auth_bp)
-db.init_app(app)
-migrate = Migrate(app, db)
-csrf = CSRFProtect(app)
 
-# ---------------- LOGIN MANAGER ----------------
+import click
+from flask import Flask
+from flask_login import LoginManager
+from flask_wtf import CSRFProtect
+from models import db
+from auth import auth_bp
+from views import main_bp, LANDING_COUNTS_KEY, LANDING_POOL_KEY, landing_counts, top_spot_pool
+from ratings import ratings_cli
+from search import search_cli, is_search_table
+from api import api_bp
+from api_v1 import api_v1_bp
+from loading import init_query_budget
+from instrumentation import init_instrumentation
+from admin import admin_bp
+from cache import cache, init_cache
+from uploads import init_uploads
+from images import init_images
+from assets import init_assets
+from fragments import init_fragments, warm_templates
+from streaming import init_streaming
+from recommendations import init_recommendations
+from ranking import init_ranking, prior_mean
+from ratelimit import init_ratelimit
+from identity import init_identity
+from stats import live_counts, init_stats
+from catalog import init_catalog
+from config import Config
+from database import init_database, dispose_engines
+
+
+# ---------------- EXTENSIONS ----------------
+# created unbound; create_app() binds them to each app
+csrf = CSRFProtect()
 login_manager = LoginManager()
 login_manager.login_view = "auth_bp.login"
-login_manager.init_app(app)
-
-@login_manager.user_loader
-def load_user(user_id):
-    return User.query.get(int(user_id))
-
-# ---------------- PUBLIC ROUTES ----------------
-@app.route("/")
-def index():
-    spots = Place.query.all()
-
-
-    users_count = User.query.count()
-    spots_count = Place.query.count()
-    categories_count = 8
-
-    for spot in spots:
-        if spot.ratings:
-            spot.avg_rating = round(sum(r.stars for r in spot.ratings)/len(spot.ratings), 1)
-        else:
-            spot.avg_rating = 0
-
-    top_spots = [s for s in spots if s.avg_rating >= 4]
-    random.shuffle(top_spots)
-    top_spots = top_spots[:10]
-
-    if not top_spots:
-        random.shuffle(spots)
-        top_spots = spots[:10]
-
-    categories = [
-        SimpleNamespace(name="მთები", icon="mountains.svg", count=18),
-        SimpleNamespace(name="ჩანჩქერები", icon="waterfall.svg", count=12),
-        SimpleNamespace(name="ისტორიული", icon="historic.svg", count=15),
-        SimpleNamespace(name="ტყეები", icon="forest.svg", count=10),
-        SimpleNamespace(name="ხედები", icon="view.svg", count=22),
-        SimpleNamespace(name="ლაშქრობა", icon="camp.svg", count=8),
-        SimpleNamespace(name="ტბები", icon="lakes.svg", count=6),
-        SimpleNamespace(name="მზის ამოსვლა", icon="sunset.svg", count=9),
-    ]
-
-    stats = SimpleNamespace(
-        spots=len(top_spots),
-        regions=12,
-        visitors=1200
-    )
-
-    return render_template(
-        "index.html",
-        spots=top_spots,
-        categories=categories,
-        stats=stats,
-        users_count=users_count,
-        spots_count=spots_count,
-        categories_count=categories_count
-    )
-# ---------------- LOGGED-IN ROUTES ----------------
-@app.route("/home")
-@login_required
-def home():
-    places = Place.query.all()
-
-    suggested_places = random.sample(places, min(10, len(places)))
-
-    for place in suggested_places:
-        if place.ratings:
-            place.avg_rating = round(sum(r.stars for r in place.ratings) / len(place.ratings), 1)
-        else:
-            place.avg_rating = 0
-
-    user_favorites = current_user.favorites
-    max_favorites = 6
-    if len(user_favorites) > max_favorites:
-        favorites_to_show = random.sample(user_favorites, max_favorites)
-
-        for fav in favorites_to_show:
-            if fav.ratings:
-                fav.avg_rating = round(sum(r.stars for r in fav.ratings) / len(fav.ratings), 1)
-            else:
-                fav.avg_rating = 0
-
-    else:
-        favorites_to_show = user_favorites
-
-    user_favorite_ids = [p.id for p in current_user.favorites]
-
-    planned_count = PlannedRoute.query.filter_by(user_id=current_user.id).count()
-
-    return render_template(
-        "home.html",
-        places=places,
-        suggested_places=suggested_places,
-        favorites_to_show=favorites_to_show,
-        user_favorite_ids=user_favorite_ids,
-        planned_count=planned_count
-    )
-
-@app.route("/profile")
-@login_required
-def profile():
-    favorites = current_user.favorites
-    planned_routes = PlannedRoute.query.filter_by(user_id=current_user.id).all()
-    avg_rating = current_user.calculate_avg_rating()
-    return render_template(
-        "profile.html",
-        favorites=favorites,
-        planned_routes=planned_routes,
-        avg_rating=avg_rating
-    )
-
-@app.route("/delete_route/<int:route_id>", methods=["POST"])
-@login_required
-def delete_route(route_id):
-    route = PlannedRoute.query.get_or_404(route_id)
-
-    if route.user_id != current_user.id and not current_user.is_admin:
-        abort(403)
-
-    db.session.delete(route)
-    db.session.commit()
-    flash("მარშრუტი წაიშალა", "success")
-    return redirect(url_for("profile"))
-
-
-@app.route("/delete_place/<int:place_id>", methods=["POST"])
-@login_required
-def delete_place(place_id):
-    if not current_user.is_admin:
-        abort(403)
-
-    place = Place.query.get_or_404(place_id)
-    db.session.delete(place)
-    db.session.commit()
-    flash("Place deleted", "success")
-    return redirect(url_for("categories"))
-
-
-@app.route("/map")
-def map_page():
-    places = Place.query.filter(
-        Place.latitude.isnot(None),
-        Place.longitude.isnot(None)
-    ).all()
-    return render_template("map.html", places=places)
-
-@app.route("/categories")
-@login_required
-def categories():
-    search_query = request.args.get("q", "").strip()
-    selected_category = request.args.get("category", "").strip()
-    min_rating = request.args.get("rating", "").strip()
-    selected_region = request.args.get("region", "").strip()
-    favorites_only = request.args.get("favorites_only", "").strip()
-
-    region_map = {
-        "Tbilisi": "თბილისი",
-        "Adjara": "აჭარა",
-        "Abkhazia": "აფხაზეთი",
-        "Samegrelo": "სამეგრელო",
-        "Guria": "გურია",
-        "Imereti": "იმერეთი",
-        "Kakheti": "კახეთი",
-        "Racha-Lechkhumi": "რაჭა-ლეჩხუმი",
-        "Mtskheta-Mtianeti": "მცხეთა-მთიანეთი",
-        "Samtskhe-Javakheti": "სამცხე-ჯავახეთი",
-        "Svaneti": "სვანეთი",
-        "Shida Kartli": "შიდა ქართლი",
-        "Kvemo Kartli": "ქვემო ქართლი"
-    }
-
-    places = Place.query.all()
-    filtered = []
-
-    for place in places:
-        avg = round(sum(r.stars for r in place.ratings)/len(place.ratings), 1) if place.ratings else 0
-        place.avg_rating = avg
 
-        # Rating filter
-        if min_rating:
-            if avg < float(min_rating):
-                continue
 
-        # Category filter
-        if selected_category and place.category != selected_category:
-            continue
-
-        # Region filter
-        if selected_region and place.region != selected_region:
-            continue
-
-        # Favorites filter
-        if favorites_only == "on" and place.id not in [p.id for p in current_user.favorites]:
-            continue
-
-        # Search filter
-        if search_query and search_query.lower() not in place.name.lower():
-            continue
-
-        filtered.append(place)
-
-    categories_list = [c[0] for c in db.session.query(Place.category).distinct()]
-    regions_list = [(code, name) for code, name in region_map.items() if any(p.region == code for p in places)]
-
-    return render_template(
-        "categories.html",
-        places=filtered,
-        categories_list=categories_list,
-        regions_list=regions_list,
-        selected_category=selected_category,
-        min_rating=min_rating,
-        selected_region=selected_region,
-        favorites_only=favorites_only,
-        search_query=search_query
-    )
-
-@app.route("/add-place", methods=["GET", "POST"])
-@login_required
-def add_place():
-    form = PlaceForm()
-    if form.validate_on_submit():
-        # Handle image upload
-        filename = None
-        if form.image.data:
-            filename = secure_filename(form.image.data.filename)
-            upload_path = os.path.join(app.config['UPLOAD_FOLDER'], filename)
-            form.image.data.save(upload_path)
-
-        # Get coordinates from form
-        latitude = request.form.get("latitude")
-        longitude = request.form.get("longitude")
-
-        print("LAT:", latitude, "LNG:", longitude)
-
-        if not latitude or not longitude:
-            flash("გთხოვ აირჩიე ადგილი რუკაზე", "danger")
-            return redirect(request.url)
-
-        # Create Place
-        place = Place(
-            name=form.name.data,
-            description=form.description.data,
-            category=form.category.data,
-            region=form.region.data,
-            image=filename,
-            latitude=float(latitude),
-            longitude=float(longitude)
-        )
-
-        db.session.add(place)
-        db.session.commit()
-        flash("Place added successfully!", "success")
-        return redirect(url_for("categories"))
-
-    return render_template("add-place.html", form=form)
-
-
-@app.route('/delete_rating/<int:rating_id>', methods=['POST'])
-@login_required
-def delete_rating(rating_id):
-    rating = Rating.query.get_or_404(rating_id)
-
-    if rating.user_id != current_user.id and not current_user.is_admin:
-        return jsonify({'status': 'error', 'message': 'Unauthorized'}), 403
-
-    try:
-        db.session.delete(rating)
-        db.session.commit()
-        return jsonify({'status': 'success'})
-    except Exception as e:
-        db.session.rollback()
-        return jsonify({'status': 'error', 'message': str(e)}), 500
-
-@app.route("/place/<int:place_id>", methods=["GET", "POST"])
-@login_required
-def place_detail(place_id):
-    place = Place.query.get_or_404(place_id)
-
-    if request.method == "POST":
-        action = request.form.get("action")
-        if action == "favorite":
-            if place in current_user.favorites:
-                current_user.favorites.remove(place)
-            else:
-                current_user.favorites.append(place)
-
-        elif action == "route":
-            existing_route = PlannedRoute.query.filter_by(user_id=current_user.id, place_id=place.id).first()
-            if not existing_route:
-                planned_route = PlannedRoute(user_id=current_user.id, place_id=place.id, date=datetime.utcnow())
-                db.session.add(planned_route)
-
-        elif action == "rating":
-            stars = float(request.form.get("stars"))
-            comment = request.form.get("comment")
-            image_file = request.files.get("image")
-            filename = None
-            if image_file and image_file.filename != "":
-                filename = secure_filename(image_file.filename)
-                image_file.save(os.path.join(app.config['UPLOAD_FOLDER'], filename))
-            new_rating = Rating(user_id=current_user.id, place_id=place.id, stars=stars, comment=comment, image=filename)
-            db.session.add(new_rating)
-
-        db.session.commit()
-        return redirect(url_for("place_detail", place_id=place.id))
-
-    avg_rating = round(sum(r.stars for r in place.ratings)/len(place.ratings), 1) if place.ratings else 0
-    return render_template("place_detail.html", place=place, ratings=place.ratings, avg_rating=avg_rating)
-
-@app.route("/category/<string:category_name>")
-@login_required
-def category_places(category_name):
-    suggested_places = Place.query.filter_by(category=category_name).all()
-    user_favorite_ids = [p.id for p in current_user.favorites]
-    return render_template(
-        "dashboard.html",
-        suggested_places=suggested_places,
-        user_favorite_ids=user_favorite_ids
-    )
-
-@app.route("/toggle_favorite/<int:place_id>", methods=["POST"])
-@login_required
-def toggle_favorite(place_id):
-    place = Place.query.get_or_404(place_id)
-    if place in current_user.favorites:
-        current_user.favorites.remove(place)
-        db.session.commit()
-        return {"status": "removed"}
-    else:
-        current_user.favorites.append(place)
-        db.session.commit()
-        return {"status": "added"}
-
-
-@app.route('/booking', methods=['GET', 'POST'])
-@login_required
-def booking():
-    spots = Place.query.all()
-
-    if request.method == 'POST':
-        spot_name = request.form['spot']
-        date_selected = request.form['date']
-        name = request.form['name']
-        email = request.form['email']
-        phone = request.form['phone']
-
-        # Find the Spot in DB
-        spot = Place.query.filter_by(name=spot_name).first()
-        if not spot:
-            flash("აირჩიე ვალიდური ადგილი!", "danger")
-            return redirect(url_for('booking'))
-
-        # Save the booking to PlannedRoute
-        new_route = PlannedRoute(
-            user_id=current_user.id,
-            place_id=spot.id,
-            date=datetime.strptime(date_selected, "%Y-%m-%d")
-        )
-        db.session.add(new_route)
-        db.session.commit()
-
-        flash("თქვენი შეკვეთა წარმატებით გაიგზავნა!", "success")
-        return redirect(url_for('profile'))
-
-    return render_template("booking.html", spots=spots)
-
-
-@app.route("/contact", methods=["GET", "POST"])
-def contact():
-    if request.method == "POST":
-        name = request.form["   name"]
-        email = request.form["email"]
-        subject = request.form["subject"]
-        message = request.form["message"]
-
-        flash("შეტყობინება გაგზავნილია!", "success")
-        return redirect(url_for("contact"))
-
-    return render_template("contact.html")
+def include_in_migrations(name, type_, parent_names):
+    # the FTS5 table is managed by search.py, not Alembic
+    return not (type_ == "table" and is_search_table(name))
+
+
+def _init_migrations(app):
+    # Flask-Migrate pulls in Alembic (~140 ms, several MB per worker) and is
+    # only used by `flask db ...`, so web workers skip it
+    if click.get_current_context(silent=True) is None:
+        return
+    from flask_migrate import Migrate
+    Migrate(app, db, render_as_batch=True, include_name=include_in_migrations)
+
+
+# ---------------- FACTORY ----------------
+def create_app(config=Config):
+    """Build a configured app. Nothing here opens a database connection."""
+    app = Flask(__name__, template_folder='templates')
+    app.config.from_object(config)
+    app.config.setdefault('UPLOAD_FOLDER', os.path.join(app.root_path, 'static', 'uploads'))
+
+    db.init_app(app)
+    init_database(app)
+    _init_migrations(app)
+    csrf.init_app(app)
+    login_manager.init_app(app)
+    init_identity(app, login_manager)
+
+    app.register_blueprint(main_bp)
+    app.register_blueprint(auth_bp)
+    app.register_blueprint(api_bp)
+    app.register_blueprint(api_v1_bp)
+    app.register_blueprint(admin_bp)
+    app.cli.add_command(ratings_cli)
+    app.cli.add_command(search_cli)
+
+    init_instrumentation(app)
+    init_cache(app)
+    init_query_budget(app)
+    init_uploads(app)
+    init_images(app)
+    init_assets(app)
+    init_streaming(app)   # before init_fragments: base.html uses {% flush %}
+    init_fragments(app)
+    init_recommendations(app)
+    init_ranking(app)
+    init_ratelimit(app)
+    init_stats(app)
+    init_catalog(app)
+    return app
+
+
+# ---------------- WARM-UP ----------------
+def warm_up(app):
+    """Do the first-request work once, before gunicorn forks (see gunicorn.conf.py).
+
+    Compiled templates and the per-worker cache entries are inherited by
+    every worker copy-on-write. The connections used for priming are closed
+    afterwards so no worker starts out sharing a socket with its parent.
+    """
+    if not app.config.get("TEMPLATE_WARMUP"):
+        warm_templates(app)   # init_fragments already did it otherwise
+    with app.app_context():
+        try:
+            cache.get_or_set(LANDING_COUNTS_KEY, landing_counts)
+            cache.get_or_set(LANDING_POOL_KEY, top_spot_pool)
+            live_counts()
+            prior_mean()
+        except Exception:
+            # a database that isn't migrated yet must not keep the server down
+            app.logger.exception("cache priming failed, continuing cold")
+        finally:
+            db.session.remove()
+        dispose_engines()
 
 
 if __name__ == "__main__":
+    app = create_app()
     with app.app_context():
         db.create_all()
     app.run(debug=True)
@@ -0,0 +1,230 @@
+import gzip
+import hashlib
+import json
+import mimetypes
+import os
+import re
+import shutil
+
+import click
+from flask import current_app, request, send_from_directory, url_for
+from flask.cli import AppGroup
+from flask.sessions import SecureCookieSessionInterface
+
+
+assets_cli = AppGroup("assets", help="Build fingerprinted, precompressed static assets.")
+
+DIST_DIR = "dist"
+MANIFEST_NAME = "manifest.json"
+SKIP_DIRS = {"uploads", DIST_DIR}
+FINGERPRINT_TYPES = {".css", ".js", ".svg", ".png", ".jpg", ".jpeg", ".gif", ".webp", ".ico", ".mp4", ".woff", ".woff2"}
+COMPRESS_TYPES = {".css", ".js", ".svg", ".ico"}
+IMMUTABLE_MAX_AGE = 365 * 24 * 3600
+
+# page -> stylesheets it links, in cascade order
+BUNDLES = {
+    "site": ["css/reset.css", "css/index.css"],
+    "main": ["css/index.css"],
+    "home": ["css/index.css", "css/dashboard.css"],
+    "categories": ["css/index.css", "css/dashboard.css", "css/categories.css"],
+    "place": ["css/reset.css", "css/index.css", "css/dashboard.css"],
+    "profile": ["css/reset.css", "css/index.css", "css/dashboard.css", "css/profile.css"],
+    "contact": ["css/reset.css", "css/index.css", "css/dashboard.css", "css/contact.css"],
+    "booking": ["css/reset.css", "css/index.css", "css/booking.css"],
+    "map": ["css/reset.css", "css/index.css", "css/map.css"],
+}
+
+_manifest = {}
+_build = {"version": ""}   # hash of the loaded manifest, "" without a build
+
+_CSS_URL = re.compile(r"""url\(\s*(['"]?)([^'")]+)\1\s*\)""")
+
+
+# ---------------- BUILD ----------------
+def minify_css(css):
+    css = re.sub(r"/\*.*?\*/", "", css, flags=re.S)
+    css = re.sub(r"\s+", " ", css)
+    css = re.sub(r"\s*([{};,>])\s*", r"\1", css)
+    return css.replace(";}", "}").strip()
+
+
+def _fingerprint(logical, content):
+    stem, ext = os.path.splitext(logical)
+    return f"{DIST_DIR}/{stem}.{hashlib.sha256(content).hexdigest()[:10]}{ext}"
+
+
+def _rewrite_urls(css, css_path, files, static_url):
+    """Point url(...) references at the fingerprinted copies."""
+    base = os.path.dirname(css_path)
+
+    def replace(match):
+        target = match.group(2)
+        if re.match(r"^(?:[a-z]+:|/|#)", target):
+            return match.group(0)
+        logical = os.path.normpath(os.path.join(base, target)).replace(os.sep, "/")
+        built = files.get(logical)
+        return f"url({static_url}/{built})" if built else match.group(0)
+
+    return _CSS_URL.sub(replace, css)
+
+
+def _write(static_folder, built, content):
+    path = os.path.join(static_folder, built)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "wb") as fh:
+        fh.write(content)
+    if os.path.splitext(built)[1] not in COMPRESS_TYPES:
+        return {}
+    sizes = {"gzip": _write_variant(path + ".gz", gzip.compress(content, 9, mtime=0))}
+    try:
+        import brotli  # optional, .br files are only written when it's installed
+    except ImportError:
+        return sizes
+    sizes["br"] = _write_variant(path + ".br", brotli.compress(content, quality=11))
+    return sizes
+
+
+def _write_variant(path, data):
+    with open(path, "wb") as fh:
+        fh.write(data)
+    return len(data)
+
+
+def build_assets(static_folder, static_url):
+    """Write dist/ with hashed copies, bundles and manifest; returns the per-page report."""
+    dist = os.path.join(static_folder, DIST_DIR)
+    shutil.rmtree(dist, ignore_errors=True)
+
+    sources = {}
+    for root, dirs, names in os.walk(static_folder):
+        dirs[:] = [d for d in dirs if os.path.relpath(os.path.join(root, d), static_folder) not in SKIP_DIRS]
+        for name in names:
+            if os.path.splitext(name)[1].lower() in FINGERPRINT_TYPES:
+                path = os.path.join(root, name)
+                sources[os.path.relpath(path, static_folder).replace(os.sep, "/")] = path
+
+    files = {}
+    minified = {}
+    # everything CSS can point at first, so the stylesheets can be rewritten
+    for logical in sorted(sources, key=lambda name: name.endswith(".css")):
+        with open(sources[logical], "rb") as fh:
+            content = fh.read()
+        if logical.endswith(".css"):
+            css = _rewrite_urls(content.decode("utf-8"), logical, files, static_url)
+            minified[logical] = css = minify_css(css)
+            content = css.encode("utf-8")
+        files[logical] = _fingerprint(logical, content)
+        _write(static_folder, files[logical], content)
+
+    bundles = {}
+    report = []
+    for name, members in BUNDLES.items():
+        content = "\n".join(minified[member] for member in members).encode("utf-8")
+        bundles[name] = _fingerprint(f"bundles/{name}.css", content)
+        compressed = _write(static_folder, bundles[name], content)
+        report.append({
+            "page": name,
+            "requests_before": len(members),
+            "bytes_before": sum(os.path.getsize(sources[member]) for member in members),
+            "bytes_minified": len(content),
+            **{f"bytes_{encoding}": size for encoding, size in compressed.items()},
+        })
+
+    with open(os.path.join(dist, MANIFEST_NAME), "w", encoding="utf-8") as fh:
+        json.dump({"files": files, "bundles": bundles}, fh, indent=2, sort_keys=True)
+    return report
+
+
+def load_manifest(static_folder):
+    _manifest.clear()
+    _build["version"] = ""
+    try:
+        with open(os.path.join(static_folder, DIST_DIR, MANIFEST_NAME), "rb") as fh:
+            raw = fh.read()
+        _manifest.update(json.loads(raw))
+    except (OSError, ValueError):
+        return
+    _build["version"] = hashlib.sha256(raw).hexdigest()[:10]
+
+
+def build_version():
+    """Changes whenever `flask assets build` produces different URLs."""
+    return _build["version"]
+
+
+@assets_cli.command("build")
+def build_command():
+    """Fingerprint and precompress static/, bundle the page CSS and print the savings."""
+    app = current_app
+    report = build_assets(app.static_folder, app.static_url_path)
+    load_manifest(app.static_folder)
+
+    click.echo(f"{'page':<12}{'requests':>10}{'original':>10}{'minified':>10}{'gzip':>8}{'br':>8}{'saved':>8}")
+    for row in report:
+        wire = row.get("bytes_br", row["bytes_gzip"])
+        saved = 1 - wire / row["bytes_before"]
+        click.echo(
+            f"{row['page']:<12}{row['requests_before']:>7} -> 1{row['bytes_before']:>10}"
+            f"{row['bytes_minified']:>10}{row['bytes_gzip']:>8}{row.get('bytes_br', '-'):>8}{saved:>8.0%}"
+        )
+    click.echo(f"Wrote {len(_manifest['files'])} files and {len(_manifest['bundles'])} bundles to static/{DIST_DIR}.")
+
+
+# ---------------- SERVING ----------------
+def stylesheet_urls(bundle):
+    """One bundled URL once `flask assets build` has run, the separate files before that."""
+    built = _manifest.get("bundles", {}).get(bundle)
+    if built:
+        return [url_for("static", filename=built)]
+    return [url_for("static", filename=member) for member in BUNDLES[bundle]]
+
+
+def _fingerprinted_url(endpoint, values):
+    if endpoint == "static" and _manifest:
+        built = _manifest["files"].get(values.get("filename"))
+        if built:
+            values["filename"] = built
+
+
+def serve_static(filename):
+    """Static view: hashed dist/ files are immutable and served precompressed when accepted."""
+    app = current_app
+    if not filename.startswith(DIST_DIR + "/"):
+        return app.send_static_file(filename)
+
+    mimetype = mimetypes.guess_type(filename)[0]
+    for encoding, suffix in (("br", ".br"), ("gzip", ".gz")):
+        if request.accept_encodings[encoding] and os.path.exists(os.path.join(app.static_folder, filename + suffix)):
+            response = send_from_directory(
+                app.static_folder, filename + suffix, mimetype=mimetype, max_age=IMMUTABLE_MAX_AGE
+            )
+            response.headers["Content-Encoding"] = encoding
+            break
+    else:
+        response = send_from_directory(app.static_folder, filename, max_age=IMMUTABLE_MAX_AGE)
+    response.vary.add("Accept-Encoding")
+    response.cache_control.public = True
+    response.cache_control.immutable = True
+    return response
+
+
+class StaticSessionInterface(SecureCookieSessionInterface):
+    """Cookie sessions that leave static responses alone.
+
+    Flask-Login reads the session on every request, which would add
+    Vary: Cookie and stop shared caches from storing the immutable assets.
+    """
+
+    def save_session(self, app, session, response):
+        if request.endpoint == "static" and not session.modified:
+            return
+        super().save_session(app, session, response)
+
+
+def init_assets(app):
+    load_manifest(app.static_folder)
+    app.url_defaults(_fingerprinted_url)
+    app.view_functions["static"] = serve_static
+    app.session_interface = StaticSessionInterface()
+    app.add_template_global(stylesheet_urls)
+    app.cli.add_command(assets_cli)
@@ -1,7 +1,9 @@
-from flask import Blueprint, render_template, redirect, url_for, flash, request
+from flask import Blueprint, current_app, render_template, redirect, url_for, flash, request
 from flask_login import login_user, logout_user, login_required, current_user
 from models import db, User
 from forms import RegistrationForm, LoginForm
+from passwords import burn_verify
+from ratelimit import limiter
 
 auth_bp = Blueprint('auth_bp', __name__, template_folder='templates')
 
@@ -9,7 +11,7 @@ auth_bp = Blueprint('auth_bp', __name__, template_folder='templates')
 @auth_bp.route('/register', methods=['GET', 'POST'])
 def register():
     if current_user.is_authenticated:
-        return redirect(url_for('home'))
+        return redirect(url_for('main.home'))
 
     form = RegistrationForm()
 
@@ -38,19 +40,42 @@ def register():
 
 
 # ------------------- Login -------------------
+def _too_many_attempts(form, retry_after):
+    flash(f'Too many login attempts. Try again in {retry_after} seconds.', 'danger')
+    response = current_app.make_response((render_template('auth.html', form=form), 429))
+    response.headers['Retry-After'] = str(retry_after)
+    return response
+
+
 @auth_bp.route('/login', methods=['GET', 'POST'])
 def login():
     if current_user.is_authenticated:
-        return redirect(url_for('home'))
+        return redirect(url_for('main.home'))
 
     form = LoginForm()
+    # both buckets are checked before the user lookup and the (deliberately slow) hash
+    if request.method == 'POST':
+        retry_after = limiter.hit('login:ip:' + (request.remote_addr or ''), current_app.config['LOGIN_RATE_PER_IP'])
+        if retry_after:
+            return _too_many_attempts(form, retry_after)
     if form.validate_on_submit():
+        account_key = 'login:account:' + form.email.data.strip().lower()
+        retry_after = limiter.hit(account_key, current_app.config['LOGIN_RATE_PER_ACCOUNT'])
+        if retry_after:
+            return _too_many_attempts(form, retry_after)
+
         user = User.query.filter_by(email=form.email.data).first()
-        if user and user.check_password(form.password.data):
+        if user is None:
+            burn_verify(form.password.data)
+        elif user.check_password(form.password.data):
+            limiter.reset(account_key)
+            if user.password_needs_rehash():
+                user.set_password(form.password.data)
+                db.session.commit()
             login_user(user)
             flash('Login successful!', 'success')
             next_page = request.args.get('next')
-            return redirect(next_page or url_for('home'))
+            return redirect(next_page or url_for('main.home'))
         flash('Invalid email or password.', 'danger')
 
     return render_template('auth.html', form=form)
@@ -69,7 +94,8 @@ def logout():
 @auth_bp.route('/delete-account', methods=['POST'])
 @login_required
 def delete_account():
-    user = current_user
+    # current_user is a cached snapshot, not a row that can be deleted
+    user = db.session.get(User, current_user.id)
 
     # logout FIRST (important)
     logout_user()
@@ -79,4 +105,4 @@ def delete_account():
     db.session.commit()
 
     flash('Your account has been permanently deleted.', 'info')
-    return redirect(url_for('index'))
+    return redirect(url_for('main.index'))
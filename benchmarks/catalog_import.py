@@ -0,0 +1,119 @@
+"""Rows per second of `flask places import/export` against one commit per place.
+
+    python benchmarks/catalog_import.py --rows 100000 --format csv
+    python benchmarks/catalog_import.py --rows 20000 --chunk-sizes 100 1000 5000
+
+Writes --rows synthetic places to a temporary file in --format, then
+against an empty SQLite file (or DATABASE_URL, whose tables are dropped):
+- orm: --orm-rows of them added through the ORM, one commit each, the
+  way the add_place form does it;
+- insert: the whole file through catalog.import_places, per chunk size;
+- reimport: the same file again, every row unchanged;
+- update: every description changed, so every row is an UPDATE;
+- export: the catalog back out, with the peak Python heap (tracemalloc)
+  to show memory stays flat however many rows go through.
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+sys.path.insert(0, BENCH_DIR)
+
+
+def synthetic_rows(count, rng, suffix=""):
+    from catalog import CATEGORIES, REGIONS
+    categories, regions = sorted(CATEGORIES), sorted(REGIONS)
+    for i in range(count):
+        yield {
+            "name": f"imported place {i}",
+            "description": f"synthetic import {i}{suffix} " * 4,
+            "category": categories[i % len(categories)],
+            "region": regions[i % len(regions)],
+            "image": None,
+            "latitude": rng.uniform(41.0, 43.5),
+            "longitude": rng.uniform(40.0, 46.5),
+        }
+
+
+def write_file(path, fmt, rows):
+    from catalog import _WRITERS, FIELDS
+    with open(path, "w", encoding="utf-8", newline="") as fh:
+        for piece in _WRITERS[fmt](tuple(row[field] for field in FIELDS) for row in rows):
+            fh.write(piece)
+
+
+def timed_import(path, fmt, chunk_size):
+    from catalog import import_places
+    with open(path, "rb") as stream:
+        return import_places(stream, fmt, chunk_size)
+
+
+def orm_rows_per_sec(rows):
+    from models import db, Place
+    started = time.perf_counter()
+    count = 0
+    for row in rows:
+        db.session.add(Place(**row))
+        db.session.commit()
+        count += 1
+    return count / (time.perf_counter() - started)
+
+
+def export_stats(fmt):
+    from catalog import TransferReport, export_places
+    report = TransferReport()
+    tracemalloc.start()
+    try:
+        size = sum(len(chunk) for chunk in export_places(fmt, report=report))
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return report.finish(), size, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=50_000)
+    parser.add_argument("--format", dest="fmt", choices=("csv", "ndjson", "geojson"), default="ndjson")
+    parser.add_argument("--chunk-sizes", type=int, nargs="+", default=[1000])
+    parser.add_argument("--orm-rows", type=int, default=1000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ.setdefault("DATABASE_URL", "sqlite:///" + os.path.join(tmp, "catalog.db"))
+        from app import create_app
+        from models import db
+        app = create_app()
+        data_path = os.path.join(tmp, "places." + args.fmt)
+        changed_path = os.path.join(tmp, "changed." + args.fmt)
+        write_file(data_path, args.fmt, synthetic_rows(args.rows, random.Random(1)))
+        write_file(changed_path, args.fmt, synthetic_rows(args.rows, random.Random(1), suffix=" v2"))
+
+        print(f"{'step':<26}{'rows':>9}{'rows/s':>11}{'inserted':>10}{'updated':>9}{'unchanged':>10}")
+        with app.app_context():
+            db.drop_all()
+            db.create_all()
+            orm = orm_rows_per_sec(synthetic_rows(args.orm_rows, random.Random(2), suffix=" orm"))
+            print(f"{'orm, commit per row':<26}{args.orm_rows:>9}{orm:>11,.0f}")
+
+            for chunk_size in args.chunk_sizes:
+                db.drop_all()
+                db.create_all()
+                for step, path in (("insert", data_path), ("reimport", data_path), ("update", changed_path)):
+                    report = timed_import(path, args.fmt, chunk_size)
+                    print(f"{step + f', chunks of {chunk_size}':<26}{report.rows:>9}{report.rows_per_sec:>11,.0f}"
+                          f"{report.inserted:>10}{report.updated:>9}{report.unchanged:>10}")
+
+            report, size, peak = export_stats(args.fmt)
+            print(f"{'export':<26}{report.rows:>9}{report.rows_per_sec:>11,.0f}"
+                  f"   {size / 1e6:.1f} MB written, peak heap {peak / 1024:,.0f} KB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+"""SQL statements and latency per logged-in page, with and without the identity cache.
+
+    python benchmarks/identity_cache.py --requests 200
+
+Seeds seed_data.py into a temporary SQLite file and requests each page as
+one logged-in user. "uncached" sizes the identity LRU to zero, so every
+request loads the user and their favorite ids again the way the ORM
+user_loader used to; "cached" is the default configuration. Statement
+counts come from the Server-Timing header that instrumentation.py adds.
+"""
+import argparse
+import os
+import re
+import sys
+import tempfile
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+sys.path.insert(0, BENCH_DIR)
+
+import seed_data
+from loadtest import login_state, percentile
+
+_QUERIES = re.compile(r'desc="(\d+) queries"')
+
+
+def pages(data):
+    return {
+        "home": "/home",
+        "profile": "/profile",
+        "categories": "/categories",
+        "place_detail": f"/place/{data['hot_place_id']}",
+        "api_me": "/api/v1/me",
+    }
+
+
+def measure(client, path, requests):
+    latencies, queries = [], []
+    for _ in range(requests):
+        started = time.perf_counter()
+        response = client.get(path)
+        latencies.append((time.perf_counter() - started) * 1000)
+        if response.status_code != 200:
+            raise RuntimeError(f"{path} returned {response.status_code}")
+        match = _QUERIES.search(response.headers.get("Server-Timing", ""))
+        queries.append(int(match.group(1)) if match else 0)
+    return sum(queries) / len(queries), percentile(latencies, 50)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=100, help="requests per page and mode")
+    seed_data.add_arguments(parser)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ["DATABASE_URL"] = "sqlite:///" + os.path.join(tmp, "identity.db")
+        from app import create_app
+        import identity
+        import logging
+        logging.getLogger("greenspots.slow").disabled = True
+        app = create_app()
+
+        with app.app_context():
+            data = seed_data.seed(**seed_data.seed_args(args))
+        cookie, _ = login_state(app, data["user_ids"][0])
+        client = app.test_client()
+        client.set_cookie(app.config["SESSION_COOKIE_NAME"], cookie)
+
+        size = identity._snapshots.max_entries
+        results = {}
+        for mode, entries in (("uncached", 0), ("cached", size)):
+            identity._snapshots.clear()
+            identity._snapshots.max_entries = entries
+            results[mode] = {name: measure(client, path, args.requests) for name, path in pages(data).items()}
+        identity._snapshots.max_entries = size
+
+    print(f"{'page':<14}{'queries before':>16}{'queries after':>15}{'p50 before ms':>15}{'p50 after ms':>14}")
+    for name in pages(data):
+        (q_before, ms_before), (q_after, ms_after) = results["uncached"][name], results["cached"][name]
+        print(f"{name:<14}{q_before:>16.2f}{q_after:>15.2f}{ms_before:>15.2f}{ms_after:>14.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,308 @@
+"""Load test the main routes in-process and behind gunicorn, against JSON baselines.
+
+    python benchmarks/loadtest.py                                  # Flask test client
+    python benchmarks/loadtest.py --target gunicorn --workers 4 --concurrency 16
+    python benchmarks/loadtest.py --save-baseline                  # writes baselines/<target>.json
+    python benchmarks/loadtest.py --check                          # exit 1 on a regression
+
+Data comes from seed_data.py (a temporary SQLite file unless DATABASE_URL
+is set, in which case every table in it is dropped). Each scenario gets
+--warmup unrecorded requests, then --requests recorded ones. The report
+shows p50/p95/p99 latency, SQL statements per request (from the
+Server-Timing header that instrumentation.py adds) and the RSS of the
+serving processes.
+
+--check fails a scenario when:
+- its p95 grew by more than --latency-tolerance;
+- it runs more queries per request than before;
+- any request failed;
+- RSS grew by more than --rss-tolerance.
+
+Latency baselines are only comparable on the machine that wrote them.
+Regenerate them there with --save-baseline after an intended change.
+"""
+import argparse
+import http.client
+import json
+import os
+import random
+import re
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlencode
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, ROOT)
+sys.path.insert(0, BENCH_DIR)
+
+import seed_data
+
+BASELINE_DIR = os.path.join(BENCH_DIR, "baselines")
+_QUERIES = re.compile(r'desc="(\d+) queries"')
+
+
+# ---------------- SCENARIOS ----------------
+# name -> (needs login, build(data, rng) -> (method, path))
+SCENARIOS = {
+    "index": (False, lambda data, rng: ("GET", "/")),
+    "home": (True, lambda data, rng: ("GET", "/home")),
+    "categories": (True, lambda data, rng: ("GET", "/categories?" + urlencode({
+        "category": rng.choice(data["categories"]), "region": rng.choice(data["regions"]), "rating": 3,
+    }))),
+    "place_detail": (True, lambda data, rng: ("GET", f"/place/{data['hot_place_id']}")),
+    "toggle_favorite": (True, lambda data, rng: ("POST", f"/toggle_favorite/{rng.choice(data['place_ids'])}")),
+    "map_page": (False, lambda data, rng: ("GET", "/map")),
+}
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))] if ordered else 0.0
+
+
+def rss_mb(pid):
+    try:
+        with open(f"/proc/{pid}/status") as fh:
+            for line in fh:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return 0.0
+
+
+def login_state(app, user_id):
+    """A signed session cookie for user_id and a CSRF token valid for it."""
+    from flask import session
+    from flask_wtf.csrf import generate_csrf
+
+    with app.test_request_context():
+        session["_user_id"] = str(user_id)
+        session["_fresh"] = True
+        token = generate_csrf()
+        return app.session_interface.get_signing_serializer(app).dumps(dict(session)), token
+
+
+# ---------------- TARGETS ----------------
+class ClientTarget:
+    """The app in this process, driven through Flask's test client one request at a time."""
+
+    name = "client"
+    concurrency = 1
+
+    def __init__(self, app, cookie):
+        self.anonymous = app.test_client()
+        self.user = app.test_client()
+        self.user.set_cookie(app.config["SESSION_COOKIE_NAME"], cookie)
+
+    def request(self, method, path, login, headers):
+        client = self.user if login else self.anonymous
+        response = client.open(path, method=method, headers=headers)
+        return response.status_code, response.headers.get("Server-Timing", "")
+
+    def rss_mb(self):
+        return rss_mb(os.getpid())
+
+    def stop(self):
+        pass
+
+
+class GunicornTarget:
+    """gunicorn sync workers on a local port, driven by a thread pool of keep-alive clients."""
+
+    name = "gunicorn"
+
+    def __init__(self, cookie_name, cookie, workers, concurrency):
+        self.concurrency = concurrency
+        self.cookie = f"{cookie_name}={cookie}"
+        with socket.socket() as sock:
+            sock.bind(("127.0.0.1", 0))
+            self.port = sock.getsockname()[1]
+        self.process = subprocess.Popen(
+            [sys.executable, "-m", "gunicorn", "--workers", str(workers), "--bind", f"127.0.0.1:{self.port}",
+             "--log-level", "warning", "app:create_app()"],
+            cwd=ROOT,
+        )
+        self._local = threading.local()
+        self._wait_until_ready()
+
+    def _wait_until_ready(self, timeout=30):
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if self.process.poll() is not None:
+                raise RuntimeError("gunicorn exited during startup")
+            try:
+                socket.create_connection(("127.0.0.1", self.port), timeout=0.5).close()
+                return
+            except OSError:
+                time.sleep(0.1)
+        raise RuntimeError("gunicorn did not start listening")
+
+    def request(self, method, path, login, headers):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._local.conn = http.client.HTTPConnection("127.0.0.1", self.port, timeout=30)
+        headers = dict(headers)
+        if login:
+            headers["Cookie"] = self.cookie
+        conn.request(method, path, headers=headers)
+        response = conn.getresponse()
+        response.read()
+        if response.getheader("Connection", "").lower() == "close":
+            conn.close()
+        return response.status, response.getheader("Server-Timing", "")
+
+    def rss_mb(self):
+        pids = [self.process.pid]
+        try:
+            with open(f"/proc/{self.process.pid}/task/{self.process.pid}/children") as fh:
+                pids += [int(pid) for pid in fh.read().split()]
+        except OSError:
+            pass
+        return sum(rss_mb(pid) for pid in pids)
+
+    def stop(self):
+        self.process.send_signal(signal.SIGTERM)
+        self.process.wait(timeout=30)
+
+
+# ---------------- RUN ----------------
+def run_scenario(target, name, data, requests, warmup, csrf_token, rng):
+    login, build = SCENARIOS[name]
+    headers = {"X-CSRFToken": csrf_token}
+    plans = [build(data, rng) for _ in range(warmup + requests)]
+
+    def one(plan):
+        method, path = plan
+        started = time.perf_counter()
+        try:
+            status, timing = target.request(method, path, login, headers)
+        except (OSError, http.client.HTTPException):
+            return (time.perf_counter() - started) * 1000, None, 0
+        match = _QUERIES.search(timing)
+        return (time.perf_counter() - started) * 1000, status, int(match.group(1)) if match else 0
+
+    with ThreadPoolExecutor(target.concurrency) as pool:
+        list(pool.map(one, plans[:warmup]))
+        started = time.perf_counter()
+        samples = list(pool.map(one, plans[warmup:]))
+        elapsed = time.perf_counter() - started
+
+    latencies = [ms for ms, _, _ in samples]
+    return {
+        "requests": len(samples),
+        "errors": sum(1 for _, status, _ in samples if status is None or status >= 400),
+        "rps": round(len(samples) / elapsed, 1),
+        "p50_ms": round(percentile(latencies, 50), 2),
+        "p95_ms": round(percentile(latencies, 95), 2),
+        "p99_ms": round(percentile(latencies, 99), 2),
+        "queries_per_request": round(sum(q for _, _, q in samples) / len(samples), 2),
+        "rss_mb": round(target.rss_mb(), 1),
+    }
+
+
+def compare(result, baseline, latency_tolerance, rss_tolerance):
+    """Human-readable regressions of result against baseline."""
+    problems = []
+    for name, now in result["scenarios"].items():
+        before = baseline["scenarios"].get(name)
+        if before is None:
+            continue
+        if now["errors"]:
+            problems.append(f"{name}: {now['errors']} failed requests")
+        if now["p95_ms"] > before["p95_ms"] * (1 + latency_tolerance):
+            problems.append(f"{name}: p95 {before['p95_ms']} -> {now['p95_ms']} ms")
+        if now["queries_per_request"] > before["queries_per_request"] + 0.01:
+            problems.append(f"{name}: queries/request {before['queries_per_request']} -> {now['queries_per_request']}")
+        if now["rss_mb"] > before["rss_mb"] * (1 + rss_tolerance):
+            problems.append(f"{name}: RSS {before['rss_mb']} -> {now['rss_mb']} MB")
+    return problems
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--target", choices=("client", "gunicorn"), default="client")
+    parser.add_argument("--workers", type=int, default=4, help="gunicorn workers")
+    parser.add_argument("--concurrency", type=int, default=8, help="parallel clients against gunicorn")
+    parser.add_argument("--requests", type=int, default=200, help="recorded requests per scenario")
+    parser.add_argument("--warmup", type=int, default=20)
+    parser.add_argument("--scenario", action="append", choices=sorted(SCENARIOS), help="run only these")
+    parser.add_argument("--output", help="also write the results JSON here")
+    parser.add_argument("--baseline", help="baseline file (default baselines/<target>.json)")
+    parser.add_argument("--save-baseline", action="store_true")
+    parser.add_argument("--check", action="store_true")
+    parser.add_argument("--latency-tolerance", type=float, default=0.5)
+    parser.add_argument("--rss-tolerance", type=float, default=0.25)
+    seed_data.add_arguments(parser)
+    args = parser.parse_args()
+
+    tmp = tempfile.TemporaryDirectory()
+    os.environ.setdefault("DATABASE_URL", "sqlite:///" + os.path.join(tmp.name, "loadtest.db"))
+    from app import create_app
+    app = create_app()
+    import logging
+    logging.getLogger("greenspots.slow").disabled = True
+
+    started = time.perf_counter()
+    with app.app_context():
+        data = seed_data.seed(**seed_data.seed_args(args))
+    print(f"seeded in {time.perf_counter() - started:.1f}s")
+    cookie, csrf_token = login_state(app, data["user_ids"][0])
+
+    if args.target == "gunicorn":
+        target = GunicornTarget(app.config["SESSION_COOKIE_NAME"], cookie, args.workers, args.concurrency)
+    else:
+        target = ClientTarget(app, cookie)
+
+    settings = {
+        "target": args.target, "requests": args.requests,
+        "seed": seed_data.seed_args(args),
+        **({"workers": args.workers, "concurrency": args.concurrency} if args.target == "gunicorn" else {}),
+    }
+    result = {"settings": settings, "scenarios": {}}
+    rng = random.Random(args.seed)
+    print(f"{'scenario':<16}{'req/s':>8}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'queries':>9}{'RSS MB':>9}{'errors':>8}")
+    try:
+        for name in args.scenario or SCENARIOS:
+            row = result["scenarios"][name] = run_scenario(
+                target, name, data, args.requests, args.warmup, csrf_token, rng
+            )
+            print(f"{name:<16}{row['rps']:>8}{row['p50_ms']:>9}{row['p95_ms']:>9}{row['p99_ms']:>9}"
+                  f"{row['queries_per_request']:>9}{row['rss_mb']:>9}{row['errors']:>8}")
+    finally:
+        target.stop()
+        tmp.cleanup()
+
+    if args.output:
+        with open(args.output, "w") as fh:
+            json.dump(result, fh, indent=2, sort_keys=True)
+
+    baseline_path = args.baseline or os.path.join(BASELINE_DIR, f"{args.target}.json")
+    if args.save_baseline:
+        os.makedirs(os.path.dirname(baseline_path), exist_ok=True)
+        with open(baseline_path, "w") as fh:
+            json.dump(result, fh, indent=2, sort_keys=True)
+            fh.write("\n")
+        print(f"baseline written to {os.path.relpath(baseline_path)}")
+    if args.check:
+        with open(baseline_path) as fh:
+            baseline = json.load(fh)
+        if baseline["settings"] != settings:
+            sys.exit(f"{os.path.relpath(baseline_path)} was recorded with different settings, rerun with them")
+        problems = compare(result, baseline, args.latency_tolerance, args.rss_tolerance)
+        for problem in problems:
+            print("REGRESSION", problem)
+        if problems:
+            sys.exit(1)
+        print(f"no regressions against {os.path.relpath(baseline_path)}")
+
+
+if __name__ == "__main__":
+    main()
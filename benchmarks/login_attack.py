@@ -0,0 +1,124 @@
+"""Login throughput while /login is under a password-guessing attack.
+
+    python benchmarks/login_attack.py --attempts 2000 --attacker-ips 20
+    PASSWORD_HASH_METHOD=scrypt:16384:8:1 python benchmarks/login_attack.py
+
+Attackers cycle through --attacker-ips addresses guessing wrong passwords
+for registered and unregistered emails. Every --legit-every attempts a real
+user logs in from their own address. The same run is made with the rate
+limiter off and on; the report shows attempts handled per second, how many
+were answered with 429, how many password hashes were checked and how long
+the real users waited.
+
+CSRF is off: an attacker scripting the form fetches the token first, which
+costs them a GET and the server nothing worth measuring.
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+sys.path.insert(0, BENCH_DIR)
+
+from loadtest import percentile
+
+PASSWORD = "bench-password"
+
+
+def seed(users):
+    from sqlalchemy import insert
+    from models import db, User
+    from passwords import hash_password
+
+    db.drop_all()
+    db.create_all()
+    password_hash = hash_password(PASSWORD)
+    db.session.execute(insert(User), [
+        {"username": f"user{i}", "email": f"user{i}@gmail.com", "password_hash": password_hash}
+        for i in range(users)
+    ])
+    db.session.commit()
+
+
+def run(app, args, limited):
+    import passwords
+    from ratelimit import limiter, MemoryBuckets
+
+    limiter.enabled = limited
+    limiter.backend = MemoryBuckets()
+    checks = [0]
+    check_password_hash = passwords.check_password_hash
+
+    def counting_check(pwhash, password):
+        checks[0] += 1
+        return check_password_hash(pwhash, password)
+
+    passwords.check_password_hash = counting_check
+    rng = random.Random(args.seed)
+    client = app.test_client()
+    rejected = 0
+    legit = []
+    try:
+        started = time.perf_counter()
+        for attempt in range(args.attempts):
+            email = f"user{rng.randrange(args.users * 2)}@gmail.com"   # about half of them exist
+            response = client.post("/login", data={"email": email, "password": "guess"},
+                                   environ_base={"REMOTE_ADDR": f"10.0.0.{attempt % args.attacker_ips + 1}"})
+            rejected += response.status_code == 429
+            if attempt % args.legit_every == 0:
+                user = rng.randrange(args.users)
+                began = time.perf_counter()
+                response = app.test_client().post(
+                    "/login", data={"email": f"user{user}@gmail.com", "password": PASSWORD},
+                    environ_base={"REMOTE_ADDR": f"192.168.{user // 250}.{user % 250 + 1}"},
+                )
+                legit.append(((time.perf_counter() - began) * 1000, response.status_code == 302))
+        elapsed = time.perf_counter() - started
+    finally:
+        passwords.check_password_hash = check_password_hash
+
+    latencies = [ms for ms, _ in legit]
+    return {
+        "attempts/s": round(args.attempts / elapsed, 1),
+        "rejected": rejected,
+        "hashes": checks[0],
+        "legit ok": f"{sum(ok for _, ok in legit)}/{len(legit)}",
+        "legit p50 ms": round(percentile(latencies, 50), 1),
+        "legit p95 ms": round(percentile(latencies, 95), 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--attempts", type=int, default=500)
+    parser.add_argument("--attacker-ips", type=int, default=5)
+    parser.add_argument("--legit-every", type=int, default=50)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ["DATABASE_URL"] = "sqlite:///" + os.path.join(tmp, "login.db")
+        from app import create_app
+        app = create_app()
+        import logging
+        logging.getLogger("greenspots.slow").disabled = True
+        app.config["WTF_CSRF_ENABLED"] = False
+        with app.app_context():
+            seed(args.users)
+
+        print(f"hash method {app.config['PASSWORD_HASH_METHOD']}, limits {app.config['LOGIN_RATE_PER_IP']} per IP, "
+              f"{app.config['LOGIN_RATE_PER_ACCOUNT']} per account")
+        results = {"no limiter": run(app, args, False), "limiter": run(app, args, True)}
+        columns = list(results["limiter"])
+        print(f"{'':<12}" + "".join(f"{column:>14}" for column in columns))
+        for name, row in results.items():
+            print(f"{name:<12}" + "".join(f"{row[column]:>14}" for column in columns))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+"""Benchmark geo.nearest_places() against a synthetic catalog.
+
+    python benchmarks/nearby.py --places 100000 --queries 500
+    python benchmarks/nearby.py --places 100000 --k 4 --radius-km 50
+
+Runs without a radius and with each --radius-km (default 50, the place
+page's nearby panel).
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask import Flask
+from sqlalchemy import insert
+from models import db, Place
+from geo import geo_key, nearest_places
+
+# rough bounding box of Georgia
+LAT_RANGE = (41.05, 43.58)
+LNG_RANGE = (40.0, 46.7)
+
+
+def seed(count, rng):
+    rows = []
+    for i in range(count):
+        lat, lng = rng.uniform(*LAT_RANGE), rng.uniform(*LNG_RANGE)
+        rows.append({
+            "name": f"place {i}", "description": "", "category": "views",
+            "latitude": lat, "longitude": lng, "geo_key": geo_key(lat, lng),
+        })
+    db.session.execute(insert(Place), rows)
+    db.session.commit()
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--places", type=int, default=100_000)
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--radius-km", type=float, nargs="+", default=[50])
+    args = parser.parse_args()
+
+    rng = random.Random(42)
+    with tempfile.TemporaryDirectory() as tmp:
+        app = Flask(__name__)
+        app.config["SQLALCHEMY_DATABASE_URI"] = "sqlite:///" + os.path.join(tmp, "bench.db")
+        db.init_app(app)
+        with app.app_context():
+            db.create_all()
+            started = time.perf_counter()
+            seed(args.places, rng)
+            print(f"seeded {args.places} places in {time.perf_counter() - started:.1f}s")
+
+            for radius_km in [None, *args.radius_km]:
+                timings = []
+                for _ in range(args.queries):
+                    lat, lng = rng.uniform(*LAT_RANGE), rng.uniform(*LNG_RANGE)
+                    started = time.perf_counter()
+                    nearest_places(lat, lng, k=args.k, radius_km=radius_km)
+                    timings.append((time.perf_counter() - started) * 1000)
+                    db.session.expunge_all()
+
+                print(f"nearest_places k={args.k} radius_km={radius_km} over {args.queries} queries:")
+                print(f"  p50 {percentile(timings, 50):.2f} ms  p95 {percentile(timings, 95):.2f} ms  "
+                      f"p99 {percentile(timings, 99):.2f} ms  mean {statistics.mean(timings):.2f} ms")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+"""Time `flask recommendations rebuild` against a synthetic user base.
+
+    python benchmarks/recommendations_rebuild.py --users 100000 --places 5000
+
+Each user gets a handful of favorites, planned routes and ratings drawn
+from a long-tailed popularity curve, mostly inside two preferred
+categories, which is roughly what the production tables look like. The
+report splits the rebuild into loading, computing and writing, then times
+the /home lookup for a sample of users.
+"""
+import argparse
+import datetime
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask import Flask
+from sqlalchemy import insert
+from models import db, User, Place, Rating, PlannedRoute, favorites_table
+from recommendations import rebuild_recommendations, suggest_places
+
+CATEGORIES = ["waterfalls", "mountains", "lakes", "caves", "historic", "views", "parks", "canyons"]
+REGIONS = ["Tbilisi", "Kakheti", "Imereti", "Samegrelo", "Svaneti", "Adjara", "Shida Kartli", "Racha"]
+BATCH = 50_000
+
+
+def insert_batched(table, rows):
+    for start in range(0, len(rows), BATCH):
+        db.session.execute(insert(table), rows[start:start + BATCH])
+
+
+def seed(users, places, per_user, rng):
+    insert_batched(Place, [
+        {"name": f"place {i}", "description": "", "category": CATEGORIES[i % len(CATEGORIES)],
+         "region": REGIONS[(i // len(CATEGORIES)) % len(REGIONS)]}
+        for i in range(places)
+    ])
+    insert_batched(User, [
+        {"username": f"user{i}", "email": f"user{i}@example.com", "password_hash": "x"}
+        for i in range(users)
+    ])
+    by_category = {c: [p + 1 for p in range(places) if p % len(CATEGORIES) == i] for i, c in enumerate(CATEGORIES)}
+    weights = {c: [1 / (rank + 1) for rank in range(len(ids))] for c, ids in by_category.items()}
+
+    today = datetime.date.today()
+    favorites, routes, ratings = [], [], []
+    for user_id in range(1, users + 1):
+        liked = rng.sample(CATEGORIES, 2)
+        count = max(1, int(rng.expovariate(1 / per_user)))
+        chosen = set()
+        for _ in range(count):
+            category = rng.choice(liked) if rng.random() < 0.8 else rng.choice(CATEGORIES)
+            chosen.add(rng.choices(by_category[category], weights[category])[0])
+        for place_id in chosen:
+            kind = rng.random()
+            if kind < 0.5:
+                favorites.append({"user_id": user_id, "place_id": place_id})
+            elif kind < 0.7:
+                routes.append({"user_id": user_id, "place_id": place_id, "date": today})
+            else:
+                ratings.append({"user_id": user_id, "place_id": place_id, "stars": float(rng.randint(1, 5))})
+
+    insert_batched(favorites_table, favorites)
+    insert_batched(PlannedRoute.__table__, routes)
+    insert_batched(Rating.__table__, ratings)
+    db.session.commit()
+    return len(favorites) + len(routes) + len(ratings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=100_000)
+    parser.add_argument("--places", type=int, default=5_000)
+    parser.add_argument("--per-user", type=float, default=8, help="mean interactions per user")
+    parser.add_argument("--lookups", type=int, default=500)
+    args = parser.parse_args()
+
+    rng = random.Random(42)
+    with tempfile.TemporaryDirectory() as tmp:
+        app = Flask(__name__)
+        app.config["SQLALCHEMY_DATABASE_URI"] = "sqlite:///" + os.path.join(tmp, "bench.db")
+        db.init_app(app)
+        with app.app_context():
+            db.create_all()
+            started = time.perf_counter()
+            interactions = seed(args.users, args.places, args.per_user, rng)
+            print(f"seeded {args.users} users, {args.places} places, {interactions} interactions "
+                  f"in {time.perf_counter() - started:.1f}s")
+
+            started = time.perf_counter()
+            result = rebuild_recommendations()
+            total = time.perf_counter() - started
+            steps = "  ".join(f"{step} {seconds:.2f}s" for step, seconds in result["timings"].items())
+            print(f"rebuild: {total:.2f}s  ({steps})")
+            print(f"  {result['neighbours']} neighbour rows for {result['places']} places")
+
+            samples = []
+            for user_id in rng.sample(range(1, args.users + 1), min(args.lookups, args.users)):
+                started = time.perf_counter()
+                suggest_places(user_id, 10)
+                samples.append((time.perf_counter() - started) * 1000)
+                db.session.rollback()
+            ordered = sorted(samples)
+            print(f"suggest_places: median {statistics.median(samples):.2f} ms, "
+                  f"p95 {ordered[int(len(ordered) * 0.95) - 1]:.2f} ms over {len(samples)} users")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,145 @@
+"""Synthetic GreenSpots data for benchmarks and load tests.
+
+Seeds users, places, ratings, favorites and planned routes through the
+models.py schema. Rating aggregates, geo keys, rankings and recommendation
+tables and category/region counts are filled in too, so every page renders the way it does in
+production. One "hot" place gets --hot-reviews ratings for place_detail.
+
+    DATABASE_URL=sqlite:////tmp/bench.db python benchmarks/seed_data.py --users 1000
+    DATABASE_URL=postgresql://... python benchmarks/seed_data.py
+
+DATABASE_URL is required and every table in it is dropped first.
+
+Every user's password is PASSWORD.
+"""
+import argparse
+import datetime
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+PASSWORD = "bench-password"
+CATEGORIES = ["mountains", "waterfalls", "historic", "forest", "views", "hiking", "lakes", "sunrise"]
+REGIONS = ["Tbilisi", "Adjara", "Samegrelo", "Guria", "Imereti", "Kakheti", "Svaneti", "Shida Kartli"]
+LAT_RANGE = (41.05, 43.58)
+LNG_RANGE = (40.0, 46.7)
+BATCH = 20_000
+
+DEFAULTS = {"users": 1000, "places": 2000, "ratings": 20_000, "favorites": 10_000, "routes": 3000, "hot_reviews": 1000}
+
+
+def _insert(table, rows):
+    from sqlalchemy import insert
+    from models import db
+
+    for start in range(0, len(rows), BATCH):
+        db.session.execute(insert(table), rows[start:start + BATCH])
+
+
+def seed(users=1000, places=2000, ratings=20_000, favorites=10_000, routes=3000, hot_reviews=1000, rng_seed=42):
+    """Drop and recreate every table, then fill them. Call inside an app context.
+
+    Returns {"user_ids", "place_ids", "hot_place_id", "categories", "regions"}.
+    """
+    from geo import geo_key
+    from models import db, User, Place, Rating, PlannedRoute, favorites_table
+    from passwords import hash_password
+    from ranking import rebuild_ranking
+    from ratings import rebuild_rating_aggregates
+    from recommendations import rebuild_recommendations
+    from stats import reconcile_counts
+
+    rng = random.Random(rng_seed)
+    db.drop_all()
+    db.create_all()
+
+    # one hash for everyone: hashing per user would dominate the seed time
+    password_hash = hash_password(PASSWORD)
+    _insert(User, [
+        {"username": f"user{i}", "email": f"user{i}@example.com", "password_hash": password_hash}
+        for i in range(users)
+    ])
+    place_rows = []
+    for i in range(places):
+        lat, lng = rng.uniform(*LAT_RANGE), rng.uniform(*LNG_RANGE)
+        place_rows.append({
+            "name": f"place {i}", "description": f"synthetic place {i} " * 8,
+            "category": rng.choice(CATEGORIES), "region": rng.choice(REGIONS),
+            "latitude": lat, "longitude": lng, "geo_key": geo_key(lat, lng),
+        })
+    _insert(Place, place_rows)
+
+    user_ids = list(range(1, users + 1))
+    place_ids = list(range(1, places + 1))
+    hot_place_id = place_ids[0]
+    # a long tail: a few places collect most of the activity
+    weights = [1 / (rank + 1) for rank in range(places)]
+    now = datetime.datetime.utcnow()
+
+    def when():
+        return now - datetime.timedelta(minutes=rng.randint(0, 180 * 24 * 60))
+
+    rating_rows = [
+        {"user_id": rng.choice(user_ids), "place_id": hot_place_id, "stars": float(rng.randint(1, 5)),
+         "comment": "hot place review", "timestamp": when()}
+        for _ in range(hot_reviews)
+    ]
+    for place_id in rng.choices(place_ids, weights, k=ratings):
+        rating_rows.append({
+            "user_id": rng.choice(user_ids), "place_id": place_id, "stars": float(rng.randint(1, 5)),
+            "comment": "synthetic review", "timestamp": when(),
+        })
+    for row in rating_rows:
+        row["updated_at"] = row["timestamp"]
+    _insert(Rating, rating_rows)
+
+    favorite_pairs = {(rng.choice(user_ids), p) for p in rng.choices(place_ids, weights, k=favorites)}
+    _insert(favorites_table, [{"user_id": u, "place_id": p} for u, p in favorite_pairs])
+    route_pairs = {(rng.choice(user_ids), p) for p in rng.choices(place_ids, weights, k=routes)}
+    _insert(PlannedRoute, [
+        {"user_id": u, "place_id": p, "date": (now + datetime.timedelta(days=rng.randint(1, 60))).date()}
+        for u, p in route_pairs
+    ])
+    db.session.commit()
+
+    rebuild_rating_aggregates()
+    rebuild_ranking()
+    rebuild_recommendations()
+    reconcile_counts()
+    return {
+        "user_ids": user_ids, "place_ids": place_ids, "hot_place_id": hot_place_id,
+        "categories": CATEGORIES, "regions": REGIONS,
+    }
+
+
+def add_arguments(parser):
+    for name, default in DEFAULTS.items():
+        parser.add_argument("--" + name.replace("_", "-"), type=int, default=default)
+    parser.add_argument("--seed", type=int, default=42)
+
+
+def seed_args(args):
+    return dict({name: getattr(args, name) for name in DEFAULTS}, rng_seed=args.seed)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    add_arguments(parser)
+    args = parser.parse_args()
+    if not os.environ.get("DATABASE_URL"):
+        parser.error("set DATABASE_URL to a scratch database, its tables are dropped")
+
+    from app import create_app
+
+    app = create_app()
+    started = time.perf_counter()
+    with app.app_context():
+        seed(**seed_args(args))
+    print(f"seeded {app.config['SQLALCHEMY_DATABASE_URI']} in {time.perf_counter() - started:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
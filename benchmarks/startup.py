@@ -0,0 +1,173 @@
+"""Cold-start time and per-worker memory, with and without gunicorn --preload.
+
+    python benchmarks/startup.py --workers 4
+    python benchmarks/startup.py --runs 10 --skip-gunicorn
+
+First `import app`, create_app() and warm_up() are timed in fresh
+interpreters (--runs of them, median reported). Then gunicorn is started
+against a seeded temporary SQLite file, once with GUNICORN_PRELOAD=1 and
+once with 0. Each run reports:
+- the time until the first 200;
+- master and mean worker RSS after --requests requests;
+- worker PSS (shared pages split between the processes sharing them);
+- worker USS (pages only that worker has).
+
+Copy-on-write sharing shows up as lower PSS/USS with preload at the same RSS.
+"""
+import argparse
+import http.client
+import json
+import os
+import signal
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, ROOT)
+sys.path.insert(0, BENCH_DIR)
+
+import seed_data
+
+PATHS = ["/", "/map", "/login", "/register"]
+
+_TIMED_START = """
+import json, os, time
+started = time.perf_counter()
+import app
+imported = time.perf_counter()
+flask_app = app.create_app()
+created = time.perf_counter()
+app.warm_up(flask_app)
+warmed = time.perf_counter()
+print(json.dumps({
+    "import_ms": (imported - started) * 1000,
+    "create_app_ms": (created - imported) * 1000,
+    "warm_up_ms": (warmed - created) * 1000,
+}))
+"""
+
+
+def memory_kb(pid):
+    """{"rss", "pss", "uss"} in kB from /proc/<pid>/smaps_rollup."""
+    fields = {}
+    with open(f"/proc/{pid}/smaps_rollup") as fh:
+        for line in fh:
+            name, _, rest = line.partition(":")
+            if rest.strip().endswith("kB"):
+                fields[name] = int(rest.split()[0])
+    return {
+        "rss": fields.get("Rss", 0),
+        "pss": fields.get("Pss", 0),
+        "uss": fields.get("Private_Clean", 0) + fields.get("Private_Dirty", 0),
+    }
+
+
+def children(pid):
+    try:
+        with open(f"/proc/{pid}/task/{pid}/children") as fh:
+            return [int(child) for child in fh.read().split()]
+    except OSError:
+        return []
+
+
+def time_startup(runs, env):
+    samples = []
+    for _ in range(runs):
+        out = subprocess.run([sys.executable, "-c", _TIMED_START], cwd=ROOT, env=env,
+                             capture_output=True, text=True, check=True).stdout
+        samples.append(json.loads(out.strip().splitlines()[-1]))
+    return {key: round(statistics.median(s[key] for s in samples), 1) for key in samples[0]}
+
+
+def run_gunicorn(preload, workers, requests, env):
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+    env = dict(env, GUNICORN_PRELOAD="1" if preload else "0")
+    started = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, "-m", "gunicorn", "--workers", str(workers), "--bind", f"127.0.0.1:{port}",
+         "--log-level", "warning"],
+        cwd=ROOT, env=env,
+    )
+    try:
+        first_ok = None
+        deadline = time.monotonic() + 60
+        while first_ok is None and time.monotonic() < deadline:
+            if process.poll() is not None:
+                raise RuntimeError("gunicorn exited during startup")
+            try:
+                conn = http.client.HTTPConnection("127.0.0.1", port, timeout=5)
+                conn.request("GET", "/")
+                if conn.getresponse().status == 200:
+                    first_ok = time.perf_counter() - started
+                conn.close()
+            except OSError:
+                time.sleep(0.02)
+        if first_ok is None:
+            raise RuntimeError("gunicorn never answered 200")
+
+        # fresh connections so the requests spread over the workers
+        for i in range(requests):
+            conn = http.client.HTTPConnection("127.0.0.1", port, timeout=30)
+            conn.request("GET", PATHS[i % len(PATHS)])
+            conn.getresponse().read()
+            conn.close()
+
+        pids = children(process.pid)
+        worker_memory = [memory_kb(pid) for pid in pids]
+        master = memory_kb(process.pid)
+    finally:
+        process.send_signal(signal.SIGTERM)
+        process.wait(timeout=30)
+
+    def mean_mb(key):
+        return round(statistics.mean(m[key] for m in worker_memory) / 1024, 1)
+
+    return {
+        "first_200_s": round(first_ok, 2),
+        "master_rss_mb": round(master["rss"] / 1024, 1),
+        "worker_rss_mb": mean_mb("rss"),
+        "worker_pss_mb": mean_mb("pss"),
+        "worker_uss_mb": mean_mb("uss"),
+        "total_pss_mb": round((master["pss"] + sum(m["pss"] for m in worker_memory)) / 1024, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5, help="fresh interpreters for the import timing")
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--requests", type=int, default=200, help="requests before memory is read")
+    parser.add_argument("--skip-gunicorn", action="store_true")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        env = dict(os.environ, DATABASE_URL="sqlite:///" + os.path.join(tmp, "startup.db"))
+        os.environ["DATABASE_URL"] = env["DATABASE_URL"]
+        from app import create_app
+        app = create_app()
+        with app.app_context():
+            seed_data.seed(users=200, places=2000, ratings=5000, favorites=1000, routes=500, hot_reviews=100)
+
+        timing = time_startup(args.runs, env)
+        print(f"import app {timing['import_ms']} ms, create_app() {timing['create_app_ms']} ms, "
+              f"warm_up() {timing['warm_up_ms']} ms (median of {args.runs})")
+        if args.skip_gunicorn:
+            return
+
+        results = {label: run_gunicorn(preload, args.workers, args.requests, env)
+                   for label, preload in (("no preload", False), ("preload", True))}
+        columns = list(results["preload"])
+        print(f"{'':<12}" + "".join(f"{column:>15}" for column in columns))
+        for label, row in results.items():
+            print(f"{label:<12}" + "".join(f"{row[column]:>15}" for column in columns))
+
+
+if __name__ == "__main__":
+    main()
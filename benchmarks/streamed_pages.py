@@ -0,0 +1,97 @@
+"""Time to first byte and peak memory of /booking against catalog size, buffered vs streamed.
+
+    python benchmarks/streamed_pages.py --sizes 1000 10000 50000
+
+/booking lists every place in a <select>. For each size seed_data.py fills
+a temporary SQLite file, then the page is requested as a logged-in user
+with STREAM_TEMPLATES off (render_template) and on (stream_page). Reported:
+- ttfb: median ms until the first body chunk reaches the client;
+- total: median ms until the last one;
+- peak: Python heap allocated during one request (tracemalloc);
+- identity / gzip / br: bytes on the wire for each Accept-Encoding.
+"""
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+sys.path.insert(0, BENCH_DIR)
+
+import seed_data
+from loadtest import login_state
+
+
+def fetch(client, path, headers=None):
+    """(ms to first chunk, ms to last chunk, body bytes); chunks are dropped as they arrive."""
+    started = time.perf_counter()
+    response = client.get(path, headers=headers or {}, buffered=False)
+    first, size = None, 0
+    try:
+        for chunk in response.response:
+            if first is None:
+                first = time.perf_counter()
+            size += len(chunk)
+    finally:
+        response.close()
+    done = time.perf_counter()
+    return (first - started) * 1000, (done - started) * 1000, size
+
+
+def peak_kb(client, path):
+    tracemalloc.start()
+    try:
+        fetch(client, path)
+        return tracemalloc.get_traced_memory()[1] / 1024
+    finally:
+        tracemalloc.stop()
+
+
+def measure(app, client, requests):
+    rows = {}
+    for mode in ("buffered", "streamed"):
+        app.config["STREAM_TEMPLATES"] = mode == "streamed"
+        fetch(client, "/booking")   # warm templates and caches
+        samples = [fetch(client, "/booking") for _ in range(requests)]
+        rows[mode] = {
+            "ttfb": statistics.median(s[0] for s in samples),
+            "total": statistics.median(s[1] for s in samples),
+            "peak": peak_kb(client, "/booking"),
+            "identity": samples[0][2],
+            "gzip": fetch(client, "/booking", {"Accept-Encoding": "gzip"})[2],
+            "br": fetch(client, "/booking", {"Accept-Encoding": "br"})[2],
+        }
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10_000, 50_000], help="places per run")
+    parser.add_argument("--requests", type=int, default=20, help="timed requests per size and mode")
+    args = parser.parse_args()
+
+    import logging
+    logging.getLogger("greenspots.slow").disabled = True
+    print(f"{'places':>8}{'mode':>10}{'ttfb ms':>10}{'total ms':>10}{'peak KB':>10}"
+          f"{'identity':>11}{'gzip':>9}{'br':>9}")
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ["DATABASE_URL"] = "sqlite:///" + os.path.join(tmp, "streaming.db")
+        from app import create_app
+        app = create_app()
+        for size in args.sizes:
+            with app.app_context():
+                data = seed_data.seed(users=20, places=size, ratings=100, favorites=20, routes=20, hot_reviews=10)
+            cookie, _ = login_state(app, data["user_ids"][0])
+            client = app.test_client()
+            client.set_cookie(app.config["SESSION_COOKIE_NAME"], cookie)
+            for mode, row in measure(app, client, args.requests).items():
+                print(f"{size:>8}{mode:>10}{row['ttfb']:>10.2f}{row['total']:>10.2f}{row['peak']:>10.0f}"
+                      f"{row['identity']:>11}{row['gzip']:>9}{row['br']:>9}")
+
+
+if __name__ == "__main__":
+    main()
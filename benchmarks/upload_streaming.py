@@ -0,0 +1,153 @@
+"""How long a worker is tied up by a 10MB photo upload, and how early bad uploads are cut off.
+
+The client side is throttled to --mbps so the numbers reflect a phone on a
+real connection rather than loopback. For each case the request is posted to
+the rating form of /place/<id> and we report the wall time the worker spent
+on it and the peak Python heap during the request.
+
+    python benchmarks/upload_streaming.py
+    python benchmarks/upload_streaming.py --mbps 5 --legacy
+
+--legacy swaps back to Werkzeug's default form parsing with no
+MAX_CONTENT_LENGTH, i.e. how uploads were handled before.
+"""
+import argparse
+import io
+import logging
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from PIL import Image
+from werkzeug.datastructures import FileStorage
+from werkzeug.test import encode_multipart
+
+MB = 1024 * 1024
+
+
+class ThrottledStream(io.BytesIO):
+    """wsgi.input that delivers bytes no faster than a client at rate bytes/s."""
+
+    def __init__(self, data, rate):
+        super().__init__(data)
+        self.rate = rate
+        self.sent = 0
+
+    def read(self, size=-1):
+        chunk = super().read(min(size, 64 * 1024) if size and size > 0 else 64 * 1024)
+        self.sent += len(chunk)
+        time.sleep(len(chunk) / self.rate)
+        return chunk
+
+    def readinto(self, buffer):
+        chunk = self.read(len(buffer))
+        buffer[:len(chunk)] = chunk
+        return len(chunk)
+
+
+def photo_bytes(size):
+    """A real JPEG of roughly size bytes (noise doesn't compress)."""
+    side = int((size / 1.1) ** 0.5)
+    image = Image.frombytes("RGB", (side, side), os.urandom(side * side * 3))
+    buf = io.BytesIO()
+    image.save(buf, "JPEG", quality=95)
+    return buf.getvalue()
+
+
+def post(client, place_id, payload, filename, rate, send_length=True):
+    boundary, body = encode_multipart({
+        "action": "rating", "stars": "4", "comment": "bench",
+        "image": FileStorage(io.BytesIO(payload), filename, content_type="image/jpeg"),
+    })
+    stream = ThrottledStream(body, rate)
+    # without a length the server only finds out the size while reading
+    kwargs = {} if send_length else {
+        "environ_overrides": {"CONTENT_LENGTH": "", "wsgi.input_terminated": True},
+    }
+    tracemalloc.start()
+    started = time.perf_counter()
+    response = client.post(
+        f"/place/{place_id}",
+        input_stream=stream,
+        content_type=f"multipart/form-data; boundary={boundary}",
+        **kwargs,
+    )
+    elapsed = time.perf_counter() - started
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return response.status_code, elapsed, peak, stream.sent, len(body)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--mbps", type=float, default=20, help="client upload speed in megabytes/s")
+    parser.add_argument("--legacy", action="store_true")
+    args = parser.parse_args()
+
+    tmp = tempfile.TemporaryDirectory()
+    os.environ["DATABASE_URL"] = "sqlite:///" + os.path.join(tmp.name, "bench.db")
+    from flask import Request
+    from app import create_app
+    import images
+    from models import db, User, Place
+
+    app = create_app()
+
+    uploads = os.path.join(tmp.name, "uploads")
+    os.makedirs(uploads)
+    app.config.update(
+        WTF_CSRF_ENABLED=False,
+        UPLOAD_FOLDER=uploads,
+        UPLOAD_TMP_FOLDER=os.path.join(tmp.name, "incoming"),
+        IMAGE_PROCESSING_SYNC=False,
+    )
+    if args.legacy:
+        app.request_class = Request
+        app.config["MAX_CONTENT_LENGTH"] = None
+
+    with app.app_context():
+        db.create_all()
+        user = User(username="bench", email="bench@gmail.com", password_hash="x")
+        place = Place(name="bench", description="", category="views", region="Tbilisi")
+        db.session.add_all([user, place])
+        db.session.commit()
+        user_id, place_id = user.id, place.id
+
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session["_user_id"] = str(user_id)
+        session["_fresh"] = True
+
+    logging.getLogger("greenspots.slow").disabled = True
+    rate = args.mbps * MB
+    photo = photo_bytes(10 * MB)
+    cases = [
+        ("10MB photo", photo, "waterfall.jpg", True),
+        ("same 10MB photo again", photo, "waterfall-copy.jpg", True),
+        ("10MB non-image", os.urandom(10 * MB), "waterfall.jpg", True),
+        ("40MB photo", photo * 4, "huge.jpg", True),
+        ("40MB photo, chunked", photo * 4, "huge.jpg", False),
+    ]
+
+    mode = "legacy parsing" if args.legacy else "streaming"
+    print(f"{mode}, client at {args.mbps:g} MB/s")
+    print(f"{'case':<24}{'status':>7}{'worker s':>10}{'received':>12}{'peak heap':>11}")
+    for label, payload, filename, send_length in cases:
+        status, elapsed, peak, sent, total = post(client, place_id, payload, filename, rate, send_length)
+        received = f"{sent / MB:.1f}/{total / MB:.0f}MB"
+        print(f"{label:<24}{status:>7}{elapsed:>10.2f}{received:>12}{peak / MB:>9.1f}MB")
+
+    if images._executor is not None:
+        images._executor.shutdown(wait=True)
+    stored = [name for name in os.listdir(uploads) if not os.path.isdir(os.path.join(uploads, name))]
+    print(f"files stored in uploads/: {len(stored)}")
+    tmp.cleanup()
+
+
+if __name__ == "__main__":
+    main()
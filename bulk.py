@@ -0,0 +1,142 @@
+from datetime import date, datetime
+
+from sqlalchemy import delete, select
+from sqlalchemy.dialects import postgresql, sqlite
+from identity import forget_identity
+from models import db, Place, PlannedRoute, favorites_table
+
+
+MAX_OPERATIONS = 200
+KINDS = ("favorite", "route")
+
+
+class InvalidOperations(ValueError):
+    pass
+
+
+# ---------------- SET-BASED WRITES ----------------
+# init_database refuses to start on any other database
+UPSERT_DIALECTS = {"postgresql": postgresql, "sqlite": sqlite}
+
+
+def dialect_insert(table, bind=None):
+    """The dialect's INSERT construct, which has on_conflict_do_nothing/do_update."""
+    dialect = (bind or db.session.get_bind()).dialect.name
+    return UPSERT_DIALECTS[dialect].insert(table)
+
+
+def _insert_ignoring_duplicates(table, rows, conflict_columns):
+    """INSERT ... ON CONFLICT DO NOTHING for every row in one statement; returns rows inserted."""
+    if not rows:
+        return 0
+    stmt = dialect_insert(table).on_conflict_do_nothing(index_elements=conflict_columns)
+    return db.session.execute(stmt, rows).rowcount
+
+
+def add_favorites(user_id, place_ids):
+    rows = [{"user_id": user_id, "place_id": place_id} for place_id in place_ids]
+    if rows:
+        forget_identity(user_id)
+    _insert_ignoring_duplicates(favorites_table, rows, ["user_id", "place_id"])
+
+
+def remove_favorites(user_id, place_ids):
+    """Returns how many favorites were actually removed."""
+    if not place_ids:
+        return 0
+    forget_identity(user_id)
+    return db.session.execute(
+        delete(favorites_table)
+        .where(favorites_table.c.user_id == user_id, favorites_table.c.place_id.in_(place_ids))
+    ).rowcount
+
+
+def add_routes(user_id, place_dates):
+    """place_dates maps place id -> planned date, or None for "today unless planned".
+
+    A place can be planned on several dates; a (place, date) the user already
+    has is skipped. Returns how many routes were inserted.
+    """
+    now = datetime.utcnow()
+    undated = [place_id for place_id, route_date in place_dates.items() if route_date is None]
+    planned = set()
+    if undated:
+        # the place page's "route" button: nothing to do once the place is planned
+        planned = set(db.session.scalars(
+            select(PlannedRoute.place_id).where(PlannedRoute.user_id == user_id, PlannedRoute.place_id.in_(undated))
+        ))
+    rows = [
+        {"user_id": user_id, "place_id": place_id, "date": route_date or now.date(), "updated_at": now}
+        for place_id, route_date in place_dates.items()
+        if place_id not in planned or route_date is not None
+    ]
+    return _insert_ignoring_duplicates(PlannedRoute.__table__, rows, ["user_id", "place_id", "date"])
+
+
+def remove_routes(user_id, place_ids):
+    if not place_ids:
+        return 0
+    return db.session.execute(
+        delete(PlannedRoute)
+        .where(PlannedRoute.user_id == user_id, PlannedRoute.place_id.in_(place_ids))
+        .execution_options(synchronize_session=False)
+    ).rowcount
+
+
+# ---------------- BATCH ----------------
+def apply_operations(user_id, operations):
+    """Apply [{"op": "add"|"remove", "type": "favorite"|"route", "place_id", "date"?}].
+
+    Operations are collapsed to the last one per (type, place), then applied
+    as at most one INSERT and one DELETE per type. The caller commits.
+    Raises InvalidOperations without touching the database on bad input.
+    """
+    if not isinstance(operations, list) or not operations:
+        raise InvalidOperations("operations must be a non-empty list")
+    if len(operations) > MAX_OPERATIONS:
+        raise InvalidOperations(f"at most {MAX_OPERATIONS} operations per batch")
+
+    final = {}
+    for index, operation in enumerate(operations):
+        if not isinstance(operation, dict):
+            raise InvalidOperations(f"operation {index} must be an object")
+        op, kind, place_id = operation.get("op"), operation.get("type"), operation.get("place_id")
+        if op not in ("add", "remove") or kind not in KINDS or not isinstance(place_id, int):
+            raise InvalidOperations(f"operation {index} needs op add|remove, type favorite|route and an integer place_id")
+        route_date = None
+        if kind == "route" and op == "add" and operation.get("date"):
+            try:
+                route_date = date.fromisoformat(operation["date"])
+            except (TypeError, ValueError):
+                raise InvalidOperations(f"operation {index}: date must be YYYY-MM-DD")
+        final[kind, place_id] = (op, route_date)
+
+    place_ids = {place_id for _, place_id in final}
+    known = set(db.session.scalars(select(Place.id).where(Place.id.in_(place_ids))))
+    missing = sorted(place_ids - known)
+    if missing:
+        raise InvalidOperations(f"unknown place ids: {', '.join(map(str, missing))}")
+
+    def chosen(kind, op):
+        return {place_id: value[1] for (k, place_id), value in final.items() if k == kind and value[0] == op}
+
+    add_favorites(user_id, list(chosen("favorite", "add")))
+    remove_favorites(user_id, list(chosen("favorite", "remove")))
+    add_routes(user_id, chosen("route", "add"))
+    remove_routes(user_id, list(chosen("route", "remove")))
+
+
+def user_list_state(user_id):
+    """The user's favorite place ids and planned routes after a batch."""
+    favorites = db.session.scalars(
+        select(favorites_table.c.place_id).where(favorites_table.c.user_id == user_id).order_by(favorites_table.c.place_id)
+    ).all()
+    routes = db.session.execute(
+        select(PlannedRoute.id, PlannedRoute.place_id, PlannedRoute.date)
+        .where(PlannedRoute.user_id == user_id)
+        .order_by(PlannedRoute.id)
+    ).all()
+    return {
+        "favorites": favorites,
+        "routes": [{"id": r.id, "place_id": r.place_id, "date": r.date.isoformat()} for r in routes],
+    }
@@ -0,0 +1,197 @@
+import json
+import threading
+import time
+from collections import OrderedDict
+
+from sqlalchemy import event, inspect
+from models import db
+
+
+# ---------------- BACKENDS ----------------
+class LRUCache:
+    """Per-worker LRU with a TTL per entry."""
+
+    def __init__(self, max_entries=1024, default_ttl=60):
+        self.max_entries = max_entries
+        self.default_ttl = default_ttl
+        self._data = OrderedDict()   # key -> (expires_at, value)
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            if entry[0] <= time.monotonic():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return entry[1]
+
+    def set(self, key, value, ttl=None):
+        expires_at = time.monotonic() + (ttl or self.default_ttl)
+        with self._lock:
+            self._data[key] = (expires_at, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def delete(self, *keys):
+        with self._lock:
+            for key in keys:
+                self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+class SharedCache:
+    """JSON values in a shared store with a Redis-style client (get / set(ex=) / delete)."""
+
+    def __init__(self, client, prefix="greenspots:", default_ttl=60):
+        self.client = client
+        self.prefix = prefix
+        self.default_ttl = default_ttl
+
+    def get(self, key):
+        raw = self.client.get(self.prefix + key)
+        return None if raw is None else json.loads(raw)
+
+    def set(self, key, value, ttl=None):
+        self.client.set(self.prefix + key, json.dumps(value), ex=int(ttl or self.default_ttl))
+
+    def delete(self, *keys):
+        if keys:
+            self.client.delete(*(self.prefix + key for key in keys))
+
+    def clear(self):
+        for key in list(self.client.scan_iter(self.prefix + "*")):
+            self.client.delete(key)
+
+
+class LocalSharedClient:
+    """In-memory stand-in for a Redis client, for tests and single-box setups."""
+
+    def __init__(self):
+        self._store = LRUCache(max_entries=100_000)
+
+    def get(self, key):
+        return self._store.get(key)
+
+    def set(self, key, value, ex=None):
+        self._store.set(key, value, ttl=ex)
+
+    def delete(self, *keys):
+        self._store.delete(*keys)
+
+    def scan_iter(self, match):
+        prefix = match.rstrip("*")
+        with self._store._lock:
+            return [key for key in self._store._data if key.startswith(prefix)]
+
+
+class TieredCache:
+    """Short-lived local LRU in front of an optional shared backend."""
+
+    def __init__(self, local, shared=None):
+        self.local = local
+        self.shared = shared
+
+    def get(self, key):
+        value = self.local.get(key)
+        if value is None and self.shared is not None:
+            value = self.shared.get(key)
+            if value is not None:
+                self.local.set(key, value)
+        return value
+
+    def set(self, key, value, ttl=None):
+        if self.shared is None:
+            self.local.set(key, value, ttl=ttl)
+            return
+        # other workers invalidate only the shared copy, so keep the local one brief
+        self.local.set(key, value, ttl=min(ttl or self.local.default_ttl, self.local.default_ttl))
+        self.shared.set(key, value, ttl=ttl)
+
+    def get_or_set(self, key, loader, ttl=None):
+        """Return the cached value, computing and storing it with loader() on a miss."""
+        value = self.get(key)
+        if value is None:
+            value = loader()
+            self.set(key, value, ttl=ttl)
+        return value
+
+    def delete(self, *keys):
+        self.local.delete(*keys)
+        if self.shared is not None:
+            self.shared.delete(*keys)
+
+    def clear(self):
+        self.local.clear()
+        if self.shared is not None:
+            self.shared.clear()
+
+
+cache = TieredCache(LRUCache())
+
+
+# ---------------- INVALIDATION ----------------
+# model class -> cache keys that must be dropped when a row of it commits
+_dependencies = {}
+
+
+def invalidate_on(*models):
+    """Register a cache key to be deleted after any commit touching models."""
+    def register(key):
+        for model in models:
+            _dependencies.setdefault(model, set()).add(key)
+        return key
+    return register
+
+
+def mark_stale(*models):
+    """Drop the keys registered for models after the next commit, for Core writes the flush never sees."""
+    stale = db.session.info.setdefault("stale_cache_keys", set())
+    for model in models:
+        stale.update(_dependencies.get(model, ()))
+
+
+def _changed(obj):
+    # relationship-only changes (e.g. favorites backrefs) leave columns untouched
+    state = inspect(obj)
+    return any(state.attrs[attr.key].history.has_changes() for attr in state.mapper.column_attrs)
+
+
+@event.listens_for(db.session, "after_flush")
+def _collect_stale_keys(session, flush_context):
+    stale = session.info.setdefault("stale_cache_keys", set())
+    for obj in (*session.new, *session.deleted):
+        stale.update(_dependencies.get(type(obj), ()))
+    for obj in session.dirty:
+        keys = _dependencies.get(type(obj))
+        if keys and _changed(obj):
+            stale.update(keys)
+
+
+@event.listens_for(db.session, "after_commit")
+def _drop_stale_keys(session):
+    stale = session.info.pop("stale_cache_keys", None)
+    if stale:
+        cache.delete(*stale)
+
+
+@event.listens_for(db.session, "after_rollback")
+def _keep_cached_keys(session):
+    session.info.pop("stale_cache_keys", None)
+
+
+def init_cache(app):
+    config = app.config
+    cache.local = LRUCache(config["CACHE_MAX_ENTRIES"], config["CACHE_LOCAL_TTL"])
+    url = config.get("CACHE_URL")
+    if url:
+        import redis  # optional dependency, only needed for a shared cache
+        cache.shared = SharedCache(redis.Redis.from_url(url), default_ttl=config["CACHE_DEFAULT_TTL"])
+    else:
+        cache.shared = None
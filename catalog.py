@@ -0,0 +1,454 @@
+import csv
+import io
+import json
+import os
+import time
+
+import click
+from flask import current_app
+from flask.cli import AppGroup
+from sqlalchemy import bindparam, insert, select, tuple_, update
+from cache import mark_stale
+from forms import CATEGORY_CHOICES, REGION_CHOICES
+from geo import geo_key, mark_tiles_stale
+from models import db, Place
+from search import index_places
+from stats import reconcile_counts
+
+
+places_cli = AppGroup("places", help="Bulk import and export of the place catalog.")
+
+FORMATS = ("csv", "ndjson", "geojson")
+EXTENSIONS = {".csv": "csv", ".ndjson": "ndjson", ".jsonl": "ndjson", ".geojson": "geojson", ".json": "geojson"}
+MIMETYPES = {"csv": "text/csv", "ndjson": "application/x-ndjson", "geojson": "application/geo+json"}
+FIELDS = ("name", "description", "category", "region", "image", "latitude", "longitude")
+REQUIRED = ("name", "description", "category", "region", "latitude", "longitude")
+
+CATEGORIES = frozenset(value for value, _ in CATEGORY_CHOICES)
+REGIONS = frozenset(value for value, _ in REGION_CHOICES)
+
+IMPORT_CHUNK_SIZE = 1000
+EXPORT_YIELD_PER = 1000
+WRITE_SIZE = 64 * 1024      # characters per exported chunk
+READ_SIZE = 64 * 1024
+MAX_REPORTED_ERRORS = 20
+
+
+class CatalogError(ValueError):
+    """The file as a whole can't be read: unknown format, missing columns, broken GeoJSON."""
+
+
+class InvalidRow(ValueError):
+    pass
+
+
+def detect_format(filename):
+    fmt = EXTENSIONS.get(os.path.splitext(filename or "")[1].lower())
+    if fmt is None:
+        raise CatalogError(f"can't tell the format of {filename!r}, give one of {', '.join(FORMATS)}")
+    return fmt
+
+
+class TransferReport:
+    """Counters of one import or export, and its rows per second."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.elapsed = None
+        self.rows = 0          # read from the file / written to it
+        self.inserted = 0
+        self.updated = 0
+        self.unchanged = 0
+        self.duplicates = 0    # repeated within one chunk, the last one was kept
+        self.rejected = 0
+        self.errors = []       # the first MAX_REPORTED_ERRORS (position, message)
+
+    def reject(self, position, message):
+        self.rejected += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append((position, message))
+
+    def finish(self):
+        self.elapsed = time.perf_counter() - self.started
+        return self
+
+    @property
+    def seconds(self):
+        return self.elapsed if self.elapsed is not None else time.perf_counter() - self.started
+
+    @property
+    def rows_per_sec(self):
+        return self.rows / self.seconds if self.seconds else 0.0
+
+    def as_dict(self):
+        return {
+            "rows": self.rows,
+            "inserted": self.inserted,
+            "updated": self.updated,
+            "unchanged": self.unchanged,
+            "duplicates": self.duplicates,
+            "rejected": self.rejected,
+            "errors": [{"position": position, "message": message} for position, message in self.errors],
+            "seconds": round(self.seconds, 3),
+            "rows_per_sec": round(self.rows_per_sec, 1),
+        }
+
+
+# ---------------- READING ----------------
+# each reader yields (position, record): a line number for CSV and NDJSON,
+# the feature number for GeoJSON. A record that can't be decoded is an
+# InvalidRow instead of a dict, so one bad line doesn't stop the import.
+def _csv_records(text):
+    reader = csv.DictReader(text)
+    missing = [field for field in REQUIRED if field not in (reader.fieldnames or ())]
+    if missing:
+        raise CatalogError(f"CSV header lacks {', '.join(missing)}")
+    for record in reader:
+        yield reader.line_num, record
+
+
+def _ndjson_records(text):
+    for line_no, line in enumerate(text, 1):
+        if not line.strip():
+            continue
+        try:
+            yield line_no, json.loads(line)
+        except ValueError as exc:
+            yield line_no, InvalidRow(f"not JSON: {exc}")
+
+
+def _feature_record(feature):
+    if not isinstance(feature, dict) or feature.get("type") != "Feature":
+        return InvalidRow("not a GeoJSON Feature")
+    record = dict(feature.get("properties") or {})
+    geometry = feature.get("geometry") or {}
+    coordinates = geometry.get("coordinates") or ()
+    if geometry.get("type") == "Point" and len(coordinates) >= 2:
+        record["longitude"], record["latitude"] = coordinates[:2]
+    return record
+
+
+def _geojson_records(text):
+    # the features of a FeatureCollection, decoded one at a time so a large
+    # file is never held in memory as a whole
+    decoder = json.JSONDecoder()
+    buffer = ""
+    while True:
+        key = buffer.find('"features"')
+        bracket = buffer.find("[", key) if key != -1 else -1
+        if bracket != -1:
+            break
+        chunk = text.read(READ_SIZE)
+        if not chunk:
+            raise CatalogError('no "features" array, expected a GeoJSON FeatureCollection')
+        buffer += chunk
+
+    buffer, pos, number = buffer[bracket + 1:], 0, 0
+    while True:
+        while pos < len(buffer) and buffer[pos] in ", \t\r\n":
+            pos += 1
+        if buffer.startswith("]", pos):
+            return
+        try:
+            feature, pos = decoder.raw_decode(buffer, pos)
+        except ValueError:
+            chunk = text.read(READ_SIZE)
+            if not chunk:
+                raise CatalogError(f"broken or truncated GeoJSON at feature {number + 1}")
+            buffer, pos = buffer[pos:] + chunk, 0
+            continue
+        number += 1
+        yield number, _feature_record(feature)
+
+
+_READERS = {"csv": _csv_records, "ndjson": _ndjson_records, "geojson": _geojson_records}
+
+
+def read_records(stream, fmt):
+    """(position, record) pairs from a binary stream in one of FORMATS."""
+    text = io.TextIOWrapper(stream, encoding="utf-8-sig", newline="")
+    try:
+        yield from _READERS[fmt](text)
+    finally:
+        text.detach()   # the caller owns the stream
+
+
+# ---------------- VALIDATION ----------------
+def _text(record, key):
+    value = record.get(key)
+    return "" if value is None else str(value)
+
+
+def _coordinate(record, key, limit):
+    value = _text(record, key).strip()
+    if not value:
+        raise InvalidRow(f"{key} is required")
+    try:
+        number = float(value)
+    except ValueError:
+        raise InvalidRow(f"{key} is not a number: {value!r}") from None
+    if not -limit <= number <= limit:
+        raise InvalidRow(f"{key} {number} is out of range")
+    return number
+
+
+def clean_record(record):
+    """Place column values from a record, held to the PlaceForm rules."""
+    if isinstance(record, InvalidRow):
+        raise record
+    if not isinstance(record, dict):
+        raise InvalidRow("expected an object")
+    values = {key: _text(record, key) for key in ("name", "description", "category", "region", "image")}
+    for key in ("name", "description", "category", "region"):
+        if not values[key].strip():
+            raise InvalidRow(f"{key} is required")
+    if len(values["name"]) > Place.name.type.length:
+        raise InvalidRow(f"name is longer than {Place.name.type.length} characters")
+    if len(values["image"]) > Place.image.type.length:
+        raise InvalidRow("image path is too long")
+    if values["category"] not in CATEGORIES:
+        raise InvalidRow(f"unknown category {values['category']!r}")
+    if values["region"] not in REGIONS:
+        raise InvalidRow(f"unknown region {values['region']!r}")
+    values["image"] = values["image"].strip() or None
+    values["latitude"] = _coordinate(record, "latitude", 90)
+    values["longitude"] = _coordinate(record, "longitude", 180)
+    return values
+
+
+def _valid_rows(records, report):
+    for position, record in records:
+        report.rows += 1
+        try:
+            yield position, clean_record(record)
+        except InvalidRow as exc:
+            report.reject(position, str(exc))
+
+
+def _chunks(rows, size):
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+# ---------------- WRITING ----------------
+def _natural_key(table):
+    return tuple_(table.c.name, table.c.region)
+
+
+def _write_chunk(rows, report):
+    """Upsert one chunk by (name, region) and commit it.
+
+    Core statements skip the mapper events, so the search index, the tile
+    cache and the cached pages are told here; the counters are reconciled
+    once after the whole import.
+    """
+    table = Place.__table__
+    incoming = {(row["name"], row["region"]): (position, row) for position, row in rows}
+    report.duplicates += len(rows) - len(incoming)
+
+    existing = {}
+    for row in db.session.execute(
+        select(table.c.id, *(table.c[field] for field in FIELDS)).where(_natural_key(table).in_(list(incoming)))
+    ):
+        existing.setdefault((row.name, row.region), []).append(row)
+
+    inserts, updates = [], []
+    for key, (position, values) in incoming.items():
+        values = dict(values, geo_key=geo_key(values["latitude"], values["longitude"]))
+        matches = existing.get(key)
+        if not matches:
+            inserts.append(values)
+        elif len(matches) > 1:
+            # added by hand before there was a natural key; don't guess which one is meant
+            report.reject(position, f"{len(matches)} places are already called {key[0]!r} in {key[1]}")
+        elif any(getattr(matches[0], field) != values[field] for field in FIELDS):
+            updates.append(dict(values, place_id=matches[0].id))
+        else:
+            report.unchanged += 1
+
+    if inserts:
+        db.session.execute(insert(table), inserts)
+    if updates:
+        # version_id_col is the ORM's job; a Core UPDATE bumps it itself
+        db.session.execute(
+            update(table).where(table.c.id == bindparam("place_id")).values(version=table.c.version + 1),
+            updates,
+        )
+    if inserts or updates:
+        changed = list({(row["name"], row["region"]) for row in (*inserts, *updates)})
+        index_places(db.session.execute(
+            select(table.c.id, table.c.name, table.c.description).where(_natural_key(table).in_(changed))
+        ).all())
+        mark_stale(Place)
+        mark_tiles_stale()
+    db.session.commit()
+    report.inserted += len(inserts)
+    report.updated += len(updates)
+
+
+def import_places(stream, fmt, chunk_size=None, progress=None):
+    """Validate and upsert places from a binary stream; returns a TransferReport.
+
+    Rows flow through a generator pipeline and are written chunk_size at a
+    time, one transaction per chunk, so memory stays flat however long the
+    file is. Chunks committed before an error stay committed. progress, if
+    given, is called with the report after every chunk.
+    """
+    chunk_size = chunk_size or current_app.config["PLACES_IMPORT_CHUNK_SIZE"]
+    report = TransferReport()
+    try:
+        for chunk in _chunks(_valid_rows(read_records(stream, fmt), report), chunk_size):
+            _write_chunk(chunk, report)
+            if progress is not None:
+                progress(report)
+    except Exception:
+        db.session.rollback()
+        raise
+    finally:
+        if report.inserted or report.updated:
+            reconcile_counts()
+    return report.finish()
+
+
+# ---------------- EXPORT ----------------
+def _export_rows(category=None, region=None):
+    table = Place.__table__
+    stmt = select(*(table.c[field] for field in FIELDS)).order_by(table.c.id)
+    if category:
+        stmt = stmt.where(table.c.category == category)
+    if region:
+        stmt = stmt.where(table.c.region == region)
+    # yield_per also turns on stream_results: a server-side cursor on PostgreSQL
+    yield from db.session.execute(
+        stmt.execution_options(yield_per=current_app.config["PLACES_EXPORT_YIELD_PER"])
+    )
+
+
+def _joined(pieces):
+    # many small strings out as fewer ~WRITE_SIZE ones
+    buffer, size = [], 0
+    for piece in pieces:
+        buffer.append(piece)
+        size += len(piece)
+        if size >= WRITE_SIZE:
+            yield "".join(buffer)
+            buffer, size = [], 0
+    if buffer:
+        yield "".join(buffer)
+
+
+def _csv_lines(rows):
+    line = io.StringIO()
+    writer = csv.writer(line)
+    writer.writerow(FIELDS)
+    for row in rows:
+        writer.writerow(row)
+        yield line.getvalue()
+        line.seek(0)
+        line.truncate()
+    yield line.getvalue()
+
+
+def _ndjson_lines(rows):
+    for row in rows:
+        yield json.dumps(dict(zip(FIELDS, row)), ensure_ascii=False) + "\n"
+
+
+def _geojson_features(rows):
+    yield '{"type": "FeatureCollection", "features": [\n'
+    separator = ""
+    for row in rows:
+        properties = dict(zip(FIELDS, row))
+        latitude, longitude = properties.pop("latitude"), properties.pop("longitude")
+        geometry = None
+        if latitude is not None and longitude is not None:
+            geometry = {"type": "Point", "coordinates": [longitude, latitude]}
+        feature = {"type": "Feature", "geometry": geometry, "properties": properties}
+        yield separator + json.dumps(feature, ensure_ascii=False)
+        separator = ",\n"
+    yield "\n]}\n"
+
+
+_WRITERS = {"csv": _csv_lines, "ndjson": _ndjson_lines, "geojson": _geojson_features}
+
+
+def export_places(fmt, category=None, region=None, report=None):
+    """The catalog as text chunks in fmt, read through a server-side cursor.
+
+    Pass a TransferReport to have the rows counted as they go out.
+    """
+    rows = _export_rows(category, region)
+    if report is not None:
+        rows = _counted(rows, report)
+    return _joined(_WRITERS[fmt](rows))
+
+
+def _counted(rows, report):
+    for row in rows:
+        report.rows += 1
+        yield row
+
+
+# ---------------- CLI ----------------
+def _format_option(path, fmt):
+    if fmt:
+        return fmt
+    if path == "-":
+        raise click.UsageError("--format is required with stdin/stdout")
+    try:
+        return detect_format(path)
+    except CatalogError as exc:
+        raise click.UsageError(str(exc)) from None
+
+
+@places_cli.command("import")
+@click.argument("path", type=click.Path(exists=True, dir_okay=False, allow_dash=True))
+@click.option("--format", "fmt", type=click.Choice(FORMATS), help="Default: from the file extension.")
+@click.option("--chunk-size", type=click.IntRange(min=1), help="Rows per INSERT/UPDATE batch and transaction.")
+def import_command(path, fmt, chunk_size):
+    """Upsert places from a CSV, NDJSON or GeoJSON file ("-" for stdin), matched by name and region."""
+    fmt = _format_option(path, fmt)
+
+    def progress(report):
+        click.echo(f"  {report.rows} rows, {report.rows_per_sec:,.0f} rows/s", err=True)
+
+    with click.open_file(path, "rb") as stream:
+        try:
+            report = import_places(stream, fmt, chunk_size, progress=progress)
+        except CatalogError as exc:
+            raise click.ClickException(str(exc)) from None
+    for position, message in report.errors:
+        click.echo(f"  {position}: {message}", err=True)
+    click.echo(
+        f"Read {report.rows} rows in {report.seconds:.1f}s ({report.rows_per_sec:,.0f} rows/s): "
+        f"{report.inserted} inserted, {report.updated} updated, {report.unchanged} unchanged, "
+        f"{report.duplicates} duplicates, {report.rejected} rejected."
+    )
+
+
+@places_cli.command("export")
+@click.argument("path", default="-", type=click.Path(dir_okay=False, writable=True, allow_dash=True))
+@click.option("--format", "fmt", type=click.Choice(FORMATS), help="Default: from the file extension.")
+@click.option("--category", type=click.Choice(sorted(CATEGORIES)))
+@click.option("--region", type=click.Choice(sorted(REGIONS)))
+def export_command(path, fmt, category, region):
+    """Write every place (or one category/region) to PATH, "-" for stdout."""
+    fmt = _format_option(path, fmt)
+    report = TransferReport()
+    with click.open_file(path, "wb") as out:
+        for chunk in export_places(fmt, category=category, region=region, report=report):
+            out.write(chunk.encode("utf-8"))
+    report.finish()
+    click.echo(f"Exported {report.rows} places in {report.seconds:.1f}s ({report.rows_per_sec:,.0f} rows/s).", err=True)
+
+
+def init_catalog(app):
+    app.config.setdefault("PLACES_IMPORT_CHUNK_SIZE", IMPORT_CHUNK_SIZE)
+    app.config.setdefault("PLACES_EXPORT_YIELD_PER", EXPORT_YIELD_PER)
+    app.cli.add_command(places_cli)
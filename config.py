@@ -0,0 +1,68 @@
+import os
+
+
+def _env_int(name, default):
+    value = os.environ.get(name)
+    return int(value) if value not in (None, "") else default
+
+
+def database_url():
+    url = os.environ.get("DATABASE_URL", "sqlite:///database.db")
+    # some hosts still hand out the pre-SQLAlchemy-1.4 scheme
+    if url.startswith("postgres://"):
+        url = "postgresql://" + url[len("postgres://"):]
+    return url
+
+
+def engine_options(url):
+    """Pool settings for SQLALCHEMY_ENGINE_OPTIONS, driven by the environment.
+
+    DB_POOL_SIZE / DB_MAX_OVERFLOW / DB_POOL_TIMEOUT / DB_POOL_RECYCLE size the
+    connection pool. For SQLite see database.py for the per-connection pragmas.
+    """
+    options = {
+        "pool_pre_ping": os.environ.get("DB_POOL_PRE_PING", "1") != "0",
+        "pool_recycle": _env_int("DB_POOL_RECYCLE", 1800),
+    }
+    if url.startswith("sqlite"):
+        if url in ("sqlite://", "sqlite:///:memory:"):
+            return options
+        # sqlite3's own lock wait, on top of PRAGMA busy_timeout
+        options["connect_args"] = {"timeout": _env_int("SQLITE_BUSY_TIMEOUT_MS", 5000) / 1000}
+    else:
+        options["pool_timeout"] = _env_int("DB_POOL_TIMEOUT", 30)
+    options["pool_size"] = _env_int("DB_POOL_SIZE", 5)
+    options["max_overflow"] = _env_int("DB_MAX_OVERFLOW", 10)
+    return options
+
+
+class Config:
+    SECRET_KEY = os.environ.get("SECRET_KEY", "super-secret-key")
+    SQLALCHEMY_DATABASE_URI = database_url()
+    SQLALCHEMY_ENGINE_OPTIONS = engine_options(SQLALCHEMY_DATABASE_URI)
+    SQLALCHEMY_TRACK_MODIFICATIONS = False
+
+    CACHE_URL = os.environ.get("CACHE_URL")  # e.g. redis://localhost:6379/0
+    CACHE_DEFAULT_TTL = _env_int("CACHE_DEFAULT_TTL", 300)
+    CACHE_LOCAL_TTL = _env_int("CACHE_LOCAL_TTL", 10 if CACHE_URL else 300)
+    CACHE_MAX_ENTRIES = _env_int("CACHE_MAX_ENTRIES", 1024)
+
+    # werkzeug method string; existing hashes are upgraded when their owner next logs in
+    PASSWORD_HASH_METHOD = os.environ.get("PASSWORD_HASH_METHOD", "scrypt:32768:8:1")
+    # token buckets checked before any password hashing, "<burst>/<second|minute|hour|day>"
+    LOGIN_RATE_PER_IP = os.environ.get("LOGIN_RATE_PER_IP", "20/minute")
+    LOGIN_RATE_PER_ACCOUNT = os.environ.get("LOGIN_RATE_PER_ACCOUNT", "5/minute")
+    RATELIMIT_ENABLED = os.environ.get("RATELIMIT_ENABLED", "1") != "0"
+    # per-worker buckets multiply the limits by the worker count; share them through Redis
+    RATELIMIT_STORAGE_URL = os.environ.get("RATELIMIT_STORAGE_URL", CACHE_URL)
+
+    # gzip/brotli in the app (streaming.py); turn off when a proxy compresses instead
+    COMPRESS_RESPONSES = os.environ.get("COMPRESS_RESPONSES", "1") != "0"
+
+    # whole request body / single uploaded image, checked while streaming
+    MAX_CONTENT_LENGTH = _env_int("MAX_CONTENT_LENGTH", 16 * 1024 * 1024)
+    MAX_IMAGE_BYTES = _env_int("MAX_IMAGE_BYTES", 12 * 1024 * 1024)
+
+    SQLITE_BUSY_TIMEOUT_MS = _env_int("SQLITE_BUSY_TIMEOUT_MS", 5000)
+    SQLITE_JOURNAL_MODE = os.environ.get("SQLITE_JOURNAL_MODE", "WAL")
+    SQLITE_SYNCHRONOUS = os.environ.get("SQLITE_SYNCHRONOUS", "NORMAL")
@@ -0,0 +1,68 @@
+import os
+import weakref
+
+from sqlalchemy import event
+from bulk import UPSERT_DIALECTS
+from models import db
+
+JOURNAL_MODES = {"DELETE", "TRUNCATE", "PERSIST", "MEMORY", "WAL", "OFF"}
+SYNCHRONOUS_LEVELS = {"OFF", "NORMAL", "FULL", "EXTRA"}
+
+
+def configure_sqlite(engine, config):
+    """Apply WAL / busy_timeout / synchronous on every new SQLite connection.
+
+    WAL lets readers run alongside the single writer, so a favorite toggle no
+    longer blocks page views; busy_timeout makes writers queue instead of
+    failing with "database is locked".
+    """
+    journal_mode = config["SQLITE_JOURNAL_MODE"].upper()
+    synchronous = config["SQLITE_SYNCHRONOUS"].upper()
+    busy_timeout = int(config["SQLITE_BUSY_TIMEOUT_MS"])
+    if journal_mode not in JOURNAL_MODES or synchronous not in SYNCHRONOUS_LEVELS:
+        raise ValueError(f"bad SQLite pragma settings: {journal_mode} / {synchronous}")
+    in_memory = engine.url.database in (None, "", ":memory:")
+
+    @event.listens_for(engine, "connect")
+    def _set_sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        cursor.execute(f"PRAGMA busy_timeout = {busy_timeout}")
+        if not in_memory:
+            cursor.execute(f"PRAGMA journal_mode = {journal_mode}")
+        cursor.execute(f"PRAGMA synchronous = {synchronous}")
+        cursor.close()
+
+
+# ---------------- FORK SAFETY ----------------
+# every engine create_app() made in this process
+_engines = weakref.WeakSet()
+
+
+def dispose_engines(close=True):
+    """Drop pooled connections. close=False leaves the parent's sockets alone."""
+    for engine in list(_engines):
+        engine.dispose(close=close)
+
+
+def _after_fork_in_child():
+    # a pooled connection inherited from the parent shares its socket; using
+    # it from two processes corrupts the protocol stream, so start empty
+    dispose_engines(close=False)
+
+
+os.register_at_fork(after_in_child=_after_fork_in_child)
+
+
+def init_database(app):
+    with app.app_context():
+        _engines.update(db.engines.values())
+        for engine in db.engines.values():
+            # favorites, routes, ratings and counters are written with
+            # INSERT ... ON CONFLICT, see bulk.dialect_insert
+            if engine.dialect.name not in UPSERT_DIALECTS:
+                raise ValueError(
+                    f"unsupported database {engine.dialect.name!r}: "
+                    f"GreenSpots runs on {' or '.join(sorted(UPSERT_DIALECTS))}"
+                )
+        if db.engine.dialect.name == "sqlite":
+            configure_sqlite(db.engine, app.config)
@@ -0,0 +1,86 @@
+import os
+import time
+import zlib
+
+from flask import current_app, g
+from jinja2 import FileSystemBytecodeCache, nodes
+from jinja2.ext import Extension
+from markupsafe import Markup
+from sqlalchemy import inspect
+
+from assets import build_version
+from cache import cache
+
+
+FRAGMENT_TTL = 300
+
+
+# ---------------- FRAGMENT CACHE ----------------
+class FragmentCacheExtension(Extension):
+    """{% cache key[, ttl] %}...{% endcache %}
+
+    Stores the rendered block in the shared cache. Keys are global, not per
+    user, so anything that depends on current_user has to stay outside the
+    block. A tuple key is joined with ":".
+    """
+
+    tags = {"cache"}
+
+    def parse(self, parser):
+        lineno = next(parser.stream).lineno
+        args = [parser.parse_expression()]
+        if parser.stream.skip_if("comma"):
+            args.append(parser.parse_expression())
+        else:
+            args.append(nodes.Const(None))
+        body = parser.parse_statements(("name:endcache",), drop_needle=True)
+        return nodes.CallBlock(self.call_method("_cached_fragment", args), [], [], body).set_lineno(lineno)
+
+    def _cached_fragment(self, key, ttl, caller):
+        full_key = fragment_key(key)
+        html = cache.get(full_key)
+        if html is None:
+            html = str(caller())
+            cache.set(full_key, html, ttl=ttl or current_app.config["FRAGMENT_TTL"])
+        return Markup(html)
+
+
+def fragment_key(key):
+    if isinstance(key, (tuple, list)):
+        key = ":".join(str(part) for part in key)
+    # locale and asset build change the markup of every fragment
+    locale = g.get("locale") or current_app.config["LOCALE"]
+    return f"fragment:{locale}:{build_version()}:{key}"
+
+
+def model_version(obj):
+    """Short checksum of a row's column values, for use in fragment keys."""
+    mapper = inspect(obj).mapper
+    values = tuple(getattr(obj, attr.key) for attr in mapper.column_attrs)
+    return format(zlib.crc32(repr(values).encode("utf-8")), "08x")
+
+
+# ---------------- WARMUP ----------------
+def warm_templates(app):
+    """Compile every template now instead of on each worker's first request."""
+    started = time.perf_counter()
+    names = app.jinja_env.list_templates(extensions=("html",))
+    for name in names:
+        app.jinja_env.get_template(name)
+    app.logger.debug("compiled %d templates in %.0f ms", len(names), (time.perf_counter() - started) * 1000)
+
+
+def init_fragments(app):
+    app.config.setdefault("FRAGMENT_TTL", FRAGMENT_TTL)
+    app.config.setdefault("LOCALE", "ka")
+    app.config.setdefault("TEMPLATE_BYTECODE_CACHE", os.path.join(app.instance_path, "jinja"))
+    app.config.setdefault("TEMPLATE_WARMUP", True)
+
+    app.jinja_env.add_extension(FragmentCacheExtension)
+    app.jinja_env.filters["version"] = model_version
+    if app.config["TEMPLATE_BYTECODE_CACHE"]:
+        # compiled code is shared by workers and survives restarts
+        os.makedirs(app.config["TEMPLATE_BYTECODE_CACHE"], exist_ok=True)
+        app.jinja_env.bytecode_cache = FileSystemBytecodeCache(app.config["TEMPLATE_BYTECODE_CACHE"])
+    if app.config["TEMPLATE_WARMUP"]:
+        warm_templates(app)
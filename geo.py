@@ -0,0 +1,230 @@
+import hashlib
+import heapq
+import json
+import math
+import threading
+import time
+from collections import OrderedDict
+
+from sqlalchemy import event, func, inspect
+from models import db, Place
+
+
+# Every place gets a Morton (Z-order) key of its slippy-map tile at KEY_ZOOM.
+# Any coarser tile z/x/y covers one contiguous key range, so a tile query is a
+# single BETWEEN scan on the indexed place.geo_key column.
+KEY_ZOOM = 16
+MAX_LAT = 85.05112878
+
+CLUSTER_MAX_ZOOM = 11   # at or below this zoom markers are aggregated
+CLUSTER_CELL_BITS = 3   # each tile is split into 8x8 cluster cells
+MAX_TILE_MARKERS = 500
+MAX_BBOX_TILES = 64
+
+TILE_TTL = 60           # seconds
+TILE_CACHE_SIZE = 4096
+
+
+# ---------------- TILE MATH ----------------
+def tile_xy(lat, lng, zoom):
+    lat = max(-MAX_LAT, min(MAX_LAT, lat))
+    n = 1 << zoom
+    x = int((lng + 180.0) / 360.0 * n)
+    lat_rad = math.radians(lat)
+    y = int((1.0 - math.asinh(math.tan(lat_rad)) / math.pi) / 2.0 * n)
+    return min(max(x, 0), n - 1), min(max(y, 0), n - 1)
+
+
+def interleave(x, y):
+    key = 0
+    for bit in range(KEY_ZOOM):
+        key |= ((x >> bit) & 1) << (2 * bit + 1)
+        key |= ((y >> bit) & 1) << (2 * bit)
+    return key
+
+
+def geo_key(lat, lng):
+    if lat is None or lng is None:
+        return None
+    return interleave(*tile_xy(lat, lng, KEY_ZOOM))
+
+
+def key_range(zoom, x, y):
+    """Inclusive geo_key range covered by tile zoom/x/y (zoom <= KEY_ZOOM)."""
+    shift = 2 * (KEY_ZOOM - zoom)
+    low = interleave(x, y) << shift
+    return low, low + (1 << shift) - 1
+
+
+def tiles_for_bbox(min_lat, min_lng, max_lat, max_lng, zoom):
+    x0, y0 = tile_xy(max_lat, min_lng, zoom)   # tile y grows southwards
+    x1, y1 = tile_xy(min_lat, max_lng, zoom)
+    return [(x, y) for x in range(x0, x1 + 1) for y in range(y0, y1 + 1)]
+
+
+@event.listens_for(Place, "before_insert")
+@event.listens_for(Place, "before_update")
+def _set_geo_key(mapper, connection, target):
+    target.geo_key = geo_key(target.latitude, target.longitude)
+
+
+# ---------------- TILE PAYLOADS ----------------
+def _marker(place_id, name, lat, lng):
+    return {"id": place_id, "name": name, "lat": lat, "lng": lng}
+
+
+def build_tile(zoom, x, y):
+    """Markers (and clusters at low zoom) for one tile."""
+    low, high = key_range(zoom, x, y) if zoom <= KEY_ZOOM else _fine_range(zoom, x, y)
+    in_tile = Place.geo_key.between(low, high)
+
+    if zoom > CLUSTER_MAX_ZOOM:
+        rows = (
+            db.session.query(Place.id, Place.name, Place.latitude, Place.longitude)
+            .filter(in_tile)
+            .order_by(Place.id)
+            .limit(MAX_TILE_MARKERS)
+        )
+        return {"markers": [_marker(*row) for row in rows], "clusters": []}
+
+    cell = Place.geo_key // (1 << 2 * (KEY_ZOOM - zoom - CLUSTER_CELL_BITS))
+    groups = (
+        db.session.query(
+            func.count(Place.id), func.avg(Place.latitude), func.avg(Place.longitude), func.min(Place.id)
+        )
+        .filter(in_tile)
+        .group_by(cell)
+        .all()
+    )
+    single_ids = [place_id for count, _, _, place_id in groups if count == 1]
+    markers = []
+    if single_ids:
+        rows = (
+            db.session.query(Place.id, Place.name, Place.latitude, Place.longitude)
+            .filter(Place.id.in_(single_ids))
+            .order_by(Place.id)
+        )
+        markers = [_marker(*row) for row in rows]
+    clusters = [
+        {"lat": lat, "lng": lng, "count": count}
+        for count, lat, lng, _ in groups if count > 1
+    ]
+    return {"markers": markers, "clusters": clusters}
+
+
+def _fine_range(zoom, x, y):
+    # beyond KEY_ZOOM the parent key tile is the finest filter we have
+    shift = zoom - KEY_ZOOM
+    return key_range(KEY_ZOOM, x >> shift, y >> shift)
+
+
+# ---------------- NEAREST NEIGHBOURS ----------------
+EARTH_RADIUS_KM = 6371.0088
+KM_PER_DEGREE = 111.195
+DEFAULT_NEIGHBOURS = 10
+MAX_NEIGHBOURS = 50
+START_RADIUS_KM = 10
+MAX_RADIUS_KM = 500
+
+
+def haversine_km(lat1, lng1, lat2, lng2):
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    d_phi = phi2 - phi1
+    d_lambda = math.radians(lng2 - lng1)
+    a = math.sin(d_phi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(d_lambda / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a)))
+
+
+def _candidates(lat, lng, radius_km, exclude_id):
+    # bounding box on the (latitude, longitude) index, exact distance in Python
+    d_lat = radius_km / KM_PER_DEGREE
+    d_lng = radius_km / (KM_PER_DEGREE * max(math.cos(math.radians(lat)), 0.01))
+    query = db.session.query(Place.id, Place.latitude, Place.longitude).filter(
+        Place.latitude.between(lat - d_lat, lat + d_lat),
+        Place.longitude.between(lng - d_lng, lng + d_lng),
+    )
+    if exclude_id is not None:
+        query = query.filter(Place.id != exclude_id)
+    for place_id, place_lat, place_lng in query:
+        distance = haversine_km(lat, lng, place_lat, place_lng)
+        if distance <= radius_km:
+            yield distance, place_id
+
+
+def nearest_places(lat, lng, k=DEFAULT_NEIGHBOURS, radius_km=None, exclude_id=None):
+    """Return up to k (place, distance_km) pairs, nearest first.
+
+    The box starts at START_RADIUS_KM and doubles until k places are within
+    its inscribed radius, or it reaches radius_km (MAX_RADIUS_KM without one).
+    """
+    k = max(1, min(k, MAX_NEIGHBOURS))
+    limit = radius_km if radius_km is not None else MAX_RADIUS_KM
+    radius = min(START_RADIUS_KM, limit)
+    while True:
+        nearest = heapq.nsmallest(k, _candidates(lat, lng, radius, exclude_id))
+        if len(nearest) >= k or radius >= limit:
+            break
+        radius = min(radius * 2, limit)
+
+    places = {place.id: place for place in Place.query.filter(Place.id.in_([pid for _, pid in nearest]))}
+    return [(places[place_id], distance) for distance, place_id in nearest if place_id in places]
+
+
+# ---------------- TILE CACHE ----------------
+_tile_cache = OrderedDict()   # "z/x/y" -> (expires_at, body, etag)
+_tile_lock = threading.Lock()
+
+
+def get_tile(zoom, x, y):
+    """Return (body, etag) for a tile, served from the per-worker cache when fresh."""
+    cache_key = f"{zoom}/{x}/{y}"
+    now = time.monotonic()
+    with _tile_lock:
+        entry = _tile_cache.get(cache_key)
+        if entry and entry[0] > now:
+            _tile_cache.move_to_end(cache_key)
+            return entry[1], entry[2]
+
+    body = json.dumps(build_tile(zoom, x, y), ensure_ascii=False, separators=(",", ":"), sort_keys=True)
+    etag = hashlib.sha1(body.encode("utf-8")).hexdigest()
+    with _tile_lock:
+        _tile_cache[cache_key] = (now + TILE_TTL, body, etag)
+        _tile_cache.move_to_end(cache_key)
+        while len(_tile_cache) > TILE_CACHE_SIZE:
+            _tile_cache.popitem(last=False)
+    return body, etag
+
+
+def clear_tile_cache():
+    with _tile_lock:
+        _tile_cache.clear()
+
+
+def _moves_marker(obj):
+    if not isinstance(obj, Place):
+        return False
+    attrs = inspect(obj).attrs
+    return any(attrs[name].history.has_changes() for name in ("name", "latitude", "longitude"))
+
+
+def mark_tiles_stale():
+    """Clear the tile cache after the next commit, for Core writes to place."""
+    db.session.info["geo_dirty"] = True
+
+
+@event.listens_for(db.session, "after_flush")
+def _note_place_changes(session, flush_context):
+    changed = any(isinstance(obj, Place) for obj in (*session.new, *session.deleted))
+    if changed or any(_moves_marker(obj) for obj in session.dirty):
+        session.info["geo_dirty"] = True
+
+
+@event.listens_for(db.session, "after_commit")
+def _invalidate_tiles(session):
+    if session.info.pop("geo_dirty", False):
+        clear_tile_cache()
+
+
+@event.listens_for(db.session, "after_rollback")
+def _forget_place_changes(session):
+    session.info.pop("geo_dirty", None)
@@ -0,0 +1,28 @@
+"""gunicorn settings, read automatically from the working directory.
+
+    gunicorn --workers 4 --bind 0.0.0.0:8000
+    GUNICORN_PRELOAD=0 gunicorn ...      # build the app in every worker instead
+
+With preload the app is built and warmed up once in the master, then
+forked: workers share its memory copy-on-write and serve their first
+request with compiled templates and a primed cache. database.py throws
+away pooled connections in every forked child.
+"""
+import os
+
+wsgi_app = "app:create_app()"
+preload_app = os.environ.get("GUNICORN_PRELOAD", "1") != "0"
+workers = int(os.environ.get("WEB_CONCURRENCY", 2))
+
+
+def when_ready(server):
+    # master, after the preloaded app was built and before any fork
+    if server.cfg.preload_app:
+        from app import warm_up
+        warm_up(server.app.wsgi())
+
+
+def post_worker_init(worker):
+    if not worker.cfg.preload_app:
+        from app import warm_up
+        warm_up(worker.wsgi)
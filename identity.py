@@ -0,0 +1,122 @@
+from flask import has_request_context, session
+from sqlalchemy import event, select
+from cache import LRUCache
+from models import db, User, favorites_table
+
+
+# ---------------- SNAPSHOT ----------------
+class UserSnapshot:
+    """What a request needs to know about the logged-in user, without an ORM row.
+
+    Views that change the user load the User themselves
+    (db.session.get(User, current_user.id)).
+    """
+
+    __slots__ = ("id", "username", "email", "role", "is_admin", "favorite_ids")
+
+    is_authenticated = True
+    is_active = True
+    is_anonymous = False
+
+    def __init__(self, id, username, email, role, is_admin, favorite_ids):
+        self.id = id
+        self.username = username
+        self.email = email
+        self.role = role
+        self.is_admin = bool(is_admin)
+        self.favorite_ids = frozenset(favorite_ids)
+
+    def get_id(self):
+        return str(self.id)
+
+    def is_favorite(self, place_id):
+        return place_id in self.favorite_ids
+
+
+def load_snapshot(user_id):
+    """One query: the user's columns repeated on each of their favorites (or once, with NULL)."""
+    rows = db.session.execute(
+        select(User.id, User.username, User.email, User.role, User.is_admin, favorites_table.c.place_id)
+        .outerjoin(favorites_table, favorites_table.c.user_id == User.id)
+        .where(User.id == user_id)
+    ).all()
+    if not rows:
+        return None
+    favorite_ids = [row[-1] for row in rows if row[-1] is not None]
+    return UserSnapshot(*rows[0][:-1], favorite_ids)
+
+
+# ---------------- CACHE ----------------
+# Entries are per worker, stored with the user's session version: a change
+# bumps the version in that user's cookie, so their next request misses in
+# every worker, not just this one. Changes made for someone else (an admin
+# editing a user) reach other workers when the entry expires.
+SESSION_VERSION = "_identity_v"
+
+_snapshots = LRUCache(max_entries=4096, default_ttl=30)   # user id -> (version, snapshot)
+
+
+def _session_version():
+    return session.get(SESSION_VERSION, 0) if has_request_context() else 0
+
+
+def cached_snapshot(user_id):
+    """The flask_login user_loader: no queries while the entry is fresh."""
+    version = _session_version()
+    entry = _snapshots.get(user_id)
+    if entry is not None and entry[0] == version:
+        return entry[1]
+    snapshot = load_snapshot(user_id)
+    if snapshot is not None:
+        _snapshots.set(user_id, (version, snapshot))
+    return snapshot
+
+
+def forget_identity(user_id):
+    """Drop user_id's snapshot once the current transaction commits."""
+    db.session.info.setdefault("stale_identities", set()).add(user_id)
+
+
+def confirmed_admin(user):
+    """user.is_admin, re-read from the database: use it to authorize admin actions.
+
+    Another worker's snapshot can be IDENTITY_CACHE_TTL seconds old, fine for
+    showing admin links but not for acting on them. A snapshot without admin
+    rights is trusted as is; a promotion just takes effect a little later.
+    """
+    if not user.is_admin:
+        return False
+    if db.session.scalar(select(User.is_admin).where(User.id == user.id)):
+        return True
+    _snapshots.delete(user.id)  # demoted since it was cached
+    return False
+
+
+@event.listens_for(db.session, "after_flush")
+def _collect_changed_users(db_session, flush_context):
+    for obj in (*db_session.dirty, *db_session.deleted):
+        if isinstance(obj, User):
+            db_session.info.setdefault("stale_identities", set()).add(obj.id)
+
+
+@event.listens_for(db.session, "after_commit")
+def _drop_stale_identities(db_session):
+    stale = db_session.info.pop("stale_identities", None)
+    if not stale:
+        return
+    _snapshots.delete(*stale)
+    if has_request_context() and session.get("_user_id") in {str(user_id) for user_id in stale}:
+        session[SESSION_VERSION] = session.get(SESSION_VERSION, 0) + 1
+
+
+@event.listens_for(db.session, "after_rollback")
+def _keep_identities(db_session):
+    db_session.info.pop("stale_identities", None)
+
+
+def init_identity(app, login_manager):
+    app.config.setdefault("IDENTITY_CACHE_TTL", 30)
+    app.config.setdefault("IDENTITY_CACHE_SIZE", 4096)
+    _snapshots.max_entries = app.config["IDENTITY_CACHE_SIZE"]
+    _snapshots.default_ttl = app.config["IDENTITY_CACHE_TTL"]
+    login_manager.user_loader(lambda user_id: cached_snapshot(int(user_id)))
@@ -0,0 +1,176 @@
+import json
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import click
+from flask import current_app, url_for
+from flask.cli import AppGroup
+from PIL import Image, ImageOps
+
+from uploads import incoming_upload
+
+
+images_cli = AppGroup("images", help="Manage uploaded image variants.")
+
+VARIANT_WIDTHS = (320, 640, 1280)
+MAX_ORIGINAL_WIDTH = 2048
+WEBP_QUALITY = 80
+JPEG_QUALITY = 82
+VARIANTS_DIR = "variants"
+
+_SAVE_FORMATS = {".jpg": "JPEG", ".jpeg": "JPEG", ".png": "PNG", ".webp": "WEBP"}
+
+_executor = None
+_executor_lock = threading.Lock()
+_manifests = {}   # filename -> widths, only once processing has finished
+
+
+# ---------------- UPLOAD ----------------
+def save_upload(file_storage):
+    """Store an uploaded image under its content hash and queue its variants.
+
+    Returns the stored filename; re-uploading the same bytes reuses the
+    existing file and its variants.
+    """
+    folder = current_app.config["UPLOAD_FOLDER"]
+    filename = incoming_upload(file_storage).store(folder)
+    if _read_manifest(folder, filename) is None:
+        schedule_processing(folder, filename)
+    return filename
+
+
+def schedule_processing(folder, filename):
+    app = current_app._get_current_object()
+    if app.config.get("IMAGE_PROCESSING_SYNC"):
+        process_image(folder, filename)
+        return
+    _get_executor(app).submit(_process_logged, app, folder, filename)
+
+
+def _get_executor(app):
+    # created lazily so each (forked) worker process gets its own threads
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=app.config.get("IMAGE_WORKERS", 2), thread_name_prefix="images"
+            )
+        return _executor
+
+
+def _process_logged(app, folder, filename):
+    try:
+        process_image(folder, filename)
+    except Exception:
+        app.logger.exception("image processing failed for %s", filename)
+
+
+# ---------------- PROCESSING ----------------
+def _write_atomic(path, data):
+    tmp = f"{path}.{threading.get_ident()}.tmp"
+    with open(tmp, "wb") as fh:
+        fh.write(data)
+    os.replace(tmp, path)
+
+
+def _save_atomic(image, path, fmt, **options):
+    tmp = f"{path}.{threading.get_ident()}.tmp"
+    image.save(tmp, format=fmt, **options)
+    os.replace(tmp, path)
+
+
+def process_image(folder, filename):
+    """Strip metadata, cap the original's size and write WebP/JPEG width variants."""
+    stem, ext = os.path.splitext(filename)
+    variants_dir = os.path.join(folder, VARIANTS_DIR)
+    os.makedirs(variants_dir, exist_ok=True)
+    path = os.path.join(folder, filename)
+
+    with Image.open(path) as source:
+        image = ImageOps.exif_transpose(source)
+        image = image.convert("RGBA" if image.mode in ("RGBA", "LA", "P") and ext == ".png" else "RGB")
+
+    if image.width > MAX_ORIGINAL_WIDTH:
+        image.thumbnail((MAX_ORIGINAL_WIDTH, MAX_ORIGINAL_WIDTH * image.height // image.width), Image.LANCZOS)
+    # re-encoding without exif= drops EXIF (GPS, camera serials) from the original
+    _save_atomic(image, path, _SAVE_FORMATS.get(ext, "JPEG"), quality=JPEG_QUALITY, optimize=True)
+
+    rgb = image.convert("RGB")
+    widths = sorted({min(width, image.width) for width in VARIANT_WIDTHS})
+    for width in widths:
+        height = max(1, round(image.height * width / image.width))
+        variant = rgb.resize((width, height), Image.LANCZOS) if width != image.width else rgb
+        base = os.path.join(variants_dir, f"{stem}-{width}")
+        _save_atomic(variant, base + ".webp", "WEBP", quality=WEBP_QUALITY, method=4)
+        _save_atomic(variant, base + ".jpg", "JPEG", quality=JPEG_QUALITY, optimize=True, progressive=True)
+
+    # the manifest is written last: its presence means every variant is on disk
+    _write_atomic(
+        os.path.join(variants_dir, stem + ".json"),
+        json.dumps({"widths": widths}).encode("utf-8"),
+    )
+    _manifests[filename] = widths
+    return widths
+
+
+def _read_manifest(folder, filename):
+    widths = _manifests.get(filename)
+    if widths is not None:
+        return widths
+    stem = os.path.splitext(filename)[0]
+    try:
+        with open(os.path.join(folder, VARIANTS_DIR, stem + ".json"), encoding="utf-8") as fh:
+            widths = json.load(fh)["widths"]
+    except (OSError, ValueError, KeyError):
+        return None
+    _manifests[filename] = widths
+    return widths
+
+
+# ---------------- TEMPLATE HELPERS ----------------
+def image_variants(filename):
+    """srcset strings for an upload, or None while it has no variants yet."""
+    if not filename:
+        return None
+    widths = _read_manifest(current_app.config["UPLOAD_FOLDER"], filename)
+    if not widths:
+        return None
+    stem = os.path.splitext(filename)[0]
+
+    def variant_url(width, ext):
+        return url_for('static', filename=f"uploads/{VARIANTS_DIR}/{stem}-{width}.{ext}")
+
+    return {
+        "webp": ", ".join(f"{variant_url(w, 'webp')} {w}w" for w in widths),
+        "jpeg": ", ".join(f"{variant_url(w, 'jpg')} {w}w" for w in widths),
+        "fallback": variant_url(widths[len(widths) // 2], "jpg"),
+    }
+
+
+def image_version(filename):
+    """Variant widths of an upload as a fragment-key part; changes once processing finishes."""
+    widths = _read_manifest(current_app.config["UPLOAD_FOLDER"], filename) if filename else None
+    return "-".join(map(str, widths)) if widths else "orig"
+
+
+@images_cli.command("backfill")
+def backfill_command():
+    """Generate variants for uploads that don't have them yet (runs inline)."""
+    folder = current_app.config["UPLOAD_FOLDER"]
+    done = 0
+    for filename in sorted(os.listdir(folder)):
+        if os.path.splitext(filename)[1].lower() not in _SAVE_FORMATS:
+            continue
+        if _read_manifest(folder, filename) is None:
+            process_image(folder, filename)
+            done += 1
+    click.echo(f"Generated variants for {done} uploads.")
+
+
+def init_images(app):
+    app.config.setdefault("IMAGE_WORKERS", 2)
+    app.config.setdefault("IMAGE_PROCESSING_SYNC", False)
+    app.add_template_global(image_variants)
+    app.add_template_filter(image_version)
+    app.cli.add_command(images_cli)
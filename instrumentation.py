@@ -0,0 +1,187 @@
+import heapq
+import json
+import logging
+import threading
+import time
+from collections import deque
+from functools import partial
+
+from flask import before_render_template, current_app, g, has_request_context, request, template_rendered
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+
+slow_log = logging.getLogger("greenspots.slow")
+
+SLOWEST_PER_ENDPOINT = 5
+STATEMENT_PREVIEW = 300
+
+
+def _keep_slowest(heap, entry):
+    if len(heap) < SLOWEST_PER_ENDPOINT:
+        heapq.heappush(heap, entry)
+    elif entry > heap[0]:
+        heapq.heapreplace(heap, entry)
+
+
+# ---------------- SQL TIMING ----------------
+@event.listens_for(Engine, "before_cursor_execute")
+def _start_query(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _end_query(conn, cursor, statement, parameters, context, executemany):
+    elapsed = (time.perf_counter() - conn.info["query_started"].pop()) * 1000
+    if not has_request_context():
+        return
+    g.query_count = g.get("query_count", 0) + 1
+    g.db_ms = g.get("db_ms", 0.0) + elapsed
+    _keep_slowest(g.setdefault("slowest_statements", []), (elapsed, statement[:STATEMENT_PREVIEW]))
+
+
+# ---------------- TEMPLATE TIMING ----------------
+def _template_started(sender, template, context, **extra):
+    g.setdefault("template_stack", []).append(time.perf_counter())
+
+
+def _template_finished(sender, template, context, **extra):
+    stack = g.get("template_stack")
+    if not stack:
+        return
+    started = stack.pop()
+    if not stack:  # only count the outermost render_template call
+        g.template_ms = g.get("template_ms", 0.0) + (time.perf_counter() - started) * 1000
+
+
+# ---------------- AGGREGATION ----------------
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+class EndpointMetrics:
+    """Rolling per-endpoint samples plus the slowest statements seen."""
+
+    def __init__(self, window):
+        self.samples = deque(maxlen=window)   # (total_ms, db_ms, queries, template_ms)
+        self.slowest = []                     # min-heap of (ms, statement)
+        self.requests = 0
+
+    def add(self, sample, statements):
+        self.requests += 1
+        self.samples.append(sample)
+        for entry in statements:
+            _keep_slowest(self.slowest, entry)
+
+    def summary(self, endpoint):
+        totals = [s[0] for s in self.samples]
+        return {
+            "endpoint": endpoint,
+            "requests": self.requests,
+            "p50_ms": percentile(totals, 50),
+            "p95_ms": percentile(totals, 95),
+            "p99_ms": percentile(totals, 99),
+            "db_p95_ms": percentile([s[1] for s in self.samples], 95),
+            "template_p95_ms": percentile([s[3] for s in self.samples], 95),
+            "avg_queries": sum(s[2] for s in self.samples) / len(self.samples) if self.samples else 0,
+            "max_queries": max((s[2] for s in self.samples), default=0),
+            "slowest": sorted(self.slowest, reverse=True),
+        }
+
+
+class MetricsRegistry:
+    def __init__(self, window=1000):
+        self.window = window
+        self._lock = threading.Lock()
+        self._endpoints = {}
+
+    def record(self, endpoint, sample, statements):
+        with self._lock:
+            stats = self._endpoints.get(endpoint)
+            if stats is None:
+                stats = self._endpoints[endpoint] = EndpointMetrics(self.window)
+            stats.add(sample, statements)
+
+    def snapshot(self):
+        with self._lock:
+            rows = [stats.summary(endpoint) for endpoint, stats in self._endpoints.items()]
+        return sorted(rows, key=lambda row: row["p95_ms"], reverse=True)
+
+    def reset(self):
+        with self._lock:
+            self._endpoints.clear()
+
+
+metrics = MetricsRegistry()
+
+
+# ---------------- REQUEST HOOKS ----------------
+def _start_request():
+    g.request_started = time.perf_counter()
+
+
+def _timings(state):
+    total_ms = (time.perf_counter() - state.request_started) * 1000
+    return total_ms, state.get("db_ms", 0.0), state.get("query_count", 0), state.get("template_ms", 0.0)
+
+
+def _finish_request(response):
+    if g.get("request_started") is None:
+        return response
+
+    total_ms, db_ms, queries, template_ms = _timings(g)
+    response.headers.add(
+        "Server-Timing",
+        f'db;dur={db_ms:.1f};desc="{queries} queries", tpl;dur={template_ms:.1f}, total;dur={total_ms:.1f}',
+    )
+    record = partial(
+        _record, current_app._get_current_object(), g._get_current_object(),
+        request.endpoint or "<unmatched>", request.method, request.path, response.status_code,
+    )
+    if response.is_streamed:
+        # a streamed template renders (and queries) after this hook: the header
+        # only covers the work before the first byte, the metrics wait for the last
+        response.call_on_close(record)
+    else:
+        record()
+    return response
+
+
+def _record(app, state, endpoint, method, path, status):
+    total_ms, db_ms, queries, template_ms = _timings(state)
+    statements = state.get("slowest_statements", [])
+    if endpoint != "static":
+        metrics.record(endpoint, (total_ms, db_ms, queries, template_ms), statements)
+
+    config = app.config
+    slow_statements = [(ms, sql) for ms, sql in statements if ms >= config["SLOW_QUERY_MS"]]
+    if total_ms >= config["SLOW_REQUEST_MS"] or slow_statements:
+        slow_log.warning(json.dumps({
+            "event": "slow_request",
+            "endpoint": endpoint,
+            "method": method,
+            "path": path,
+            "status": status,
+            "total_ms": round(total_ms, 1),
+            "db_ms": round(db_ms, 1),
+            "queries": queries,
+            "template_ms": round(template_ms, 1),
+            "slow_queries": [
+                {"ms": round(ms, 1), "sql": sql}
+                for ms, sql in sorted(slow_statements, reverse=True)
+            ],
+        }, ensure_ascii=False))
+
+
+def init_instrumentation(app):
+    app.config.setdefault("SLOW_REQUEST_MS", 500)
+    app.config.setdefault("SLOW_QUERY_MS", 100)
+    metrics.window = app.config.setdefault("METRICS_WINDOW", 1000)
+
+    app.before_request(_start_request)
+    app.after_request(_finish_request)
+    before_render_template.connect(_template_started, app)
+    template_rendered.connect(_template_finished, app)
@@ -0,0 +1,71 @@
+from functools import partial, wraps
+
+from flask import current_app, g, request
+from sqlalchemy.orm import joinedload, raiseload
+from models import Rating, PlannedRoute
+
+
+# ---------------- PER-VIEW LOADING STRATEGIES ----------------
+# Relationships stay lazy="select" in models.py; each view states up front
+# what its template walks. raiseload turns any accidental lazy load into an
+# error instead of a silent extra query.
+
+# cards on index/home/categories only use Place columns
+PLACE_LISTING = (raiseload("*"),)
+
+# place_detail only uses Place columns; its reviews are paged separately
+PLACE_DETAIL = (raiseload("*"),)
+
+# a page of reviews with their authors (queries.review_page)
+REVIEW_PAGE = (
+    joinedload(Rating.user).raiseload("*"),
+)
+
+# profile lists planned routes with their place names
+PROFILE_ROUTES = (
+    joinedload(PlannedRoute.place).raiseload("*"),
+)
+
+
+# ---------------- QUERY BUDGET ----------------
+class QueryBudgetExceeded(RuntimeError):
+    pass
+
+
+def query_budget(limit):
+    """Declare the most SQL statements a view may issue per request."""
+    def decorator(view):
+        @wraps(view)
+        def wrapped(*args, **kwargs):
+            g.query_budget = limit
+            return view(*args, **kwargs)
+        return wrapped
+    return decorator
+
+
+def check_query_budget(response):
+    limit = g.get("query_budget")
+    if limit is None:
+        return response
+    check = partial(_enforce_budget, current_app._get_current_object(), g._get_current_object(),
+                    request.endpoint, limit)
+    if response.is_streamed:
+        # streaming.stream_page: the template queries while the body is sent
+        response.call_on_close(check)
+    else:
+        check()
+    return response
+
+
+def _enforce_budget(app, state, endpoint, limit):
+    count = state.get("query_count", 0)  # counted by instrumentation.py
+    if count <= limit:
+        return
+    message = f"{endpoint} ran {count} queries (budget {limit})"
+    if app.config.get("QUERY_BUDGET_ENFORCE", app.debug or app.testing):
+        raise QueryBudgetExceeded(message)
+    app.logger.warning(message)
+
+
+def init_query_budget(app):
+    app.after_request(check_query_budget)
@@ -0,0 +1,47 @@
+"""place full-text index
+
+Revision ID: b2c367a7bc8e
+Revises: 9d1e6cb00834
+Create Date: 2026-10-18 06:55:04.116421
+
+"""
+import re
+import unicodedata
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b2c367a7bc8e'
+down_revision = '9d1e6cb00834'
+branch_labels = None
+depends_on = None
+
+
+def _tokens(value):
+    # same normalization as search.tokenize()
+    return " ".join(re.findall(r"\w+", unicodedata.normalize("NFKC", value or "").casefold()))
+
+
+def upgrade():
+    bind = op.get_bind()
+    if bind.dialect.name != "sqlite":
+        # other backends use the in-process index in search.py
+        return
+
+    op.execute(
+        "CREATE VIRTUAL TABLE IF NOT EXISTS place_fts USING fts5("
+        "name, description, tokenize = 'unicode61 remove_diacritics 0')"
+    )
+    rows = bind.execute(sa.text("SELECT id, name, description FROM place")).fetchall()
+    if rows:
+        bind.execute(
+            sa.text("INSERT INTO place_fts (rowid, name, description) VALUES (:id, :name, :description)"),
+            [{"id": r[0], "name": _tokens(r[1]), "description": _tokens(r[2])} for r in rows],
+        )
+
+
+def downgrade():
+    if op.get_bind().dialect.name == "sqlite":
+        op.execute("DROP TABLE IF EXISTS place_fts")
@@ -1,6 +1,6 @@
 from flask_sqlalchemy import SQLAlchemy
-from werkzeug.security import generate_password_hash, check_password_hash
 from flask_login import UserMixin
+from passwords import hash_password, verify_password, needs_rehash
 from datetime import datetime
 
 db = SQLAlchemy()
@@ -28,10 +28,18 @@ class User(UserMixin, db.Model):
     is_admin = db.Column(db.Boolean, default=False)
 
     def set_password(self, password):
-        self.password_hash = generate_password_hash(password)
+        self.password_hash = hash_password(password)
 
     def check_password(self, password):
-        return check_password_hash(self.password_hash, password)
+        return verify_password(self.password_hash, password)
+
+    def password_needs_rehash(self):
+        return needs_rehash(self.password_hash)
+
+    @property
+    def favorite_ids(self):
+        # same interface as identity.UserSnapshot, which is what current_user usually is
+        return frozenset(place.id for place in self.favorites)
 
     def calculate_avg_rating(self):
         if not self.favorites:
@@ -48,23 +56,69 @@ class Route(db.Model):
 
 
 class Place(db.Model):
+    __table_args__ = (
+        db.Index('ix_place_lat_lng', 'latitude', 'longitude'),
+        # natural key of catalog.py imports
+        db.Index('ix_place_name_region', 'name', 'region'),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(150), nullable=False)
     description = db.Column(db.Text, nullable=False)
-    category = db.Column(db.String(50), nullable=False)
-    region = db.Column(db.String(50))
+    category = db.Column(db.String(50), nullable=False, index=True)
+    region = db.Column(db.String(50), index=True)
     image = db.Column(db.String(200))
     latitude = db.Column(db.Float, nullable=True)
     longitude = db.Column(db.Float, nullable=True)
-    rating = db.Column(db.Float)
+    geo_key = db.Column(db.BigInteger, index=True)  # Morton tile key, see geo.py
+
+    # denormalized rating aggregates, kept in sync by ratings.py
+    rating = db.Column(db.Float, nullable=False, default=0, server_default="0", index=True)
+    rating_count = db.Column(db.Integer, nullable=False, default=0, server_default="0")
+    rating_sum = db.Column(db.Float, nullable=False, default=0, server_default="0")
+    avg_rating = db.synonym('rating')
+    # star histogram, one counter per bucket (see ratings.star_bucket)
+    stars_1 = db.Column(db.Integer, nullable=False, default=0, server_default="0")
+    stars_2 = db.Column(db.Integer, nullable=False, default=0, server_default="0")
+    stars_3 = db.Column(db.Integer, nullable=False, default=0, server_default="0")
+    stars_4 = db.Column(db.Integer, nullable=False, default=0, server_default="0")
+    stars_5 = db.Column(db.Integer, nullable=False, default=0, server_default="0")
+
+    # bumped on every UPDATE (optimistic locking); with updated_at it backs
+    # the /api/v1 ETag and Last-Modified headers
+    version = db.Column(db.Integer, nullable=False, default=1, server_default="1")
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    __mapper_args__ = {"version_id_col": version}
 
     ratings = db.relationship('Rating', backref='place', lazy=True)
 
+    @property
+    def star_histogram(self):
+        """[(stars, count, percent)] from 5 down to 1."""
+        total = self.rating_count or 0
+        rows = []
+        for stars in range(5, 0, -1):
+            count = getattr(self, f"stars_{stars}")
+            rows.append((stars, count, round(100 * count / total) if total else 0))
+        return rows
+
     def __repr__(self):
         return f"<Place {self.name}>"
 
 
 class Rating(db.Model):
+    __table_args__ = (
+        # a user's own ratings, read by the /home recommendations
+        db.Index('ix_rating_user_place', 'user_id', 'place_id'),
+        # one per review sort on place_detail (see queries.review_page)
+        db.Index('ix_rating_place_timestamp', 'place_id', 'timestamp'),
+        db.Index('ix_rating_place_stars', 'place_id', 'stars', 'timestamp'),
+        db.Index(
+            'ix_rating_place_photos', 'place_id', 'timestamp',
+            sqlite_where=db.text('image IS NOT NULL'), postgresql_where=db.text('image IS NOT NULL'),
+        ),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'))
     place_id = db.Column(db.Integer, db.ForeignKey('place.id'))
@@ -72,6 +126,10 @@ class Rating(db.Model):
     comment = db.Column(db.Text)
     image = db.Column(db.String(200))
     timestamp = db.Column(db.DateTime, default=datetime.utcnow)
+    version = db.Column(db.Integer, nullable=False, default=1, server_default="1")
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    __mapper_args__ = {"version_id_col": version}
+
     user = db.relationship('User', backref='ratings')
 
 class Favorite(db.Model):
@@ -93,17 +151,80 @@ class Spot(db.Model):
     lng = db.Column(db.Float)
 
 class Category(db.Model):
+    """One row per Place.category value; count is kept live by stats.py."""
+    __table_args__ = (
+        db.Index('ux_category_name', 'name', unique=True),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(50), nullable=False)
     icon = db.Column(db.String(50))
-    count = db.Column(db.Integer)
+    count = db.Column(db.Integer, nullable=False, default=0, server_default="0")
 
 
 class PlannedRoute(db.Model):
+    __table_args__ = (
+        # a place can be planned on several dates, each once; the conflict
+        # target of bulk.add_routes
+        db.Index('ux_planned_route_user_place_date', 'user_id', 'place_id', 'date', unique=True),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'))
     place_id = db.Column(db.Integer, db.ForeignKey('place.id'))
     date = db.Column(db.Date, nullable=False)
+    version = db.Column(db.Integer, nullable=False, default=1, server_default="1")
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    __mapper_args__ = {"version_id_col": version}
 
     user = db.relationship('User', backref='routes')
     place = db.relationship('Place', backref='planned_routes')
+
+
+# ---------------- RECOMMENDATIONS ----------------
+# Both tables are rebuilt wholesale by `flask recommendations rebuild`.
+class PlaceNeighbour(db.Model):
+    """Top-k most similar places for each place (item-item cosine)."""
+    __tablename__ = 'place_neighbour'
+
+    place_id = db.Column(db.Integer, db.ForeignKey('place.id', ondelete='CASCADE'), primary_key=True)
+    neighbour_id = db.Column(db.Integer, db.ForeignKey('place.id', ondelete='CASCADE'), primary_key=True)
+    score = db.Column(db.Float, nullable=False)
+
+
+class PlacePopularity(db.Model):
+    """Weighted count of users who favorited, planned or liked a place."""
+    __tablename__ = 'place_popularity'
+
+    place_id = db.Column(db.Integer, db.ForeignKey('place.id', ondelete='CASCADE'), primary_key=True)
+    score = db.Column(db.Float, nullable=False, index=True)
+
+
+class PlaceRanking(db.Model):
+    """Materialized top-rated and trending scores, maintained by ranking.py.
+
+    category and region are copied from Place so a filtered top list is a
+    single index range scan.
+    """
+    __tablename__ = 'place_ranking'
+    __table_args__ = (
+        db.Index('ix_place_ranking_category_bayesian', 'category', 'bayesian'),
+        db.Index('ix_place_ranking_region_bayesian', 'region', 'bayesian'),
+        db.Index('ix_place_ranking_category_trending', 'category', 'trending'),
+        db.Index('ix_place_ranking_region_trending', 'region', 'trending'),
+    )
+
+    place_id = db.Column(db.Integer, db.ForeignKey('place.id', ondelete='CASCADE'), primary_key=True)
+    category = db.Column(db.String(50), nullable=False)
+    region = db.Column(db.String(50))
+    rating_count = db.Column(db.Integer, nullable=False, default=0)
+    bayesian = db.Column(db.Float, nullable=False, index=True)
+    trending = db.Column(db.Float, nullable=False, default=0, index=True)
+
+
+class RegionStat(db.Model):
+    """Places per Place.region, kept live by stats.py."""
+    __tablename__ = 'region_stat'
+
+    region = db.Column(db.String(50), primary_key=True)
+    place_count = db.Column(db.Integer, nullable=False, default=0, server_default="0")
@@ -0,0 +1,60 @@
+import threading
+
+from flask import current_app
+from werkzeug.security import generate_password_hash, check_password_hash
+
+
+# werkzeug method strings, e.g. "scrypt:32768:8:1" (N, r, p) or "pbkdf2:sha256:600000".
+# Raising the cost only touches new hashes; old ones are upgraded on the next login.
+DEFAULT_METHOD = "scrypt:32768:8:1"
+
+_lock = threading.Lock()
+_reference_hashes = {}   # method -> a hash made with it, for its prefix and for dummy checks
+
+
+# ---------------- POLICY ----------------
+def hash_method():
+    try:
+        return current_app.config["PASSWORD_HASH_METHOD"]
+    except (RuntimeError, KeyError):
+        return DEFAULT_METHOD
+
+
+def _reference_hash(method):
+    # werkzeug fills in defaults ("scrypt" -> "scrypt:32768:8:1"), so ask it
+    # once per method instead of parsing method strings here
+    reference = _reference_hashes.get(method)
+    if reference is None:
+        with _lock:
+            reference = _reference_hashes.get(method)
+            if reference is None:
+                reference = _reference_hashes[method] = generate_password_hash("", method)
+    return reference
+
+
+def _method_of(pwhash):
+    return pwhash.split("$", 1)[0]
+
+
+# ---------------- HASHING ----------------
+def hash_password(password):
+    return generate_password_hash(password, hash_method())
+
+
+def verify_password(pwhash, password):
+    return check_password_hash(pwhash, password)
+
+
+def needs_rehash(pwhash):
+    """True when pwhash was made with other parameters than the current policy."""
+    return _method_of(pwhash) != _method_of(_reference_hash(hash_method()))
+
+
+def burn_verify(password):
+    """A failing check that costs what a real one does, for unknown accounts.
+
+    Without it a login for a missing email returns before any hashing and
+    the response time tells which emails are registered.
+    """
+    check_password_hash(_reference_hash(hash_method()), password + "\0")
+    return False
@@ -0,0 +1,144 @@
+from datetime import datetime
+
+from sqlalchemy import exists, tuple_
+from models import Place, Rating, favorites_table
+from search import search_place_ids
+
+
+PAGE_SIZE = 24
+MAX_PAGE_SIZE = 96
+REVIEW_PAGE_SIZE = 10
+REVIEW_SORTS = ("newest", "highest", "photos")
+_CURSOR_TIME = "%Y%m%d%H%M%S%f"
+
+
+def _to_float(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _to_int(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def parse_place_filters(args):
+    """Normalize /categories query args into a filters dict."""
+    page_size = _to_int(args.get("per_page")) or PAGE_SIZE
+    return {
+        "q": args.get("q", "").strip(),
+        "category": args.get("category", "").strip(),
+        "region": args.get("region", "").strip(),
+        "min_rating": _to_float(args.get("rating", "").strip()),
+        "favorites_only": args.get("favorites_only", "").strip() == "on",
+        "after": _to_int(args.get("after")),
+        "page_size": max(1, min(page_size, MAX_PAGE_SIZE)),
+    }
+
+
+def filtered_places_query(filters, user_id=None):
+    """Build one SELECT over place for the non-text filters (no pagination)."""
+    query = Place.query
+
+    if filters["min_rating"] is not None:
+        query = query.filter(Place.avg_rating >= filters["min_rating"])
+
+    if filters["category"]:
+        query = query.filter(Place.category == filters["category"])
+
+    if filters["region"]:
+        query = query.filter(Place.region == filters["region"])
+
+    if filters["favorites_only"] and user_id is not None:
+        query = query.filter(
+            exists().where(
+                favorites_table.c.place_id == Place.id,
+                favorites_table.c.user_id == user_id,
+            )
+        )
+
+    return query
+
+
+def keyset_page(query, after, page_size, key=Place.id):
+    """Return (rows, next_cursor) ordered by key, starting after the cursor value."""
+    if after is not None:
+        query = query.filter(key > after)
+    rows = query.order_by(key).limit(page_size + 1).all()
+    next_cursor = getattr(rows[page_size - 1], key.key) if len(rows) > page_size else None
+    return rows[:page_size], next_cursor
+
+
+def ranked_page(query, ranked_ids, after, page_size):
+    """Page search hits in rank order; the cursor is the last row's position.
+
+    ranked_ids is capped by search.MAX_RESULTS, so sorting here is bounded.
+    """
+    rank = {place_id: position for position, place_id in enumerate(ranked_ids)}
+    rows = sorted(query.filter(Place.id.in_(ranked_ids)).all(), key=lambda place: rank[place.id])
+    start = 0 if after is None else max(after + 1, 0)
+    page = rows[start:start + page_size]
+    next_cursor = start + page_size - 1 if len(rows) > start + page_size else None
+    return page, next_cursor
+
+
+def place_page(filters, user_id=None):
+    """Apply every /categories filter and return (places, next_cursor)."""
+    query = filtered_places_query(filters, user_id)
+    if filters["q"]:
+        return ranked_page(query, search_place_ids(filters["q"]), filters["after"], filters["page_size"])
+    return keyset_page(query, filters["after"], filters["page_size"])
+
+
+def places_in_order(place_ids, *options):
+    """Load places by id, preserving the order of place_ids."""
+    if not place_ids:
+        return []
+    by_id = {place.id: place for place in Place.query.options(*options).filter(Place.id.in_(place_ids))}
+    return [by_id[place_id] for place_id in place_ids if place_id in by_id]
+
+
+# ---------------- REVIEWS ----------------
+def _review_key(sort):
+    if sort == "highest":
+        return (Rating.stars, Rating.timestamp, Rating.id)
+    return (Rating.timestamp, Rating.id)
+
+
+def encode_review_cursor(rating, sort):
+    parts = [rating.timestamp.strftime(_CURSOR_TIME), str(rating.id)]
+    if sort == "highest":
+        parts.insert(0, repr(rating.stars))
+    return "_".join(parts)
+
+
+def decode_review_cursor(cursor, sort):
+    """The key tuple behind a cursor; raises ValueError for a malformed one."""
+    parts = cursor.split("_")
+    if len(parts) != len(_review_key(sort)):
+        raise ValueError(f"bad review cursor: {cursor!r}")
+    key = [datetime.strptime(parts[-2], _CURSOR_TIME), int(parts[-1])]
+    if sort == "highest":
+        key.insert(0, float(parts[0]))
+    return tuple(key)
+
+
+def review_page(place_id, sort="newest", after=None, page_size=REVIEW_PAGE_SIZE, options=()):
+    """One page of a place's reviews and the next cursor, walking an (place_id, ...) index.
+
+    after is a decoded cursor tuple. The cost is the same on page 1 and
+    page 500, however many reviews the place has.
+    """
+    key = _review_key(sort)
+    query = Rating.query.options(*options).filter(Rating.place_id == place_id)
+    if sort == "photos":
+        query = query.filter(Rating.image.isnot(None))
+    if after is not None:
+        query = query.filter(tuple_(*key) < tuple_(*after))
+    rows = query.order_by(*(column.desc() for column in key)).limit(page_size + 1).all()
+    next_cursor = encode_review_cursor(rows[page_size - 1], sort) if len(rows) > page_size else None
+    return rows[:page_size], next_cursor
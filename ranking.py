@@ -0,0 +1,141 @@
+from collections import defaultdict
+from datetime import datetime
+
+import click
+from flask.cli import AppGroup
+from sqlalchemy import delete, func, insert, literal, select
+from bulk import dialect_insert
+from cache import cache
+from models import db, Place, Rating, PlaceRanking
+
+
+ranking_cli = AppGroup("ranking", help="Maintain the materialized top-rated and trending scores.")
+
+# a place needs about this many ratings before its own average outweighs the site-wide one
+PRIOR_WEIGHT = 10
+PRIOR_MEAN_KEY = "ranking:prior_mean"
+PRIOR_MEAN_TTL = 3600
+DEFAULT_PRIOR_MEAN = 3.5   # until there are any ratings
+HALF_LIFE_DAYS = 7
+# trending is stored as sum(stars / 5 * 2 ** (days since EPOCH / half-life)).
+# Every row decays by the same factor, which ordering can ignore, so a new
+# rating only ever adds to its own row. Floats overflow ~19 years after EPOCH.
+TRENDING_EPOCH = datetime(2025, 1, 1)
+SORTS = ("bayesian", "trending")
+
+
+# ---------------- SCORES ----------------
+def _site_mean():
+    total, count = db.session.execute(select(func.sum(Place.rating_sum), func.sum(Place.rating_count))).one()
+    return float(total) / count if count else DEFAULT_PRIOR_MEAN
+
+
+def prior_mean():
+    return cache.get_or_set(PRIOR_MEAN_KEY, _site_mean, ttl=PRIOR_MEAN_TTL)
+
+
+def bayesian_score(rating_sum, rating_count, mean):
+    # works on plain numbers and on SQL expressions
+    return (PRIOR_WEIGHT * mean + rating_sum) / (PRIOR_WEIGHT + rating_count)
+
+
+def _days_since_epoch(moment):
+    return (moment - TRENDING_EPOCH).total_seconds() / 86400
+
+
+def trending_weight(stars, timestamp):
+    return stars / 5 * 2 ** (_days_since_epoch(timestamp) / HALF_LIFE_DAYS)
+
+
+def current_trending(stored, now=None):
+    """A stored trending score decayed to now: about one week's worth of 5-star ratings per 1.0."""
+    return stored * 2 ** (-_days_since_epoch(now or datetime.utcnow()) / HALF_LIFE_DAYS)
+
+
+# ---------------- INCREMENTAL ----------------
+def apply_rating(place_id, stars, timestamp, sign):
+    """Fold one added (sign=1) or removed (sign=-1) rating into the place's row.
+
+    Called by ratings.py after the Place aggregates were updated in the same
+    transaction, so the Bayesian score is recomputed from the new totals.
+    """
+    delta = sign * trending_weight(stars, timestamp or datetime.utcnow())
+    stmt = dialect_insert(PlaceRanking).from_select(
+        ["place_id", "category", "region", "rating_count", "bayesian", "trending"],
+        select(
+            Place.id, Place.category, Place.region, Place.rating_count,
+            bayesian_score(Place.rating_sum, Place.rating_count, prior_mean()),
+            literal(max(delta, 0.0)),
+        ).where(Place.id == place_id),
+    )
+    stmt = stmt.on_conflict_do_update(
+        index_elements=["place_id"],
+        set_={
+            "category": stmt.excluded.category,
+            "region": stmt.excluded.region,
+            "rating_count": stmt.excluded.rating_count,
+            "bayesian": stmt.excluded.bayesian,
+            "trending": PlaceRanking.trending + delta,
+        },
+    )
+    db.session.execute(stmt)
+
+
+# ---------------- REBUILD ----------------
+def rebuild_ranking():
+    """Recompute every row from Place and Rating. Returns the number of places ranked."""
+    mean = _site_mean()
+    trending = defaultdict(float)
+    rated_at = func.coalesce(Rating.timestamp, Rating.updated_at)
+    for place_id, stars, timestamp in db.session.execute(
+        select(Rating.place_id, Rating.stars, rated_at).where(Rating.place_id.isnot(None), rated_at.isnot(None))
+    ):
+        trending[place_id] += trending_weight(stars, timestamp)
+
+    rows = [
+        {
+            "place_id": place_id, "category": category, "region": region, "rating_count": rating_count,
+            "bayesian": bayesian_score(rating_sum, rating_count, mean), "trending": trending[place_id],
+        }
+        for place_id, category, region, rating_sum, rating_count in db.session.execute(
+            select(Place.id, Place.category, Place.region, Place.rating_sum, Place.rating_count)
+        )
+    ]
+    db.session.execute(delete(PlaceRanking))
+    if rows:
+        db.session.execute(insert(PlaceRanking), rows)
+    db.session.commit()
+    cache.set(PRIOR_MEAN_KEY, mean, ttl=PRIOR_MEAN_TTL)
+    return len(rows)
+
+
+@ranking_cli.command("rebuild")
+def rebuild_command():
+    """Recompute Bayesian and trending scores; run from cron to pick up new places and edits."""
+    ranked = rebuild_ranking()
+    click.echo(f"Ranked {ranked} places (prior mean {prior_mean():.2f}).")
+
+
+# ---------------- READS ----------------
+def top_places(category=None, region=None, sort="bayesian", limit=10, options=()):
+    """[(place, ranking)] best first, read off the (category|region, score) indexes."""
+    score = getattr(PlaceRanking, sort)
+    query = (
+        db.session.query(Place, PlaceRanking)
+        .options(*options)
+        .join(PlaceRanking, PlaceRanking.place_id == Place.id)
+    )
+    if category:
+        query = query.filter(PlaceRanking.category == category)
+    if region:
+        query = query.filter(PlaceRanking.region == region)
+    return query.order_by(score.desc()).limit(limit).all()
+
+
+def top_place_ids(limit, sort="bayesian"):
+    score = getattr(PlaceRanking, sort)
+    return list(db.session.scalars(select(PlaceRanking.place_id).order_by(score.desc()).limit(limit)))
+
+
+def init_ranking(app):
+    app.cli.add_command(ranking_cli)
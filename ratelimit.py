@@ -0,0 +1,119 @@
+import math
+import threading
+import time
+from collections import OrderedDict
+from functools import lru_cache
+
+
+PERIODS = {"second": 1, "minute": 60, "hour": 3600, "day": 86400}
+
+
+@lru_cache(maxsize=64)
+def parse_rate(rate):
+    """Parse "10/minute" into (burst 10, 10/60 tokens a second)."""
+    count, _, period = rate.partition("/")
+    count = int(count)
+    seconds = PERIODS.get(period.strip())
+    if count <= 0 or seconds is None:
+        raise ValueError(f"bad rate {rate!r}, expected e.g. '10/minute'")
+    return count, count / seconds
+
+
+# ---------------- BACKENDS ----------------
+class MemoryBuckets:
+    """Per-worker token buckets; the least recently hit ones are dropped past max_keys."""
+
+    def __init__(self, max_keys=100_000):
+        self.max_keys = max_keys
+        self._buckets = OrderedDict()   # key -> (tokens, updated)
+        self._lock = threading.Lock()
+
+    def take(self, key, capacity, refill, cost=1):
+        """Spend cost tokens if there are enough. Returns (allowed, tokens left)."""
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated = self._buckets.pop(key, (capacity, now))
+            tokens = min(capacity, tokens + (now - updated) * refill)
+            allowed = tokens >= cost
+            if allowed:
+                tokens -= cost
+            self._buckets[key] = (tokens, now)
+            if len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+        return allowed, tokens
+
+    def reset(self, key):
+        with self._lock:
+            self._buckets.pop(key, None)
+
+
+# refill and spend in one round trip; Redis' own clock keeps workers consistent
+_TAKE_SCRIPT = """
+local capacity, refill, cost = tonumber(ARGV[1]), tonumber(ARGV[2]), tonumber(ARGV[3])
+local clock = redis.call('TIME')
+local now = tonumber(clock[1]) + tonumber(clock[2]) / 1000000
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'updated')
+local tokens = tonumber(state[1]) or capacity
+local updated = tonumber(state[2]) or now
+tokens = math.min(capacity, tokens + math.max(0, now - updated) * refill)
+local allowed = 0
+if tokens >= cost then
+    tokens = tokens - cost
+    allowed = 1
+end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'updated', tostring(now))
+redis.call('EXPIRE', KEYS[1], math.ceil(capacity / refill) + 1)
+return {allowed, tostring(tokens)}
+"""
+
+
+class SharedBuckets:
+    """Token buckets shared by every worker, in Redis (needs EVAL, so not LocalSharedClient)."""
+
+    def __init__(self, client, prefix="greenspots:ratelimit:"):
+        self.client = client
+        self.prefix = prefix
+        self._take = client.register_script(_TAKE_SCRIPT)
+
+    def take(self, key, capacity, refill, cost=1):
+        allowed, tokens = self._take(keys=[self.prefix + key], args=[capacity, refill, cost])
+        return bool(allowed), float(tokens)
+
+    def reset(self, key):
+        self.client.delete(self.prefix + key)
+
+
+# ---------------- LIMITER ----------------
+class RateLimiter:
+    def __init__(self, backend=None):
+        self.backend = backend or MemoryBuckets()
+        self.enabled = True
+
+    def hit(self, key, rate, cost=1):
+        """Spend from key's bucket. Returns None if allowed, else whole seconds until it would be."""
+        if not self.enabled:
+            return None
+        capacity, refill = parse_rate(rate)
+        allowed, tokens = self.backend.take(key, capacity, refill, cost)
+        if allowed:
+            return None
+        return max(1, math.ceil((cost - tokens) / refill))
+
+    def reset(self, key):
+        self.backend.reset(key)
+
+
+limiter = RateLimiter()
+
+
+def init_ratelimit(app):
+    config = app.config
+    config.setdefault("RATELIMIT_ENABLED", True)
+    config.setdefault("RATELIMIT_MAX_KEYS", 100_000)
+    limiter.enabled = config["RATELIMIT_ENABLED"]
+    url = config.get("RATELIMIT_STORAGE_URL")
+    if url:
+        import redis  # optional dependency, only needed for shared buckets
+        limiter.backend = SharedBuckets(redis.Redis.from_url(url))
+    else:
+        limiter.backend = MemoryBuckets(config["RATELIMIT_MAX_KEYS"])
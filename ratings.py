@@ -0,0 +1,107 @@
+from datetime import datetime
+
+import click
+from flask.cli import AppGroup
+from sqlalchemy import Numeric, case, cast, func, select, update
+from models import db, Place, Rating
+from ranking import apply_rating
+
+
+ratings_cli = AppGroup("ratings", help="Maintain denormalized rating aggregates.")
+
+STAR_BUCKETS = range(1, 6)
+HISTOGRAM_COLUMNS = [f"stars_{stars}" for stars in STAR_BUCKETS]
+
+
+def star_bucket(stars):
+    """Histogram bucket for a 0-5 rating: nearest whole star, 0 counts as 1."""
+    return min(5, max(1, int(stars + 0.5)))
+
+
+def _star_bucket_sql(stars):
+    return case((stars < 1.5, 1), (stars < 2.5, 2), (stars < 3.5, 3), (stars < 4.5, 4), else_=5)
+
+
+def _average(rating_sum, rating_count):
+    # ROUND(x, 1) needs a NUMERIC argument on PostgreSQL
+    return func.round(cast(rating_sum / func.nullif(rating_count, 0), Numeric), 1)
+
+
+def _apply_delta(place_id, stars, count):
+    """Add (count=1) or subtract (count=-1) one rating of `stars` from the place."""
+    new_sum = Place.rating_sum + stars * count
+    new_count = Place.rating_count + count
+    bucket = f"stars_{star_bucket(stars)}"
+    db.session.execute(
+        update(Place)
+        .where(Place.id == place_id)
+        .values({
+            "rating_sum": new_sum,
+            "rating_count": new_count,
+            "rating": func.coalesce(_average(new_sum, new_count), 0),
+            bucket: getattr(Place, bucket) + count,
+            "version": Place.version + 1,
+            "updated_at": datetime.utcnow(),
+        })
+        .execution_options(synchronize_session=False)
+    )
+
+
+# ---------------- WRITE PATH ----------------
+def add_rating(rating):
+    """Insert a rating and bump its place's aggregates and ranking in the same transaction."""
+    db.session.add(rating)
+    _apply_delta(rating.place_id, rating.stars, 1)
+    _expire_place(rating.place_id)
+    apply_rating(rating.place_id, rating.stars, rating.timestamp, 1)
+
+
+def remove_rating(rating):
+    """Delete a rating and subtract it from its place's aggregates."""
+    place_id, stars, timestamp = rating.place_id, rating.stars, rating.timestamp
+    db.session.delete(rating)
+    _apply_delta(place_id, stars, -1)
+    _expire_place(place_id)
+    apply_rating(place_id, stars, timestamp, -1)
+
+
+def _expire_place(place_id):
+    # the UPDATE bypassed the ORM, so drop any stale copy held by the session
+    place = db.session.identity_map.get(db.session.identity_key(Place, place_id))
+    if place is not None:
+        db.session.expire(place, ["rating", "rating_count", "rating_sum", *HISTOGRAM_COLUMNS, "version", "updated_at"])
+
+
+# ---------------- BACKFILL / REPAIR ----------------
+def rebuild_rating_aggregates():
+    """Recompute every place's aggregates from the rating table. Returns rows fixed."""
+    count_q = select(func.count(Rating.id)).where(Rating.place_id == Place.id).scalar_subquery()
+    sum_q = select(func.coalesce(func.sum(Rating.stars), 0)).where(Rating.place_id == Place.id).scalar_subquery()
+    histogram = {
+        f"stars_{stars}": select(func.count(Rating.id))
+        .where(Rating.place_id == Place.id, _star_bucket_sql(Rating.stars) == stars)
+        .scalar_subquery()
+        for stars in STAR_BUCKETS
+    }
+
+    result = db.session.execute(
+        update(Place)
+        .values(
+            rating_count=count_q,
+            rating_sum=sum_q,
+            rating=func.coalesce(_average(sum_q, count_q), 0),
+            version=Place.version + 1,
+            updated_at=datetime.utcnow(),
+            **histogram,
+        )
+        .execution_options(synchronize_session=False)
+    )
+    db.session.commit()
+    return result.rowcount
+
+
+@ratings_cli.command("rebuild")
+def rebuild_command():
+    """Backfill or repair Place.rating / rating_count / rating_sum and the star histogram."""
+    fixed = rebuild_rating_aggregates()
+    click.echo(f"Rebuilt rating aggregates for {fixed} places.")
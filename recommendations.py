@@ -0,0 +1,209 @@
+import heapq
+import math
+import time
+from collections import defaultdict
+
+import click
+from flask.cli import AppGroup
+from sqlalchemy import case, delete, func, insert, select, union
+from models import db, Place, Rating, PlannedRoute, PlaceNeighbour, PlacePopularity, favorites_table
+
+
+recommendations_cli = AppGroup("recommendations", help="Rebuild the place similarity tables.")
+
+NEIGHBOURS = 20
+# how much each kind of interaction says about a user liking a place
+FAVORITE_WEIGHT = 1.0
+ROUTE_WEIGHT = 0.8
+MIN_LIKED_STARS = 3          # lower ratings are not counted as interest
+# keeps one very active user from costing O(n^2) pairs
+MAX_ITEMS_PER_USER = 200
+# added to the cosine denominator so pairs seen by one or two users don't score 1.0
+SHRINKAGE = 2.0
+# most popular places the cold-start fallback picks from
+POPULAR_POOL = 200
+
+
+# ---------------- OFFLINE BUILD ----------------
+def _rating_weight(stars):
+    return (stars - MIN_LIKED_STARS + 1) / (5 - MIN_LIKED_STARS + 1)
+
+
+def load_interactions():
+    """user id -> {place id: weight}, summed over favorites, routes and liked ratings."""
+    users = defaultdict(lambda: defaultdict(float))
+    for user_id, place_id in db.session.execute(select(favorites_table.c.user_id, favorites_table.c.place_id)):
+        users[user_id][place_id] += FAVORITE_WEIGHT
+    for user_id, place_id in db.session.execute(
+        select(PlannedRoute.user_id, PlannedRoute.place_id)
+        .where(PlannedRoute.user_id.isnot(None), PlannedRoute.place_id.isnot(None))
+    ):
+        users[user_id][place_id] += ROUTE_WEIGHT
+    for user_id, place_id, stars in db.session.execute(
+        select(Rating.user_id, Rating.place_id, Rating.stars)
+        .where(Rating.stars >= MIN_LIKED_STARS, Rating.user_id.isnot(None), Rating.place_id.isnot(None))
+    ):
+        users[user_id][place_id] += _rating_weight(stars)
+    return users
+
+
+def compute_neighbours(users, k=NEIGHBOURS):
+    """Item-item cosine over the sparse user x place matrix.
+
+    Only pairs that co-occur for some user are ever touched, so the cost is
+    the sum of squared items per user rather than places squared. Returns
+    ({place: [(score, neighbour), ...]}, {place: popularity}).
+    """
+    pair_sums = defaultdict(float)
+    norms = defaultdict(float)
+    popularity = defaultdict(float)
+    for items in users.values():
+        if len(items) > MAX_ITEMS_PER_USER:
+            items = dict(heapq.nlargest(MAX_ITEMS_PER_USER, items.items(), key=lambda item: item[1]))
+        row = sorted(items.items())
+        for i, (a, weight_a) in enumerate(row):
+            norms[a] += weight_a * weight_a
+            popularity[a] += min(weight_a, 1.0)
+            for b, weight_b in row[i + 1:]:
+                pair_sums[a, b] += weight_a * weight_b
+
+    candidates = defaultdict(list)
+    for (a, b), dot in pair_sums.items():
+        score = dot / (math.sqrt(norms[a] * norms[b]) + SHRINKAGE)
+        candidates[a].append((score, b))
+        candidates[b].append((score, a))
+    neighbours = {place_id: heapq.nlargest(k, scored) for place_id, scored in candidates.items()}
+    return neighbours, popularity
+
+
+def rebuild_recommendations(k=NEIGHBOURS):
+    """Recompute and swap in both tables in one transaction. Returns timings and row counts."""
+    timings = {}
+    started = time.perf_counter()
+    users = load_interactions()
+    timings["load"] = time.perf_counter() - started
+
+    started = time.perf_counter()
+    neighbours, popularity = compute_neighbours(users, k)
+    timings["compute"] = time.perf_counter() - started
+
+    started = time.perf_counter()
+    existing = set(db.session.scalars(select(Place.id)))
+    neighbour_rows = [
+        {"place_id": place_id, "neighbour_id": neighbour_id, "score": score}
+        for place_id, scored in neighbours.items() if place_id in existing
+        for score, neighbour_id in scored if neighbour_id in existing
+    ]
+    popularity_rows = [
+        {"place_id": place_id, "score": score}
+        for place_id, score in popularity.items() if place_id in existing
+    ]
+    db.session.execute(delete(PlaceNeighbour))
+    db.session.execute(delete(PlacePopularity))
+    if neighbour_rows:
+        db.session.execute(insert(PlaceNeighbour), neighbour_rows)
+    if popularity_rows:
+        db.session.execute(insert(PlacePopularity), popularity_rows)
+    db.session.commit()
+    timings["write"] = time.perf_counter() - started
+
+    return {
+        "users": len(users),
+        "neighbours": len(neighbour_rows),
+        "places": len(popularity_rows),
+        "timings": timings,
+    }
+
+
+@recommendations_cli.command("rebuild")
+@click.option("--neighbours", "k", default=NEIGHBOURS, show_default=True, help="Neighbours kept per place.")
+def rebuild_command(k):
+    """Recompute place neighbours and popularity; run from cron."""
+    result = rebuild_recommendations(k)
+    timings = " ".join(f"{step} {seconds:.1f}s" for step, seconds in result["timings"].items())
+    click.echo(
+        f"{result['users']} users -> {result['neighbours']} neighbour rows "
+        f"for {result['places']} places ({timings})."
+    )
+
+
+# ---------------- SERVING ----------------
+def _seen_place_ids(user_id):
+    return union(
+        select(favorites_table.c.place_id).where(favorites_table.c.user_id == user_id),
+        select(PlannedRoute.place_id).where(PlannedRoute.user_id == user_id),
+        select(Rating.place_id).where(Rating.user_id == user_id, Rating.stars >= MIN_LIKED_STARS),
+    ).subquery()
+
+
+def recommended_places(user_id, limit, options=()):
+    """Places most similar to what the user already saved, in one query on the neighbour table."""
+    seen = select(_seen_place_ids(user_id).c.place_id)
+    scores = (
+        select(PlaceNeighbour.neighbour_id, func.sum(PlaceNeighbour.score).label("score"))
+        .where(PlaceNeighbour.place_id.in_(seen), PlaceNeighbour.neighbour_id.not_in(seen))
+        .group_by(PlaceNeighbour.neighbour_id)
+        .order_by(func.sum(PlaceNeighbour.score).desc())
+        .limit(limit)
+        .subquery()
+    )
+    return (
+        Place.query.options(*options)
+        .join(scores, scores.c.neighbour_id == Place.id)
+        .order_by(scores.c.score.desc(), Place.id)
+        .all()
+    )
+
+
+def popular_places(user_id, limit, exclude_ids=(), options=()):
+    """Cold-start fallback: most popular places, first in the user's categories, then regions.
+
+    Only the POPULAR_POOL most popular places are considered, read off the
+    score index. Places the user already saved come last rather than not at
+    all, so a small catalog never leaves the rail empty.
+    """
+    seen = select(_seen_place_ids(user_id).c.place_id)
+    seen_places = select(Place.category, Place.region).where(Place.id.in_(seen)).subquery()
+    pool = (
+        select(PlacePopularity.place_id, PlacePopularity.score)
+        .order_by(PlacePopularity.score.desc())
+        .limit(POPULAR_POOL)
+        .subquery()
+    )
+    places = (
+        Place.query.options(*options)
+        .join(pool, pool.c.place_id == Place.id)
+        .filter(Place.id.not_in(list(exclude_ids)))
+        .order_by(
+            case((Place.id.in_(seen), 1), else_=0),
+            case((Place.category.in_(select(seen_places.c.category)), 0), else_=1),
+            case((Place.region.in_(select(seen_places.c.region)), 0), else_=1),
+            pool.c.score.desc(),
+            Place.id,
+        )
+        .limit(limit)
+        .all()
+    )
+    if len(places) < limit:
+        # not rebuilt yet, or fewer places with any interactions than the rail shows
+        exclude_ids = list(exclude_ids) + [p.id for p in places]
+        places += (
+            Place.query.options(*options)
+            .filter(Place.id.not_in(exclude_ids))
+            .order_by(Place.rating.desc(), Place.id)
+            .limit(limit - len(places))
+            .all()
+        )
+    return places
+
+
+def suggest_places(user_id, limit, options=()):
+    """The /home rail: neighbours of the user's places, topped up with popular ones."""
+    places = recommended_places(user_id, limit, options)
+    if len(places) < limit:
+        places += popular_places(user_id, limit - len(places), [p.id for p in places], options)
+    return places
+
+
+def init_recommendations(app):
+    app.cli.add_command(recommendations_cli)
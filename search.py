@@ -0,0 +1,283 @@
+import math
+import re
+import threading
+import unicodedata
+from bisect import bisect_left
+
+import click
+from flask.cli import AppGroup
+from sqlalchemy import event, inspect, text
+from models import db, Place
+
+
+search_cli = AppGroup("search", help="Manage the place full-text index.")
+
+FTS_TABLE = "place_fts"
+NAME_WEIGHT = 10.0
+DESCRIPTION_WEIGHT = 1.0
+MAX_RESULTS = 200
+
+_TOKEN_RE = re.compile(r"\w+")
+
+
+# ---------------- TOKENIZER ----------------
+def tokenize(value):
+    """Split text into search tokens.
+
+    NFKC + casefold folds Georgian Mtavruli (ᲛᲗᲐ) onto Mkhedruli (მთა) and
+    Latin case; \\w keeps Georgian letters together and drops punctuation.
+    """
+    value = unicodedata.normalize("NFKC", value or "").casefold()
+    return _TOKEN_RE.findall(value)
+
+
+# ---------------- SQLITE FTS5 BACKEND ----------------
+class FTS5Backend:
+    """Ranked prefix search through an FTS5 table keyed by place.id.
+
+    Rows hold pre-tokenized text so FTS5 and the Python fallback agree on
+    what a token is. The table is created by migration or `flask search rebuild`.
+    """
+
+    def rebuild(self, connection):
+        connection.execute(text(
+            f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5("
+            "name, description, tokenize = 'unicode61 remove_diacritics 0')"
+        ))
+        connection.execute(text(f"DELETE FROM {FTS_TABLE}"))
+        rows = connection.execute(text("SELECT id, name, description FROM place"))
+        params = [_fts_row(*row) for row in rows]
+        if params:
+            connection.execute(
+                text(f"INSERT INTO {FTS_TABLE} (rowid, name, description) VALUES (:id, :name, :description)"),
+                params,
+            )
+
+    def index(self, connection, place):
+        self.index_rows(connection, [(place.id, place.name, place.description)])
+
+    def index_rows(self, connection, rows):
+        params = [_fts_row(*row) for row in rows]
+        if not params:
+            return
+        connection.execute(text(f"DELETE FROM {FTS_TABLE} WHERE rowid = :id"), [{"id": p["id"]} for p in params])
+        connection.execute(
+            text(f"INSERT INTO {FTS_TABLE} (rowid, name, description) VALUES (:id, :name, :description)"),
+            params,
+        )
+
+    def remove(self, connection, place_id):
+        connection.execute(text(f"DELETE FROM {FTS_TABLE} WHERE rowid = :id"), {"id": place_id})
+
+    def search(self, query, limit):
+        tokens = tokenize(query)
+        if not tokens:
+            return []
+        connection = db.session.connection()
+        match = " ".join(f'"{token}"*' for token in tokens)
+        rows = connection.execute(
+            text(
+                f"SELECT rowid, bm25({FTS_TABLE}, :name_w, :desc_w) AS score FROM {FTS_TABLE} "
+                f"WHERE {FTS_TABLE} MATCH :match ORDER BY score LIMIT :limit"
+            ),
+            {"name_w": NAME_WEIGHT, "desc_w": DESCRIPTION_WEIGHT, "match": match, "limit": limit},
+        )
+        # bm25() is lower-is-better
+        return [(row[0], -row[1]) for row in rows]
+
+
+def _fts_row(place_id, name, description):
+    return {
+        "id": place_id,
+        "name": " ".join(tokenize(name)),
+        "description": " ".join(tokenize(description)),
+    }
+
+
+# ---------------- PURE-PYTHON FALLBACK ----------------
+class InvertedIndexBackend:
+    """In-process inverted index for databases without FTS5.
+
+    Built lazily from the place table and patched from committed changes
+    in this worker; other workers pick changes up on `flask search rebuild`
+    or restart.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._postings = None   # token -> {place_id: weight}
+        self._docs = {}         # place_id -> tokens it contributed
+        self._vocab = []
+
+    def _load(self):
+        # callers hold self._lock
+        if self._postings is not None:
+            return
+        self._postings, self._docs = {}, {}
+        for place_id, name, description in db.session.query(Place.id, Place.name, Place.description):
+            self._add(place_id, name, description)
+        self._vocab = sorted(self._postings)
+
+    def _add(self, place_id, name, description):
+        weights = {}
+        for token in tokenize(name):
+            weights[token] = weights.get(token, 0) + NAME_WEIGHT
+        for token in tokenize(description):
+            weights[token] = weights.get(token, 0) + DESCRIPTION_WEIGHT
+        for token, weight in weights.items():
+            self._postings.setdefault(token, {})[place_id] = weight
+        self._docs[place_id] = list(weights)
+
+    def _discard(self, place_id):
+        for token in self._docs.pop(place_id, ()):
+            posting = self._postings.get(token)
+            if posting is not None:
+                posting.pop(place_id, None)
+                if not posting:
+                    del self._postings[token]
+
+    def rebuild(self, connection=None):
+        with self._lock:
+            self._postings = None
+            self._load()
+
+    def apply(self, upserts, deletes):
+        with self._lock:
+            if self._postings is None:
+                return
+            for place_id in deletes:
+                self._discard(place_id)
+            for place_id, name, description in upserts:
+                self._discard(place_id)
+                self._add(place_id, name, description)
+            self._vocab = sorted(self._postings)
+
+    def _expand(self, prefix):
+        start = bisect_left(self._vocab, prefix)
+        for token in self._vocab[start:]:
+            if not token.startswith(prefix):
+                break
+            yield token
+
+    def search(self, query, limit):
+        tokens = tokenize(query)
+        if not tokens:
+            return []
+        # apply() patches the dicts in place after each commit; a search
+        # holds the lock throughout so it never sees them half updated
+        with self._lock:
+            self._load()
+            return self._score(tokens, limit)
+
+    def _score(self, tokens, limit):
+        total = max(len(self._docs), 1)
+        scores = None
+        for prefix in tokens:
+            matched = {}
+            for token in self._expand(prefix):
+                posting = self._postings[token]
+                idf = math.log(1 + total / len(posting))
+                for place_id, weight in posting.items():
+                    matched[place_id] = max(matched.get(place_id, 0), weight * idf)
+            if scores is None:
+                scores = matched
+            else:
+                # every query token must match (same as FTS5's implicit AND)
+                scores = {pid: scores[pid] + s for pid, s in matched.items() if pid in scores}
+            if not scores:
+                return []
+        return sorted(scores.items(), key=lambda item: (-item[1], item[0]))[:limit]
+
+
+# ---------------- WIRING ----------------
+_backend = None
+
+
+def _fts_available():
+    return db.engine.dialect.name == "sqlite" and inspect(db.engine).has_table(FTS_TABLE)
+
+
+def get_backend():
+    global _backend
+    if _backend is None:
+        _backend = FTS5Backend() if _fts_available() else InvertedIndexBackend()
+    return _backend
+
+
+def is_search_table(name):
+    """FTS5 owns place_fts and its shadow tables; keep Alembic away from them."""
+    return name == FTS_TABLE or name.startswith(FTS_TABLE + "_")
+
+
+def search_place_ids(query, limit=MAX_RESULTS):
+    """Return place ids matching every token (as a prefix), best match first."""
+    return [place_id for place_id, _ in get_backend().search(query, min(limit, MAX_RESULTS))]
+
+
+def index_places(rows):
+    """Index (id, name, description) rows written with Core, which the events below never see."""
+    backend = get_backend()
+    if isinstance(backend, FTS5Backend):
+        backend.index_rows(db.session.connection(), rows)
+    else:
+        db.session.info.setdefault("search_pending", ([], []))[0].extend(rows)
+
+
+@event.listens_for(Place, "after_insert")
+def _index_new_place(mapper, connection, target):
+    backend = get_backend()
+    if isinstance(backend, FTS5Backend):
+        backend.index(connection, target)
+
+
+@event.listens_for(Place, "after_update")
+def _reindex_place(mapper, connection, target):
+    # after_update also fires for relationship-only changes (e.g. favorites)
+    attrs = inspect(target).attrs
+    if not (attrs.name.history.has_changes() or attrs.description.history.has_changes()):
+        return
+    backend = get_backend()
+    if isinstance(backend, FTS5Backend):
+        backend.index(connection, target)
+
+
+@event.listens_for(Place, "after_delete")
+def _unindex_place(mapper, connection, target):
+    backend = get_backend()
+    if isinstance(backend, FTS5Backend):
+        backend.remove(connection, target.id)
+
+
+@event.listens_for(db.session, "after_flush")
+def _collect_place_changes(session, flush_context):
+    if not isinstance(get_backend(), InvertedIndexBackend):
+        return
+    pending = session.info.setdefault("search_pending", ([], []))
+    for obj in list(session.new) + list(session.dirty):
+        if isinstance(obj, Place):
+            pending[0].append((obj.id, obj.name, obj.description))
+    for obj in session.deleted:
+        if isinstance(obj, Place):
+            pending[1].append(obj.id)
+
+
+@event.listens_for(db.session, "after_commit")
+def _apply_place_changes(session):
+    upserts, deletes = session.info.pop("search_pending", ([], []))
+    if upserts or deletes:
+        get_backend().apply(upserts, deletes)
+
+
+@event.listens_for(db.session, "after_rollback")
+def _drop_place_changes(session):
+    session.info.pop("search_pending", None)
+
+
+@search_cli.command("rebuild")
+def rebuild_command():
+    """Create (on SQLite) and refill the search index from the place table."""
+    global _backend
+    _backend = FTS5Backend() if db.engine.dialect.name == "sqlite" else InvertedIndexBackend()
+    with db.engine.begin() as connection:
+        _backend.rebuild(connection)
+    click.echo(f"Rebuilt {type(_backend).__name__} search index.")
@@ -1,6 +1,7 @@
-from app import app, db
+from app import create_app, db
 
 if __name__ == "__main__":
+    app = create_app()
     with app.app_context():
         db.create_all()
     app.run(host="0.0.0.0", debug=True)
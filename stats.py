@@ -0,0 +1,152 @@
+import click
+from flask.cli import AppGroup
+from sqlalchemy import event, func, inspect, literal, null, select, union_all
+from bulk import dialect_insert
+from cache import cache, invalidate_on
+from forms import CATEGORY_CHOICES, REGION_CHOICES
+from models import db, Place, Category, RegionStat
+
+
+stats_cli = AppGroup("stats", help="Maintain the live category and region place counts.")
+
+CATEGORY_LABELS = dict(CATEGORY_CHOICES)
+REGION_LABELS = dict(REGION_CHOICES)
+CATEGORY_ICONS = {
+    "mountains": "mountains.svg",
+    "waterfalls": "waterfall.svg",
+    "historic": "historic.svg",
+    "forests": "forest.svg",
+    "views": "view.svg",
+    "hiking": "camp.svg",
+    "lakes": "lakes.svg",
+    "sunrise": "sunset.svg",
+}
+DEFAULT_ICON = "view.svg"
+
+# the ORM events below change the counters in the flush that changes Place
+LIVE_COUNTS_KEY = invalidate_on(Place)("stats:live_counts")
+
+
+# ---------------- COUNTERS ----------------
+def _bump(connection, table, key_column, key, count_column, delta, extra=None):
+    """count_column += delta for key, creating the row at max(delta, 0)."""
+    stmt = dialect_insert(table, bind=connection).values(
+        {key_column: key, count_column: max(delta, 0), **(extra or {})}
+    )
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[key_column],
+        set_={count_column: getattr(table.c, count_column) + delta},
+    )
+    connection.execute(stmt)
+
+
+def _apply(connection, category, region, delta):
+    if category is not None:
+        _bump(connection, Category.__table__, "name", category, "count", delta,
+              {"icon": CATEGORY_ICONS.get(category, DEFAULT_ICON)})
+    if region:
+        _bump(connection, RegionStat.__table__, "region", region, "place_count", delta)
+
+
+def _committed(place, key):
+    # the value the row had before this flush
+    history = inspect(place).attrs[key].history
+    if history.deleted:
+        return history.deleted[0]
+    return getattr(place, key)
+
+
+@event.listens_for(Place, "after_insert")
+def _count_new_place(mapper, connection, place):
+    _apply(connection, place.category, place.region, 1)
+
+
+@event.listens_for(Place, "after_update")
+def _move_place(mapper, connection, place):
+    state = inspect(place)
+    if not (state.attrs.category.history.has_changes() or state.attrs.region.history.has_changes()):
+        return
+    _apply(connection, _committed(place, "category"), _committed(place, "region"), -1)
+    _apply(connection, place.category, place.region, 1)
+
+
+@event.listens_for(Place, "before_delete")
+def _uncount_place(mapper, connection, place):
+    # before, not after: an expired place can still load its old values here
+    _apply(connection, _committed(place, "category"), _committed(place, "region"), -1)
+
+
+# with active history the old value is loaded when an expired place is
+# reassigned, so _committed sees it instead of nothing
+@event.listens_for(Place.category, "set", active_history=True)
+@event.listens_for(Place.region, "set", active_history=True)
+def _keep_old_value(place, value, old_value, initiator):
+    pass
+
+
+# ---------------- RECONCILE ----------------
+def _reconcile(model, key_attr, count_attr, actual):
+    changed = 0
+    existing = {getattr(row, key_attr): row for row in model.query}
+    for key in existing.keys() | actual.keys():
+        row = existing.get(key)
+        if row is None:
+            row = model(**{key_attr: key})
+            db.session.add(row)
+        if getattr(row, count_attr) != actual.get(key, 0):
+            setattr(row, count_attr, actual.get(key, 0))
+            changed += 1
+    return changed
+
+
+def reconcile_counts():
+    """Recount from Place and fix any drifted rows. Returns the number of rows changed.
+
+    Bulk inserts and query-level deletes skip the ORM events, so run this
+    after them and periodically from cron.
+    """
+    categories = dict(db.session.execute(select(Place.category, func.count()).group_by(Place.category)).all())
+    for name in CATEGORY_LABELS:
+        categories.setdefault(name, 0)
+    regions = dict(db.session.execute(
+        select(Place.region, func.count()).where(Place.region.isnot(None), Place.region != "").group_by(Place.region)
+    ).all())
+    changed = _reconcile(Category, "name", "count", categories)
+    for category in Category.query.filter(Category.icon.is_(None)):
+        category.icon = CATEGORY_ICONS.get(category.name, DEFAULT_ICON)
+    changed += _reconcile(RegionStat, "region", "place_count", regions)
+    db.session.commit()
+    cache.delete(LIVE_COUNTS_KEY)
+    return changed
+
+
+@stats_cli.command("reconcile")
+def reconcile_command():
+    """Recount places per category and region; run from cron."""
+    changed = reconcile_counts()
+    click.echo(f"Corrected {changed} counters.")
+
+
+# ---------------- READS ----------------
+def _load_live_counts():
+    # both tables in one round trip
+    rows = db.session.execute(union_all(
+        select(literal("category"), Category.name, Category.icon, Category.count),
+        select(literal("region"), RegionStat.region, null(), RegionStat.place_count).where(RegionStat.place_count > 0),
+    )).all()
+    categories = sorted(
+        ({"name": name, "label": CATEGORY_LABELS.get(name, name), "icon": icon or DEFAULT_ICON, "count": count}
+         for kind, name, icon, count in rows if kind == "category"),
+        key=lambda category: (-category["count"], category["name"]),
+    )
+    regions = {name: count for kind, name, _, count in rows if kind == "region"}
+    return {"categories": categories, "regions": regions}
+
+
+def live_counts():
+    """{"categories": [{name, label, icon, count}] largest first, "regions": {region: places}}."""
+    return cache.get_or_set(LIVE_COUNTS_KEY, _load_live_counts)
+
+
+def init_stats(app):
+    app.cli.add_command(stats_cli)
@@ -0,0 +1,251 @@
+import zlib
+
+from flask import current_app, g, get_flashed_messages, render_template, stream_template
+from flask_wtf.csrf import generate_csrf
+from jinja2 import nodes
+from jinja2.ext import Extension
+from markupsafe import Markup
+from werkzeug.datastructures import Headers
+from werkzeug.http import parse_accept_header
+from models import db
+
+
+STREAM_CHUNK_SIZE = 16 * 1024
+STREAM_YIELD_PER = 500
+
+# rendered by {% flush %} in a streamed page and cut out again before sending
+FLUSH_MARKER = "<!--flush-->"
+
+# besides text/*, *+json and *+xml; images, fonts and archives are compressed already
+COMPRESSIBLE_TYPES = frozenset({
+    "application/javascript",
+    "application/json",
+    "application/x-ndjson",
+    "application/xml",
+    "image/svg+xml",
+})
+
+
+# ---------------- STREAMED PAGES ----------------
+class FlushExtension(Extension):
+    """{% flush %}: in a streamed page, send everything rendered so far now.
+
+    base.html flushes after the header, so the browser can fetch CSS while
+    the rows are still being queried. render_template ignores the tag.
+    """
+
+    tags = {"flush"}
+
+    def parse(self, parser):
+        lineno = next(parser.stream).lineno
+        return nodes.Output([self.call_method("_flush")]).set_lineno(lineno)
+
+    def _flush(self):
+        return Markup(FLUSH_MARKER) if g.get("streaming") else Markup("")
+
+
+def _coalesce(chunks, size):
+    # Jinja yields every text node and expression separately; batch them
+    # into writes of about `size` characters, cut early at each flush marker
+    buffer, buffered = [], 0
+    for chunk in chunks:
+        if FLUSH_MARKER in chunk:
+            head, _, chunk = chunk.rpartition(FLUSH_MARKER)
+            buffer.append(head.replace(FLUSH_MARKER, ""))
+            data = "".join(buffer)
+            if data:
+                yield data
+            buffer, buffered = [], 0
+        if not chunk:
+            continue
+        buffer.append(chunk)
+        buffered += len(chunk)
+        if buffered >= size:
+            yield "".join(buffer)
+            buffer, buffered = [], 0
+    if buffer:
+        yield "".join(buffer)
+
+
+def stream_page(template_name, **context):
+    """render_template, but sent while the template is still rendering.
+
+    Pass rows as a generator (see yield_rows) and they are fetched after the
+    page header has gone out; peak memory no longer grows with the row count.
+    Queries in the body run after the after_request hooks, see
+    instrumentation.py and loading.py for how they are still counted.
+    """
+    app = current_app
+    if not app.config["STREAM_TEMPLATES"]:
+        return render_template(template_name, **context)
+    # the session cookie leaves with the headers: pop the flashed messages
+    # and create the CSRF token now rather than halfway through the body
+    get_flashed_messages()
+    if "csrf" in app.extensions:
+        generate_csrf()
+    g.streaming = True
+    chunks = stream_template(template_name, **context)
+    return app.response_class(_coalesce(chunks, app.config["STREAM_CHUNK_SIZE"]), mimetype="text/html")
+
+
+def yield_rows(statement):
+    """Rows of a select() fetched in batches of STREAM_YIELD_PER, for stream_page.
+
+    A generator, so the query only runs once the template reaches the loop.
+    """
+    yield from db.session.execute(statement.execution_options(yield_per=current_app.config["STREAM_YIELD_PER"]))
+
+
+# ---------------- COMPRESSION ----------------
+class _Gzip:
+    def __init__(self, level):
+        self._zlib = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+
+    def compress(self, data, flush):
+        out = self._zlib.compress(data)
+        return out + self._zlib.flush(zlib.Z_SYNC_FLUSH) if flush else out
+
+    def finish(self):
+        return self._zlib.flush()
+
+
+class _Brotli:
+    def __init__(self, quality):
+        import brotli
+        self._brotli = brotli.Compressor(quality=quality)
+
+    def compress(self, data, flush):
+        out = self._brotli.process(data)
+        return out + self._brotli.flush() if flush else out
+
+    def finish(self):
+        return self._brotli.finish()
+
+
+class _CompressedBody:
+    """Compresses a WSGI body chunk by chunk; flushes after each one when streamed."""
+
+    def __init__(self, body, compressor, streamed):
+        self._body = body
+        self._compressor = compressor
+        self._streamed = streamed
+
+    def __iter__(self):
+        for chunk in self._body:
+            if chunk:
+                data = self._compressor.compress(chunk, self._streamed)
+                if data:
+                    yield data
+        yield self._compressor.finish()
+
+    def close(self):
+        # stream_with_context pops the request context here
+        close = getattr(self._body, "close", None)
+        if close is not None:
+            close()
+
+
+def compressible(content_type):
+    mimetype = (content_type or "").split(";", 1)[0].strip().lower()
+    return (
+        mimetype.startswith("text/")
+        or mimetype.endswith(("+json", "+xml"))
+        or mimetype in COMPRESSIBLE_TYPES
+    )
+
+
+class CompressionMiddleware:
+    """gzip or brotli for dynamic responses, negotiated from Accept-Encoding.
+
+    Streamed bodies stay streamed: every chunk is flushed through the
+    compressor as it arrives. Skipped: media types that are compressed
+    already (the images and fonts in static/), responses that carry a
+    Content-Encoding (the precompressed dist/ files, see assets.py),
+    bodies under min_size, partial and empty responses, and
+    Cache-Control: no-transform.
+    """
+
+    def __init__(self, app, min_size=1024, gzip_level=6, brotli_quality=4, brotli=True):
+        self.app = app
+        self.min_size = min_size
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+        self.encodings = ("br", "gzip") if brotli else ("gzip",)
+
+    def negotiate(self, accept_encoding):
+        if not accept_encoding:
+            return None
+        accepted = parse_accept_header(accept_encoding)
+        # br wins a tie: smaller at a similar cost for these quality levels
+        best = max(self.encodings, key=lambda encoding: accepted[encoding])
+        return best if accepted[best] > 0 else None
+
+    def _compressor(self, encoding):
+        if encoding == "br":
+            return _Brotli(self.brotli_quality)
+        return _Gzip(self.gzip_level)
+
+    def _worth_compressing(self, status, headers):
+        code = int(status.split(" ", 1)[0])
+        if code < 200 or code in (204, 206, 304):
+            return False
+        if "Content-Encoding" in headers or "Content-Range" in headers:
+            return False
+        if "no-transform" in headers.get("Cache-Control", ""):
+            return False
+        length = headers.get("Content-Length")
+        return length is None or int(length) >= self.min_size
+
+    def __call__(self, environ, start_response):
+        encoding = None
+        if environ.get("REQUEST_METHOD") != "HEAD":
+            encoding = self.negotiate(environ.get("HTTP_ACCEPT_ENCODING"))
+        state = {}
+
+        def start(status, headers, exc_info=None):
+            headers = Headers(headers)
+            if compressible(headers.get("Content-Type")):
+                vary = headers.get("Vary", "")
+                if "accept-encoding" not in vary.lower():
+                    headers["Vary"] = f"{vary}, Accept-Encoding" if vary else "Accept-Encoding"
+                if encoding and self._worth_compressing(status, headers):
+                    state["streamed"] = "Content-Length" not in headers
+                    state["compressor"] = self._compressor(encoding)
+                    headers.remove("Content-Length")
+                    headers["Content-Encoding"] = encoding
+                    etag = headers.get("ETag")
+                    if etag and not etag.startswith("W/"):
+                        # a different byte sequence than the uncompressed body
+                        headers["ETag"] = "W/" + etag
+            return start_response(status, headers.to_wsgi_list(), exc_info)
+
+        # werkzeug calls start_response before returning the body, so an
+        # untouched body (and its wsgi.file_wrapper) can be passed through as is
+        body = self.app(environ, start)
+        if "compressor" not in state:
+            return body
+        return _CompressedBody(body, state["compressor"], state["streamed"])
+
+
+def init_streaming(app):
+    app.config.setdefault("STREAM_TEMPLATES", True)
+    app.config.setdefault("STREAM_CHUNK_SIZE", STREAM_CHUNK_SIZE)
+    app.config.setdefault("STREAM_YIELD_PER", STREAM_YIELD_PER)
+    app.config.setdefault("COMPRESS_MIN_SIZE", 1024)
+    app.config.setdefault("COMPRESS_GZIP_LEVEL", 6)
+    app.config.setdefault("COMPRESS_BROTLI_QUALITY", 4)
+    app.jinja_env.add_extension(FlushExtension)
+
+    if not app.config.get("COMPRESS_RESPONSES", True):
+        return
+    try:
+        import brotli  # optional, gzip only without it
+    except ImportError:
+        brotli = None
+    app.wsgi_app = CompressionMiddleware(
+        app.wsgi_app,
+        min_size=app.config["COMPRESS_MIN_SIZE"],
+        gzip_level=app.config["COMPRESS_GZIP_LEVEL"],
+        brotli_quality=app.config["COMPRESS_BROTLI_QUALITY"],
+        brotli=brotli is not None,
+    )
@@ -0,0 +1,153 @@
+import hashlib
+import os
+import shutil
+import tempfile
+
+from flask import Request, current_app, flash, g, redirect, request
+from werkzeug.exceptions import RequestEntityTooLarge, UnsupportedMediaType
+
+
+SNIFF_BYTES = 12
+CHUNK_SIZE = 64 * 1024
+
+
+def sniff_image(head):
+    """Extension for the image type the leading bytes belong to, or None."""
+    if head.startswith(b"\xff\xd8\xff"):
+        return ".jpg"
+    if head.startswith(b"\x89PNG\r\n\x1a\n"):
+        return ".png"
+    if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+        return ".webp"
+    return None
+
+
+# ---------------- STREAMING ----------------
+class HashingUpload:
+    """File part spooled to disk chunk by chunk while it is hashed and sniffed.
+
+    Werkzeug writes each chunk as it comes off the socket, so an oversized or
+    non-image upload is rejected after its first chunk instead of after the
+    whole body has been received.
+    """
+
+    def __init__(self, directory, max_bytes):
+        os.makedirs(directory, exist_ok=True)
+        self.file = tempfile.NamedTemporaryFile(dir=directory, prefix="upload-", delete=False)
+        self.path = self.file.name
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.kind = None
+        self._head = b""
+        self._hash = hashlib.sha256()
+
+    @classmethod
+    def from_file(cls, source, directory, max_bytes):
+        upload = cls(directory, max_bytes)
+        try:
+            for chunk in iter(lambda: source.read(CHUNK_SIZE), b""):
+                upload.write(chunk)
+        except Exception:
+            upload.discard()
+            raise
+        return upload
+
+    def write(self, data):
+        self.size += len(data)
+        if self.size > self.max_bytes:
+            self.discard()
+            raise RequestEntityTooLarge()
+        if self.kind is None and len(self._head) < SNIFF_BYTES:
+            self._head += data[:SNIFF_BYTES - len(self._head)]
+            if len(self._head) == SNIFF_BYTES:
+                self.kind = sniff_image(self._head)
+                if self.kind is None:
+                    self.discard()
+                    raise UnsupportedMediaType()
+        self._hash.update(data)
+        return self.file.write(data)
+
+    def __getattr__(self, name):
+        # read/seek/readline etc. for FileStorage
+        return getattr(self.file, name)
+
+    @property
+    def digest(self):
+        return self._hash.hexdigest()
+
+    def store(self, folder):
+        """Move the upload into folder under its content hash; returns the filename.
+
+        Identical content is only stored once: if the file already exists the
+        temporary copy is dropped.
+        """
+        kind = self.kind or sniff_image(self._head)
+        if kind is None:
+            self.discard()
+            raise UnsupportedMediaType()
+        filename = self.digest[:32] + kind
+        target = os.path.join(folder, filename)
+        self.file.close()
+        if os.path.exists(target):
+            self.discard()
+        else:
+            shutil.move(self.path, target)
+            self.path = None
+        return filename
+
+    def discard(self):
+        self.file.close()
+        if self.path is not None:
+            try:
+                os.unlink(self.path)
+            except FileNotFoundError:
+                pass
+            self.path = None
+
+
+def raw_file_uploads(view):
+    """Mark a view whose file parts are data files, not images: they skip HashingUpload."""
+    view.raw_file_uploads = True
+    return view
+
+
+class UploadRequest(Request):
+    """Request that streams file parts through HashingUpload."""
+
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        if getattr(current_app.view_functions.get(self.endpoint), "raw_file_uploads", False):
+            # a spooled temporary file, capped by MAX_CONTENT_LENGTH only
+            return super()._get_file_stream(total_content_length, content_type, filename, content_length)
+        config = current_app.config
+        upload = HashingUpload(config["UPLOAD_TMP_FOLDER"], config["MAX_IMAGE_BYTES"])
+        g.setdefault("upload_streams", []).append(upload)
+        return upload
+
+
+def incoming_upload(file_storage):
+    """The HashingUpload behind a FileStorage, spooling it now if it came another way."""
+    if isinstance(file_storage.stream, HashingUpload):
+        return file_storage.stream
+    config = current_app.config
+    return HashingUpload.from_file(file_storage.stream, config["UPLOAD_TMP_FOLDER"], config["MAX_IMAGE_BYTES"])
+
+
+def _discard_leftovers(exc):
+    for upload in g.pop("upload_streams", ()):
+        upload.discard()
+
+
+def _upload_rejected(error):
+    if error.code == 413:
+        flash("ფაილი ძალიან დიდია", "danger")
+    else:
+        flash("მხოლოდ ფოტო! (JPEG, PNG ან WebP)", "danger")
+    return redirect(request.url)
+
+
+def init_uploads(app):
+    app.config.setdefault("UPLOAD_TMP_FOLDER", os.path.join(app.instance_path, "incoming"))
+    app.request_class = UploadRequest
+    app.teardown_request(_discard_leftovers)
+    app.register_error_handler(RequestEntityTooLarge, _upload_rejected)
+    app.register_error_handler(UnsupportedMediaType, _upload_rejected)
@@ -0,0 +1,367 @@
+import random
+from datetime import datetime
+from types import SimpleNamespace
+
+from flask import Blueprint, render_template, redirect, url_for, flash, request, abort, jsonify
+from flask_login import login_required, current_user
+from sqlalchemy import exists, select
+from models import db, User, Place, Rating, PlannedRoute
+from forms import PlaceForm
+from ratings import add_rating, remove_rating
+from queries import parse_place_filters, place_page, places_in_order, review_page, REVIEW_SORTS
+from geo import nearest_places
+from loading import PLACE_LISTING, PLACE_DETAIL, PROFILE_ROUTES, REVIEW_PAGE, query_budget
+from cache import cache, invalidate_on
+from images import save_upload
+from bulk import add_favorites, remove_favorites, add_routes
+from identity import confirmed_admin
+from recommendations import suggest_places
+from ranking import top_place_ids
+from stats import live_counts
+from streaming import stream_page, yield_rows
+
+main_bp = Blueprint('main', __name__)
+
+NEARBY_RADIUS_KM = 50
+
+
+# ---------------- PUBLIC ROUTES ----------------
+LANDING_COUNTS_KEY = invalidate_on(User, Place)("landing:counts")
+LANDING_POOL_KEY = invalidate_on(Place, Rating)("landing:top_spot_pool")
+TOP_SPOT_POOL_SIZE = 30
+
+
+def landing_counts():
+    return {"users": User.query.count(), "spots": Place.query.count()}
+
+
+def top_spot_pool():
+    # ids only, so the pool is cheap to cache and share between workers
+    ids = top_place_ids(TOP_SPOT_POOL_SIZE)
+    if not ids:
+        # `flask ranking rebuild` hasn't run yet
+        ids = [pid for (pid,) in db.session.query(Place.id).limit(TOP_SPOT_POOL_SIZE)]
+    return ids
+
+
+@main_bp.route("/")
+# 1 once warm; a cold cache adds the user, both landing counts, the ranking
+# pool (and its fallback before `flask ranking rebuild`) and live_counts
+@query_budget(8)
+def index():
+    counts = cache.get_or_set(LANDING_COUNTS_KEY, landing_counts)
+    users_count = counts["users"]
+    spots_count = counts["spots"]
+
+    pool = cache.get_or_set(LANDING_POOL_KEY, top_spot_pool)
+    top_spots = places_in_order(random.sample(pool, min(10, len(pool))), *PLACE_LISTING)
+
+    live = live_counts()
+    categories = [
+        SimpleNamespace(name=c["label"], icon=c["icon"], count=c["count"]) for c in live["categories"][:8]
+    ]
+    categories_count = sum(1 for c in live["categories"] if c["count"])
+
+    stats = SimpleNamespace(
+        spots=len(top_spots),
+        regions=len(live["regions"]),
+        visitors=users_count
+    )
+
+    return render_template(
+        "index.html",
+        spots=top_spots,
+        categories=categories,
+        stats=stats,
+        users_count=users_count,
+        spots_count=spots_count,
+        categories_count=categories_count
+    )
+# ---------------- LOGGED-IN ROUTES ----------------
+@main_bp.route("/home")
+@login_required
+@query_budget(6)
+def home():
+    suggestions = suggest_places(current_user.id, 10, PLACE_LISTING)
+
+    user_favorite_ids = sorted(current_user.favorite_ids)
+    max_favorites = 6
+    if len(user_favorite_ids) > max_favorites:
+        favorites_to_show = places_in_order(random.sample(user_favorite_ids, max_favorites), *PLACE_LISTING)
+    else:
+        favorites_to_show = places_in_order(user_favorite_ids, *PLACE_LISTING)
+
+    planned_count = PlannedRoute.query.filter_by(user_id=current_user.id).count()
+
+    return render_template(
+        "home.html",
+        suggested_places=suggestions,
+        favorites_to_show=favorites_to_show,
+        favorites_count=len(user_favorite_ids),
+        user_favorite_ids=user_favorite_ids,
+        planned_count=planned_count
+    )
+
+@main_bp.route("/profile")
+@login_required
+@query_budget(4)
+def profile():
+    favorites = places_in_order(sorted(current_user.favorite_ids), *PLACE_LISTING)
+    planned_routes = PlannedRoute.query.options(*PROFILE_ROUTES).filter_by(user_id=current_user.id).all()
+    avg_rating = round(sum(place.rating for place in favorites) / len(favorites), 1) if favorites else 0
+    return render_template(
+        "profile.html",
+        favorites=favorites,
+        planned_routes=planned_routes,
+        avg_rating=avg_rating
+    )
+
+@main_bp.route("/delete_route/<int:route_id>", methods=["POST"])
+@login_required
+def delete_route(route_id):
+    route = PlannedRoute.query.get_or_404(route_id)
+
+    if route.user_id != current_user.id and not confirmed_admin(current_user):
+        abort(403)
+
+    db.session.delete(route)
+    db.session.commit()
+    flash("მარშრუტი წაიშალა", "success")
+    return redirect(url_for("main.profile"))
+
+
+@main_bp.route("/delete_place/<int:place_id>", methods=["POST"])
+@login_required
+def delete_place(place_id):
+    if not confirmed_admin(current_user):
+        abort(403)
+
+    place = Place.query.get_or_404(place_id)
+    db.session.delete(place)
+    db.session.commit()
+    flash("Place deleted", "success")
+    return redirect(url_for("main.categories"))
+
+
+@main_bp.route("/map")
+@query_budget(1)
+def map_page():
+    # markers are fetched per viewport from /api/places/bbox
+    return render_template("map.html")
+
+@main_bp.route("/categories")
+@login_required
+@query_budget(6)
+def categories():
+    search_query = request.args.get("q", "").strip()
+    selected_category = request.args.get("category", "").strip()
+    min_rating = request.args.get("rating", "").strip()
+    selected_region = request.args.get("region", "").strip()
+    favorites_only = request.args.get("favorites_only", "").strip()
+
+    region_map = {
+        "Tbilisi": "თბილისი",
+        "Adjara": "აჭარა",
+        "Abkhazia": "აფხაზეთი",
+        "Samegrelo": "სამეგრელო",
+        "Guria": "გურია",
+        "Imereti": "იმერეთი",
+        "Kakheti": "კახეთი",
+        "Racha-Lechkhumi": "რაჭა-ლეჩხუმი",
+        "Mtskheta-Mtianeti": "მცხეთა-მთიანეთი",
+        "Samtskhe-Javakheti": "სამცხე-ჯავახეთი",
+        "Svaneti": "სვანეთი",
+        "Shida Kartli": "შიდა ქართლი",
+        "Kvemo Kartli": "ქვემო ქართლი"
+    }
+
+    filters = parse_place_filters(request.args)
+    places, next_cursor = place_page(filters, user_id=current_user.id)
+
+    next_url = None
+    if next_cursor is not None:
+        next_url = url_for("main.categories", **dict(request.args.to_dict(), after=next_cursor))
+
+    live = live_counts()
+    categories_list = [(c["name"], c["label"], c["count"]) for c in live["categories"] if c["count"]]
+    regions_list = [(code, name, live["regions"][code]) for code, name in region_map.items() if code in live["regions"]]
+
+    return stream_page(
+        "categories.html",
+        places=places,
+        next_url=next_url,
+        categories_list=categories_list,
+        regions_list=regions_list,
+        selected_category=selected_category,
+        min_rating=min_rating,
+        selected_region=selected_region,
+        favorites_only=favorites_only,
+        search_query=search_query
+    )
+
+@main_bp.route("/add-place", methods=["GET", "POST"])
+@login_required
+def add_place():
+    form = PlaceForm()
+    if form.validate_on_submit():
+        # Handle image upload
+        filename = None
+        if form.image.data:
+            filename = save_upload(form.image.data)
+
+        # Get coordinates from form
+        latitude = request.form.get("latitude")
+        longitude = request.form.get("longitude")
+
+        if not latitude or not longitude:
+            flash("გთხოვ აირჩიე ადგილი რუკაზე", "danger")
+            return redirect(request.url)
+
+        # Create Place
+        place = Place(
+            name=form.name.data,
+            description=form.description.data,
+            category=form.category.data,
+            region=form.region.data,
+            image=filename,
+            latitude=float(latitude),
+            longitude=float(longitude)
+        )
+
+        db.session.add(place)
+        db.session.commit()
+        flash("Place added successfully!", "success")
+        return redirect(url_for("main.categories"))
+
+    return render_template("add-place.html", form=form)
+
+
+@main_bp.route('/delete_rating/<int:rating_id>', methods=['POST'])
+@login_required
+def delete_rating(rating_id):
+    rating = Rating.query.get_or_404(rating_id)
+
+    if rating.user_id != current_user.id and not confirmed_admin(current_user):
+        return jsonify({'status': 'error', 'message': 'Unauthorized'}), 403
+
+    try:
+        remove_rating(rating)
+        db.session.commit()
+        return jsonify({'status': 'success'})
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'status': 'error', 'message': str(e)}), 500
+
+@main_bp.route("/place/<int:place_id>", methods=["GET", "POST"])
+@login_required
+@query_budget(10)
+def place_detail(place_id):
+    place = Place.query.options(*PLACE_DETAIL).get_or_404(place_id)
+
+    if request.method == "POST":
+        action = request.form.get("action")
+        if action == "favorite":
+            if current_user.is_favorite(place.id):
+                remove_favorites(current_user.id, [place.id])
+            else:
+                add_favorites(current_user.id, [place.id])
+
+        elif action == "route":
+            add_routes(current_user.id, {place.id: None})
+
+        elif action == "rating":
+            stars = float(request.form.get("stars"))
+            comment = request.form.get("comment")
+            image_file = request.files.get("image")
+            filename = None
+            if image_file and image_file.filename != "":
+                filename = save_upload(image_file)
+            new_rating = Rating(user_id=current_user.id, place_id=place.id, stars=stars, comment=comment, image=filename)
+            add_rating(new_rating)
+
+        db.session.commit()
+        return redirect(url_for("main.place_detail", place_id=place.id))
+
+    review_sort = request.args.get("reviews", "newest")
+    if review_sort not in REVIEW_SORTS:
+        review_sort = "newest"
+    ratings, next_reviews = review_page(place.id, review_sort, options=REVIEW_PAGE)
+
+    nearby = []
+    if place.latitude is not None and place.longitude is not None:
+        nearby = nearest_places(place.latitude, place.longitude, k=4, radius_km=NEARBY_RADIUS_KM, exclude_id=place.id)
+
+    is_favorite = current_user.is_favorite(place.id)
+
+    return render_template(
+        "place_detail.html",
+        place=place,
+        ratings=ratings,
+        review_sort=review_sort,
+        next_reviews=next_reviews,
+        avg_rating=place.avg_rating,
+        is_favorite=is_favorite,
+        nearby=nearby
+    )
+
+@main_bp.route("/category/<string:category_name>")
+@login_required
+def category_places(category_name):
+    # the paged, streamed listing; this used to load the whole category at once
+    return redirect(url_for("main.categories", category=category_name))
+
+@main_bp.route("/toggle_favorite/<int:place_id>", methods=["POST"])
+@login_required
+def toggle_favorite(place_id):
+    if not db.session.query(exists().where(Place.id == place_id)).scalar():
+        abort(404)
+    # DELETE first: if nothing was removed it wasn't a favorite yet
+    if remove_favorites(current_user.id, [place_id]):
+        db.session.commit()
+        return {"status": "removed"}
+    add_favorites(current_user.id, [place_id])
+    db.session.commit()
+    return {"status": "added"}
+
+
+@main_bp.route('/booking', methods=['GET', 'POST'])
+@login_required
+def booking():
+    if request.method == 'POST':
+        spot_name = request.form['spot']
+        date_selected = request.form['date']
+        name = request.form['name']
+        email = request.form['email']
+        phone = request.form['phone']
+
+        # Find the Spot in DB
+        spot = Place.query.filter_by(name=spot_name).first()
+        if not spot:
+            flash("აირჩიე ვალიდური ადგილი!", "danger")
+            return redirect(url_for('main.booking'))
+
+        # Save the booking to PlannedRoute (booking the same date twice keeps one route)
+        booked_date = datetime.strptime(date_selected, "%Y-%m-%d").date()
+        add_routes(current_user.id, {spot.id: booked_date})
+        db.session.commit()
+
+        flash("თქვენი შეკვეთა წარმატებით გაიგზავნა!", "success")
+        return redirect(url_for('main.profile'))
+
+    # every place is an <option>: stream the names instead of building the page
+    spots = yield_rows(select(Place.name).order_by(Place.name))
+    return stream_page("booking.html", spots=spots)
+
+
+@main_bp.route("/contact", methods=["GET", "POST"])
+def contact():
+    if request.method == "POST":
+        name = request.form["   name"]
+        email = request.form["email"]
+        subject = request.form["subject"]
+        message = request.form["message"]
+
+        flash("შეტყობინება გაგზავნილია!", "success")
+        return redirect(url_for("main.contact"))
+
+    return render_template("contact.html")